@@ -0,0 +1,305 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+
+# Matches columns loaded by MatchArrays; teams share one dictionary so that
+# team1, team2, winner and toss_winner codes can be compared directly
+TEAM_COLUMNS = ['team1', 'team2', 'winner', 'toss_winner']
+CATEGORY_COLUMNS = ['match_type', 'toss_decision', 'venue', 'city']
+
+# Above this many possible groups, grouped() sorts instead of using a dense bincount
+DENSE_GROUPS_MAX = 1 << 20
+
+SEASONS = {'12': 'Winter', '01': 'Winter', '02': 'Winter',
+           '03': 'Spring', '04': 'Spring', '05': 'Spring',
+           '06': 'Summer', '07': 'Summer', '08': 'Summer',
+           '09': 'Fall', '10': 'Fall', '11': 'Fall'}
+
+def encode(values, dictionary=None):
+    """Dictionary-encode values as int32 codes, 0 for NULL and 1.. in sorted order
+
+    Codes sort like the strings do under SQLite's BINARY collation, with
+    NULL first, so grouping by codes yields groups in SQL GROUP BY order.
+    Returns (codes, dictionary) where dictionary[code] is the value.
+    """
+    if dictionary is None:
+        dictionary = [None] + sorted({value for value in values if value is not None})
+    lookup = {value: code for code, value in enumerate(dictionary)}
+    return np.fromiter(map(lookup.__getitem__, values), dtype=np.int32, count=len(values)), dictionary
+
+class MatchArrays:
+    """The matches table held as dictionary-encoded integer arrays
+
+    Every report is computed from these with vectorized grouped counts;
+    team_* arrays are the per-team unpivot that db.py stores as
+    team_matches, one entry per team per match.
+    """
+
+    def __init__(self, rows):
+        columns = list(zip(*rows)) if rows else [()] * (len(TEAM_COLUMNS) + len(CATEGORY_COLUMNS) + 1)
+        dates = columns[0]
+        self.dictionaries = {}
+        self.codes = {}
+
+        teams = [None] + sorted({team for column in columns[1:5] for team in column if team is not None})
+        for name, values in zip(TEAM_COLUMNS, columns[1:5]):
+            self.codes[name], self.dictionaries[name] = encode(values, teams)
+        for name, values in zip(CATEGORY_COLUMNS, columns[5:]):
+            self.codes[name], self.dictionaries[name] = encode(values)
+
+        # Date parts as SQL derives them with SUBSTR
+        for name, part in (('year', slice(0, 4)), ('month', slice(5, 7)), ('decade', slice(0, 3))):
+            self.codes[name], self.dictionaries[name] = encode([date[part] if date is not None else None
+                                                                for date in dates])
+        self.since_1970 = np.array([date is not None and date >= '1970' for date in dates], dtype=bool)
+        # Season per month dictionary entry, then per match through the month codes
+        season_codes, self.dictionaries['season'] = encode(
+            [SEASONS.get(month, 'Unknown') if month is not None else None for month in self.dictionaries['month']])
+        self.codes['season'] = season_codes[self.codes['month']]
+
+        # Per-team unpivot: side 1 is team1's row, side 2 is team2's
+        team1, team2 = self.codes['team1'], self.codes['team2']
+        self.team = np.concatenate([team1, team2])
+        self.side = np.repeat(np.array([1, 2], dtype=np.int32), len(team1))
+        self.won = (np.tile(self.codes['winner'], 2) == self.team) & (self.team != 0)
+        # Neither toss_won nor toss_lost when the toss winner is not known, where SQL's toss_won is NULL
+        toss_winner = np.tile(self.codes['toss_winner'], 2)
+        self.toss_won = (toss_winner == self.team) & (self.team != 0)
+        self.toss_lost = (toss_winner != self.team) & (toss_winner != 0) & (self.team != 0)
+
+    @classmethod
+    def load(cls, conn):
+        """Read the matches table from conn once"""
+        rows = conn.execute(f"SELECT date, {', '.join(TEAM_COLUMNS + CATEGORY_COLUMNS)} FROM matches").fetchall()
+        return cls(rows)
+
+    def __len__(self):
+        return len(self.codes['team1'])
+
+    def column(self, name):
+        return self.codes[name]
+
+    def team_column(self, name):
+        """A per-match column repeated for both team rows"""
+        return np.tile(self.codes[name], 2)
+
+    def decode(self, name, codes):
+        dictionary = np.array(self.dictionaries[name], dtype=object)
+        return dictionary[codes].tolist()
+
+def grouped(mask, keys, sizes, *weights):
+    """Count the rows selected by mask per combination of key codes
+
+    keys are code arrays with 0 <= code < size. Returns the key codes of
+    each non-empty group in ascending key order, the row counts and the
+    sum of each weights array, all as arrays aligned with the groups.
+    """
+    index = np.ravel_multi_index([key[mask] for key in keys], sizes)
+    total = int(np.prod(sizes))
+    if total <= DENSE_GROUPS_MAX:
+        counts = np.bincount(index, minlength=total)
+        present = np.flatnonzero(counts)
+        sums = [np.bincount(index, weights=weight[mask], minlength=total)[present].astype(np.int64)
+                for weight in weights]
+        counts = counts[present]
+    else:
+        present, inverse = np.unique(index, return_inverse=True)
+        counts = np.bincount(inverse)
+        sums = [np.bincount(inverse, weights=weight[mask]).astype(np.int64) for weight in weights]
+    return np.unravel_index(present, sizes), counts, sums
+
+def dictionary_size(m, name):
+    return len(m.dictionaries[name])
+
+def ordered(*sort_keys):
+    """Stable order of groups by sort_keys, the first key most significant
+
+    Ties keep ascending group order, as SQLite emits groups.
+    """
+    return np.lexsort(sort_keys[::-1])
+
+def sql_round(value, digits=2):
+    """ROUND(value, digits) as SQLite computes it: exact halves round away from zero"""
+    return float(Decimal(value).quantize(Decimal(1).scaleb(-digits), rounding=ROUND_HALF_UP))
+
+def percentages(part, whole):
+    """ROUND(part * 100.0 / whole, 2) for each group"""
+    return [sql_round(p * 100.0 / w) for p, w in zip(part.tolist(), whole.tolist())]
+
+def result(columns, *values):
+    return columns, [tuple(row) for row in zip(*values)]
+
+def count_by(m, name, mask, limit=None, order_by_key=False):
+    """SELECT name, COUNT(*) ... GROUP BY name ORDER BY count DESC (or name)"""
+    (codes,), counts, _ = grouped(mask, [m.column(name)], [dictionary_size(m, name)])
+    order = ordered(codes) if order_by_key else ordered(-counts)
+    order = order[:limit]
+    return m.decode(name, codes[order]), counts[order].tolist()
+
+def report_1(m):
+    return result(['match_type', 'matches'], *count_by(m, 'match_type', np.ones(len(m), dtype=bool)))
+
+def report_2(m):
+    return result(['year', 'matches'], *count_by(m, 'year', m.column('year') != 0, order_by_key=True))
+
+def report_3(m):
+    (team,), counts, _ = grouped(np.ones(len(m.team), dtype=bool), [m.team], [dictionary_size(m, 'team1')])
+    order = ordered(-counts)[:10]
+    return result(['team', 'matches_played'], m.decode('team1', team[order]), counts[order].tolist())
+
+def report_4(m):
+    return result(['winner', 'wins'], *count_by(m, 'winner', m.column('winner') != 0, limit=5))
+
+def team_win_rates(m, mask, min_count=None, min_wins=None):
+    """Groups of team rows under mask with counts, wins and win percentage, best first"""
+    (team,), counts, (wins,) = grouped(mask, [m.team], [dictionary_size(m, 'team1')], m.won)
+    keep = np.ones(len(team), dtype=bool)
+    if min_count is not None:
+        keep &= counts >= min_count
+    if min_wins is not None:
+        keep &= wins >= min_wins
+    team, counts, wins = team[keep], counts[keep], wins[keep]
+    rates = percentages(wins, counts)
+    order = ordered(-np.array(rates, dtype=float))[:10]
+    return m.decode('team1', team[order]), counts[order].tolist(), wins[order].tolist(), [rates[i] for i in order]
+
+def report_5(m):
+    team, counts, wins, rates = team_win_rates(m, np.ones(len(m.team), dtype=bool), min_count=20)
+    return result(['team', 'total_matches', 'wins', 'win_percentage'], team, counts, wins, rates)
+
+def report_6(m):
+    winner, match_type = m.column('winner'), m.column('match_type')
+    formats = m.dictionaries['match_type']
+    (codes, type_codes), counts, _ = grouped(winner != 0, [winner, match_type],
+                                             [dictionary_size(m, 'winner'), len(formats)])
+    table = np.zeros((dictionary_size(m, 'winner'), len(formats)), dtype=np.int64)
+    table[codes, type_codes] = counts
+    teams = np.unique(codes)
+    by_format = [table[teams, formats.index(name)] if name in formats else np.zeros(len(teams), dtype=np.int64)
+                 for name in ('test', 'odi', 't20')]
+    order = ordered(-sum(by_format))[:10]
+    return result(['team', 'test_wins', 'odi_wins', 't20_wins'], m.decode('winner', teams[order]),
+                  *[wins[order].tolist() for wins in by_format])
+
+def report_7(m):
+    winner, team1, team2 = m.column('winner'), m.column('team1'), m.column('team2')
+    size = dictionary_size(m, 'team1')
+    (codes,), counts, _ = grouped(winner != 0, [winner], [size])
+    top = np.zeros(size, dtype=bool)
+    top[codes[ordered(-counts)[:5]]] = True
+
+    mask = top[team1] & top[team2]
+    (first, second), counts, (first_wins, second_wins, no_result) = grouped(
+        mask, [team1, team2], [size, size], (winner == team1) & (winner != 0), (winner == team2) & (winner != 0),
+        winner == 0)
+    keep = counts >= 5
+    order = ordered(-counts[keep])
+    values = [array[keep][order] for array in (first, second, counts, first_wins, second_wins, no_result)]
+    return result(['team1', 'team2', 'total_matches', 'team1_wins', 'team2_wins', 'draws_or_ties'],
+                  m.decode('team1', values[0]), m.decode('team1', values[1]),
+                  *[array.tolist() for array in values[2:]])
+
+def report_8(m):
+    decision, match_type = m.column('toss_decision'), m.column('match_type')
+    (types, decisions), counts, _ = grouped(decision != 0, [match_type, decision],
+                                            [dictionary_size(m, 'match_type'), dictionary_size(m, 'toss_decision')])
+    order = ordered(types, -counts)
+    return result(['match_type', 'toss_decision', 'count'], m.decode('match_type', types[order]),
+                  m.decode('toss_decision', decisions[order]), counts[order].tolist())
+
+def report_9(m):
+    winner, toss = m.column('winner'), m.column('toss_winner')
+    (types,), counts, (toss_and_win,) = grouped((winner != 0) & (toss != 0), [m.column('match_type')],
+                                                [dictionary_size(m, 'match_type')], toss == winner)
+    rates = percentages(toss_and_win, counts)
+    order = ordered(-np.array(rates, dtype=float))
+    return result(['match_type', 'total_matches', 'toss_and_win', 'percentage'],
+                  m.decode('match_type', types[order]), counts[order].tolist(), toss_and_win[order].tolist(),
+                  [rates[i] for i in order])
+
+def report_10(m):
+    team, _, wins, rates = team_win_rates(m, m.toss_won, min_wins=10)
+    return result(['winner', 'wins_after_toss_win', 'win_percentage_when_toss_winner'], team, wins, rates)
+
+def report_11(m):
+    return result(['venue', 'matches_hosted'], *count_by(m, 'venue', m.column('venue') != 0, limit=10))
+
+def report_12(m):
+    # Grouped by side first, as the SQL is, so the team1 groups come before the team2 groups
+    sizes = [3, dictionary_size(m, 'venue'), dictionary_size(m, 'city'), dictionary_size(m, 'team1')]
+    (_, venue, city, team), counts, (wins,) = grouped(
+        np.ones(len(m.team), dtype=bool), [m.side, m.team_column('venue'), m.team_column('city'), m.team],
+        sizes, m.won)
+    keep = counts >= 10
+    venue, city, team, counts, wins = venue[keep], city[keep], team[keep], counts[keep], wins[keep]
+    rates = percentages(wins, counts)
+    order = ordered(-np.array(rates, dtype=float))[:10]
+    return result(['venue', 'city', 'team', 'total_matches', 'wins', 'win_percentage'],
+                  m.decode('venue', venue[order]), m.decode('city', city[order]), m.decode('team1', team[order]),
+                  counts[order].tolist(), wins[order].tolist(), [rates[i] for i in order])
+
+def report_13(m):
+    return result(['city', 'matches_hosted'], *count_by(m, 'city', m.column('city') != 0, limit=10))
+
+def report_14(m):
+    return result(['season', 'matches'], *count_by(m, 'season', m.column('year') != 0))
+
+def report_15(m):
+    (team, decade), counts, (wins,) = grouped(
+        np.tile(m.since_1970, 2), [m.team, m.team_column('decade')],
+        [dictionary_size(m, 'team1'), dictionary_size(m, 'decade')], m.won)
+    keep = counts >= 20
+    team, decade, counts, wins = team[keep], decade[keep], counts[keep], wins[keep]
+    rates = percentages(wins, counts)
+    order = ordered(decade, -np.array(rates, dtype=float))
+    return result(['team', 'decade', 'matches', 'wins', 'win_percentage'], m.decode('team1', team[order]),
+                  [f"{value}0s" for value in m.decode('decade', decade[order])], counts[order].tolist(),
+                  wins[order].tolist(), [rates[i] for i in order])
+
+def format_mask(m, name):
+    formats = m.dictionaries['match_type']
+    return m.column('match_type') == (formats.index(name) if name in formats else -1)
+
+def report_16(m):
+    winner, team1, team2 = m.column('winner'), m.column('team1'), m.column('team2')
+    (years,), counts, (team1_wins, team2_wins, draws) = grouped(
+        format_mask(m, 'test') & (m.column('year') != 0), [m.column('year')], [dictionary_size(m, 'year')],
+        (winner == team1) & (winner != 0), (winner == team2) & (winner != 0), winner == 0)
+    keep = counts >= 5
+    return result(['year', 'test_matches', 'team1_wins', 'team2_wins', 'draws'], m.decode('year', years[keep]),
+                  *[array[keep].tolist() for array in (counts, team1_wins, team2_wins, draws)])
+
+def format_winners(m, name, min_wins):
+    mask = format_mask(m, name) & (m.column('winner') != 0)
+    (winner,), counts, _ = grouped(mask, [m.column('winner')], [dictionary_size(m, 'winner')])
+    total = np.full(len(counts), mask.sum())
+    rates = percentages(counts, total)
+    keep = np.flatnonzero(counts >= min_wins)
+    order = keep[ordered(-counts[keep])][:10]
+    return m.decode('winner', winner[order]), counts[order].tolist(), [rates[i] for i in order]
+
+def report_17(m):
+    return result(['winner', 't20_wins', 'percentage_of_total_wins'], *format_winners(m, 't20', 10))
+
+def report_18(m):
+    return result(['winner', 'odi_wins', 'percentage_of_total_wins'], *format_winners(m, 'odi', 20))
+
+def report_19(m):
+    team, _, wins, rates = team_win_rates(m, m.toss_lost, min_wins=10)
+    return result(['winner', 'wins_without_toss', 'win_percentage_when_losing_toss'], team, wins, rates)
+
+def report_20(m):
+    venue, match_type = m.column('venue'), m.column('match_type')
+    (venues, types), _, _ = grouped(venue != 0, [venue, match_type],
+                                    [dictionary_size(m, 'venue'), dictionary_size(m, 'match_type')])
+    hosted, starts = np.unique(venues, return_index=True)
+    counts = np.diff(np.append(starts, len(venues)))
+    names = m.decode('match_type', types)
+    lists = [','.join(names[start:start + count]) for start, count in zip(starts.tolist(), counts.tolist())]
+    keep = np.flatnonzero(counts > 1)
+    order = keep[ordered(-counts[keep])]
+    return result(['venue', 'formats_hosted', 'format_list'], m.decode('venue', hosted[order]),
+                  counts[order].tolist(), [lists[i] for i in order])
+
+# Report number -> function computing (columns, rows) from a MatchArrays
+ARRAY_REPORTS = {num: globals()[f"report_{num}"] for num in range(1, 21)}
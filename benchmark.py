@@ -0,0 +1,440 @@
+import os
+import sys
+import json
+import sqlite3
+import time
+import argparse
+import platform
+import subprocess
+import urllib.request
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+from tabulate import tabulate
+
+import pandas as pd
+
+import process_data
+
+# Query plans and latencies recorded on the reference dataset, built with
+# `python benchmark.py pipeline --matches 20000 --max-overs 1`
+QUERY_BASELINE = "query_baseline.json"
+
+# A report regresses when it is slower than both baseline * tolerance and baseline + slack
+LATENCY_TOLERANCE = 2.0
+LATENCY_SLACK_MS = 1.0
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Pipeline stages run by bench_pipeline, each as its own process in the work directory
+PIPELINE_STAGES = {
+    "process": ["process_data.py", "--full", "--parquet"],
+    "db": ["db.py", "--rebuild"],
+    "queries": ["queries.py"],
+    "eda": ["eda.py"],
+}
+
+def time_call(func, items):
+    """Call func on every item and return (seconds, results)."""
+    start = time.perf_counter()
+    results = [func(item) for item in items]
+    return time.perf_counter() - start, results
+
+def full_load_record(file_path):
+    """Extract a match record the original way, by decoding the whole JSON or YAML document."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        match_data = process_data.load_match_document(f.read(), file_path)
+    return process_data.extract_match_record(match_data.get("info", {}), file_path)
+
+def bench_parse(data_dir=process_data.DATA_DIR):
+    """Compare full document decoding with the info-only parser per format folder and file type."""
+    rows = []
+    for fmt in sorted(os.listdir(data_dir)):
+        fmt_dir = os.path.join(data_dir, fmt)
+        if not os.path.isdir(fmt_dir):
+            continue
+        all_files = process_data.find_match_files(fmt_dir)
+        for kind, extensions in (("json", (".json",)), ("yaml", process_data.YAML_EXTENSIONS)):
+            files = [p for p in all_files if p.endswith(extensions)]
+            if not files:
+                continue
+            mb = sum(os.path.getsize(p) for p in files) / 1e6
+            full_time, full_records = time_call(full_load_record, files)
+            info_time, info_records = time_call(process_data.parse_match_file, files)
+            if full_records != info_records:
+                raise AssertionError(f"info-only parser disagrees with a full {kind} load in {fmt_dir}")
+            rows.append([fmt, kind, len(files), round(mb, 1), round(full_time, 3), round(info_time, 3),
+                         round(full_time / info_time, 1)])
+    print(tabulate(rows, headers=["format", "type", "files", "MB", "full load s", "info-only s", "speedup"],
+                   tablefmt='psql'))
+    return rows
+
+def bench_intermediate(columns=None):
+    """Compare loading processed matches from the CSV and the memory-mapped Parquet copy."""
+    import pyarrow.parquet as pq
+
+    start = time.perf_counter()
+    csv_df = pd.read_csv(process_data.OUTPUT_FILE, usecols=columns)
+    csv_time = time.perf_counter() - start
+    start = time.perf_counter()
+    parquet_df = pq.read_table(process_data.OUTPUT_PARQUET, columns=columns, memory_map=True).to_pandas()
+    parquet_time = time.perf_counter() - start
+
+    rows = [
+        ["csv", round(os.path.getsize(process_data.OUTPUT_FILE) / 1e6, 2), round(csv_time, 4),
+         round(csv_df.memory_usage(deep=True).sum() / 1e6, 2)],
+        ["parquet", round(os.path.getsize(process_data.OUTPUT_PARQUET) / 1e6, 2), round(parquet_time, 4),
+         round(parquet_df.memory_usage(deep=True).sum() / 1e6, 2)],
+    ]
+    print(tabulate(rows, headers=["intermediate", "file MB", "load s", "DataFrame MB"], tablefmt='psql'))
+    return rows
+
+def bench_queries(db_file, repeat=3):
+    """Time every report as queries.plan_query would run it, best of repeat runs."""
+    import queries
+
+    conn = sqlite3.connect(db_file)
+    available = queries.rollup_sets(conn)
+    rows = []
+    for num, title in queries.QUERIES.items():
+        sql = queries.plan_query(num, available)
+        source = "base" if sql is queries.SQL_STATEMENTS[num] else "rollup"
+        best = min(time_call(lambda query: conn.execute(query).fetchall(), [sql])[0] for _ in range(repeat))
+        rows.append([num, title, source, round(best * 1000, 2)])
+    conn.close()
+    rows.append(["", "total", "", round(sum(row[3] for row in rows), 2)])
+    print(tabulate(rows, headers=["query", "title", "source", "ms"], tablefmt='psql'))
+    return rows
+
+def scaled_database(db_file, scale, path):
+    """Build a database at path holding scale copies of db_file's matches, laid out as db.py does."""
+    import db
+
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path, isolation_level=None, uri=True)
+    for pragma in db.BULK_LOAD_PRAGMAS:
+        conn.execute(pragma)
+    # Read-only, and detached before anything else is built: db's unqualified
+    # DDL would otherwise resolve to tables in the source database
+    conn.execute("ATTACH DATABASE ? AS source", (f"file:{db_file}?mode=ro",))
+    conn.execute("BEGIN")
+    conn.execute(f"CREATE TABLE main.matches {db.MATCHES_SCHEMA}")
+    columns = ', '.join(db.MATCH_COLUMNS)
+    for copy in range(scale):
+        conn.execute(f"INSERT INTO main.matches (match_key, {columns}) "
+                     f"SELECT match_key || '#{copy}', {columns} FROM source.matches")
+    conn.execute("COMMIT")
+    conn.execute("DETACH DATABASE source")
+
+    conn.execute("BEGIN")
+    conn.execute(f"CREATE TABLE team_matches {db.TEAM_MATCHES_SCHEMA}")
+    conn.execute(f"INSERT INTO team_matches {db.TEAM_MATCHES_SELECT.format(where='')}")
+    db.create_rollups(conn)
+    db.update_rollups(conn)
+    db.create_indexes(conn, 'matches', db.MATCH_INDEXES)
+    db.create_indexes(conn, 'team_matches', db.TEAM_MATCH_INDEXES)
+    conn.execute("COMMIT")
+    conn.execute("ANALYZE")
+    return conn
+
+def bench_engine(db_file, scales=(1, 10, 100), repeat=3, workdir="engine_benchmark"):
+    """Compare the SQLite reports with array_engine on db_file's matches copied scale times.
+
+    For each scale, times the base and rollup statements, loading
+    MatchArrays and computing all 20 reports from them, each best of
+    repeat, and checks the arrays give the same rows as the base SQL.
+    """
+    import queries
+    import array_engine
+
+    os.makedirs(workdir, exist_ok=True)
+    rows = []
+    for scale in scales:
+        path = os.path.join(workdir, f"scaled_{scale}x.db")
+        conn = scaled_database(db_file, scale, path)
+        matches = conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+        available = queries.rollup_sets(conn)
+
+        def total(statements):
+            return sum(min(time_call(lambda query: conn.execute(query).fetchall(), [sql])[0] for _ in range(repeat))
+                       for sql in statements)
+        base_seconds = total(queries.SQL_STATEMENTS.values())
+        rollup_seconds = total(queries.plan_query(num, available) for num in queries.QUERIES)
+        load_seconds, (arrays,) = min((time_call(array_engine.MatchArrays.load, [conn]) for _ in range(repeat)),
+                                      key=lambda timing: timing[0])
+        array_seconds = sum(min(time_call(report, [arrays])[0] for _ in range(repeat))
+                            for report in array_engine.ARRAY_REPORTS.values())
+        identical = all(array_engine.ARRAY_REPORTS[num](arrays) == queries.fetch_result(conn, sql)
+                        for num, sql in queries.SQL_STATEMENTS.items())
+        conn.close()
+        os.remove(path)
+        rows.append([f"{scale}x", matches, round(base_seconds * 1000, 1), round(rollup_seconds * 1000, 1),
+                     round(load_seconds * 1000, 1), round(array_seconds * 1000, 1), identical])
+    print(tabulate(rows, headers=["scale", "matches", "sqlite base ms", "sqlite rollup ms", "numpy load ms",
+                                  "numpy reports ms", "identical"], tablefmt='psql'))
+    return rows
+
+def query_plan(conn, sql):
+    """Return the EXPLAIN QUERY PLAN detail lines of sql."""
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+
+def full_scans(plan, tables):
+    """Return the plan lines that read every row of a table, directly or through an index."""
+    return [line for line in plan if line.startswith("SCAN ") and line.split()[1] in tables]
+
+def profile_queries(conn, repeat=5):
+    """Capture the plan and best-of-repeat latency of every base and rollup statement."""
+    import queries
+
+    statements = {f"base {num}": sql for num, sql in queries.SQL_STATEMENTS.items()}
+    statements.update({f"rollup {num}": sql for num, (_, sql) in queries.ROLLUP_STATEMENTS.items()})
+    profile = {}
+    for name, sql in statements.items():
+        best = min(time_call(lambda query: conn.execute(query).fetchall(), [sql])[0] for _ in range(repeat))
+        profile[name] = {"plan": query_plan(conn, sql), "ms": round(best * 1000, 3)}
+    return profile
+
+def check_query_plans(db_file, baseline_file=QUERY_BASELINE, repeat=5, update=False):
+    """Compare plans and latencies with the stored baseline; return True if nothing regressed.
+
+    A statement fails if its plan gained a full table scan that the baseline
+    plan did not have, or, when the database holds the same number of
+    matches as the baseline dataset, if it got slower than the latency
+    tolerance allows. update=True records a new baseline instead.
+    """
+    conn = sqlite3.connect(db_file)
+    tables = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+    dataset = {"matches": conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0]}
+    profile = profile_queries(conn, repeat)
+    conn.close()
+
+    if update:
+        with open(baseline_file, 'w', encoding='utf-8') as f:
+            json.dump({"dataset": dataset, "queries": profile}, f, indent=2)
+        print(f"Recorded {len(profile)} query plans and latencies in {baseline_file}")
+        return True
+
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    compare_latency = baseline["dataset"] == dataset
+    if not compare_latency:
+        print(f"Dataset {dataset} differs from the baseline's {baseline['dataset']}; checking plans only")
+
+    rows, failures = [], []
+    for name, entry in profile.items():
+        expected = baseline["queries"].get(name, {"plan": [], "ms": None})
+        problems = [f"full scan: {line}" for line in
+                    sorted(set(full_scans(entry["plan"], tables)) - set(full_scans(expected["plan"], tables)))]
+        if compare_latency and expected["ms"] is not None:
+            limit = max(expected["ms"] * LATENCY_TOLERANCE, expected["ms"] + LATENCY_SLACK_MS)
+            if entry["ms"] > limit:
+                problems.append(f"{entry['ms']} ms over the {limit:.3f} ms limit")
+        failures += [f"{name}: {problem}" for problem in problems]
+        rows.append([name, entry["ms"], expected["ms"], "FAIL" if problems else "ok"])
+    print(tabulate(rows, headers=["statement", "ms", "baseline ms", "status"], tablefmt='psql'))
+    for failure in failures:
+        print(failure)
+    return not failures
+
+def run_stage(script_args, cwd, log_file, env=None):
+    """Run a repo script in cwd and return its wall time, CPU time and peak RSS.
+
+    The script runs as a child process so that its peak RSS can be read
+    from the rusage os.wait4() returns for that child alone.
+    """
+    start = time.perf_counter()
+    with open(log_file, 'w', encoding='utf-8') as log:
+        process = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, script_args[0])] + script_args[1:],
+                                   cwd=cwd, stdout=log, stderr=subprocess.STDOUT, env=env)
+        _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        "seconds": round(time.perf_counter() - start, 3),
+        "cpu_seconds": round(usage.ru_utime + usage.ru_stime, 3),
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),  # ru_maxrss is in KiB on Linux
+        "exit_code": process.returncode,
+    }
+
+def bench_pipeline(matches, workdir, seed=0, yaml_fraction=0.1, max_overs=None, workers=None, deliveries=False,
+                   generate=True):
+    """Run the pipeline end to end on a synthetic corpus and return a JSON-ready report.
+
+    The corpus is generated with synthetic_data into workdir's
+    cricsheet_data folder, then every PIPELINE_STAGES script runs there
+    in turn, process_data with --deliveries if deliveries is set. Each
+    stage reports wall and CPU seconds, peak RSS and
+    matches per second; the process stage also reports MB/s of match
+    files read. Stages after a failed one are skipped.
+    """
+    import synthetic_data
+
+    corpus = os.path.join(workdir, process_data.DATA_DIR)
+    os.makedirs(workdir, exist_ok=True)
+    report = {
+        "matches": matches,
+        "seed": seed,
+        "yaml_fraction": yaml_fraction,
+        "max_overs": max_overs,
+        "deliveries": deliveries,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "cpus": os.cpu_count(),
+        "stages": {},
+    }
+
+    if generate:
+        args = ["synthetic_data.py", corpus, "--matches", str(matches), "--seed", str(seed),
+                "--yaml-fraction", str(yaml_fraction)]
+        if max_overs:
+            args += ["--max-overs", str(max_overs)]
+        if workers:
+            args += ["--workers", str(workers)]
+        report["stages"]["generate"] = run_stage(args, workdir, os.path.join(workdir, "generate.log"))
+    report["corpus_mb"] = round(sum(os.path.getsize(path) for folder in synthetic_data.FORMATS
+                                    for path in process_data.find_match_files(os.path.join(corpus, folder)))
+                                / 1e6, 1)
+
+    env = dict(os.environ, MPLBACKEND="Agg")
+    for name, args in PIPELINE_STAGES.items():
+        if any(stage["exit_code"] for stage in report["stages"].values()):
+            break
+        if name == "process":
+            args = args + (["--workers", str(workers)] if workers else []) + (["--deliveries"] if deliveries else [])
+        report["stages"][name] = run_stage(args, workdir, os.path.join(workdir, f"{name}.log"), env)
+
+    for name, stage in report["stages"].items():
+        stage["matches_per_second"] = round(matches / stage["seconds"], 1) if stage["seconds"] else None
+        if name == "process":
+            stage["mb_per_second"] = round(report["corpus_mb"] / stage["seconds"], 1) if stage["seconds"] else None
+    report["total_seconds"] = round(sum(stage["seconds"] for stage in report["stages"].values()), 3)
+    return report
+
+def service_requests(url, count, seed=0):
+    """Build count report URLs mixing the 20 reports with format, year and team filters."""
+    import random
+    import queries
+
+    with urllib.request.urlopen(f"{url}/reports/3") as response:
+        teams = [row[0] for row in json.load(response)["rows"]]
+    filters = [{}, {"format": "odi"}, {"format": "t20", "year_from": 2010}, {"year_from": 2000, "year_to": 2009}]
+    filters += [{"team": team} for team in teams[:3]]
+    rng = random.Random(seed)
+    return [f"{url}/reports/{rng.choice(list(queries.QUERIES))}?{urlencode(rng.choice(filters))}"
+            for _ in range(count)]
+
+def timed_request(request_url, scheduled):
+    """GET request_url and return (seconds since it was scheduled, status, cache header)."""
+    try:
+        with urllib.request.urlopen(request_url) as response:
+            response.read()
+            status, cache = response.status, response.headers.get("X-Cache")
+    except urllib.error.HTTPError as e:
+        status, cache = e.code, None
+    except OSError:
+        status, cache = None, None
+    return time.perf_counter() - scheduled, status, cache
+
+def bench_service(url, rate=50, duration=10, workers=32, seed=0):
+    """Load-test a running service.py at a fixed request rate and report latency percentiles.
+
+    Requests are sent on a fixed schedule whether or not earlier ones have
+    finished, and latency is measured from each request's scheduled time,
+    so a service that falls behind shows it in p99 instead of slowing the
+    load down.
+    """
+    urls = service_requests(url.rstrip('/'), int(rate * duration), seed)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for i, request_url in enumerate(urls):
+            scheduled = start + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(timed_request, request_url, scheduled))
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    latencies = pd.Series([seconds * 1000 for seconds, _, _ in results])
+    report = {
+        "requests": len(results),
+        "target_rate": rate,
+        "achieved_rate": round(len(results) / elapsed, 1),
+        "errors": sum(status != 200 for _, status, _ in results),
+        "cache_hits": sum(cache == "hit" for _, _, cache in results),
+        "p50_ms": round(latencies.quantile(0.5), 2),
+        "p90_ms": round(latencies.quantile(0.9), 2),
+        "p99_ms": round(latencies.quantile(0.99), 2),
+        "max_ms": round(latencies.max(), 2),
+    }
+    print(tabulate(report.items(), headers=["metric", "value"], tablefmt='psql'))
+    return report
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmarks for the cricket analysis pipeline")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    parse_parser = subparsers.add_parser("parse", help="full vs info-only match file parsing")
+    parse_parser.add_argument("--data-dir", default=process_data.DATA_DIR)
+    intermediate_parser = subparsers.add_parser("intermediate", help="CSV vs Parquet processed matches")
+    intermediate_parser.add_argument("--columns", nargs="*", default=None,
+                                     help="only load these columns")
+    queries_parser = subparsers.add_parser("queries", help="latency of the queries.py reports")
+    queries_parser.add_argument("--db", default="cricket_analytics.db")
+    queries_parser.add_argument("--repeat", type=int, default=3)
+    engine_parser = subparsers.add_parser("engine", help="SQLite vs the NumPy array engine at larger volumes")
+    engine_parser.add_argument("--db", default="cricket_analytics.db")
+    engine_parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100],
+                               help="copies of the database's matches to benchmark on")
+    engine_parser.add_argument("--repeat", type=int, default=3)
+    engine_parser.add_argument("--workdir", default="engine_benchmark", help="where scaled databases are built")
+    plans_parser = subparsers.add_parser("plans", help="check query plans and latency against a baseline")
+    plans_parser.add_argument("--db", default="cricket_analytics.db")
+    plans_parser.add_argument("--baseline", default=QUERY_BASELINE)
+    plans_parser.add_argument("--repeat", type=int, default=5)
+    plans_parser.add_argument("--update", action="store_true", help="record a new baseline")
+    pipeline_parser = subparsers.add_parser("pipeline", help="end-to-end run on a synthetic corpus")
+    pipeline_parser.add_argument("--matches", type=int, default=1000)
+    pipeline_parser.add_argument("--workdir", default="pipeline_benchmark",
+                                 help="where the corpus, outputs and stage logs are written")
+    pipeline_parser.add_argument("--seed", type=int, default=0)
+    pipeline_parser.add_argument("--yaml-fraction", type=float, default=0.1)
+    pipeline_parser.add_argument("--max-overs", type=int, default=None,
+                                 help="store at most this many overs per innings")
+    pipeline_parser.add_argument("--workers", type=int, default=None)
+    pipeline_parser.add_argument("--deliveries", action="store_true",
+                                 help="also build and load the ball-by-ball deliveries dataset")
+    pipeline_parser.add_argument("--skip-generate", action="store_true",
+                                 help="reuse the corpus already in the work directory")
+    pipeline_parser.add_argument("--output", default=None, help="also write the JSON report here")
+    service_parser = subparsers.add_parser("service", help="load-test a running service.py at a fixed rate")
+    service_parser.add_argument("--url", default="http://127.0.0.1:8000")
+    service_parser.add_argument("--rate", type=float, default=50, help="requests per second")
+    service_parser.add_argument("--duration", type=float, default=10, help="seconds")
+    service_parser.add_argument("--workers", type=int, default=32, help="concurrent client threads")
+    service_parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.benchmark == "parse":
+        bench_parse(args.data_dir)
+    elif args.benchmark == "intermediate":
+        bench_intermediate(args.columns)
+    elif args.benchmark == "queries":
+        bench_queries(args.db, args.repeat)
+    elif args.benchmark == "engine":
+        bench_engine(args.db, args.scales, args.repeat, args.workdir)
+    elif args.benchmark == "plans":
+        if not check_query_plans(args.db, args.baseline, args.repeat, args.update):
+            sys.exit(1)
+    elif args.benchmark == "pipeline":
+        report = bench_pipeline(args.matches, args.workdir, args.seed, args.yaml_fraction, args.max_overs,
+                                args.workers, args.deliveries, generate=not args.skip_generate)
+        print(json.dumps(report, indent=2))
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+        if any(stage["exit_code"] for stage in report["stages"].values()):
+            sys.exit(1)
+    elif args.benchmark == "service":
+        bench_service(args.url, args.rate, args.duration, args.workers, args.seed)
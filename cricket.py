@@ -0,0 +1,90 @@
+import sys
+import uuid
+import argparse
+import importlib
+
+import instrumentation
+
+# Subcommand -> (module, function adding its options, function running it, help).
+# A module is only imported when its subcommand runs, so `cricket query`
+# does not pay for yaml, pyarrow or matplotlib.
+COMMANDS = {
+    "fetch": ("scrape_cricsheet", "add_arguments", "main", "download the Cricsheet archives"),
+    "convert": ("scrape_cricsheet", "add_convert_arguments", "convert_main", "rewrite extracted YAML matches as JSON"),
+    "ingest": ("process_data", "add_arguments", "main", "extract match records into processed_matches"),
+    "load": ("db", "add_arguments", "main", "create or update the SQLite database"),
+    "query": ("queries", "add_arguments", "main", "print the analytical reports"),
+    "plot": ("eda", "add_arguments", "main", "draw the exploratory analysis charts"),
+}
+
+# The stages `cricket all` runs, each with its default options plus these
+ALL_STAGES = {
+    "fetch": [],
+    "ingest": ["--parquet"],
+    "load": [],
+    "query": [],
+    "plot": [],
+}
+
+def command_parser(name, parser=None):
+    """Import name's module and add its options to parser; return (parser, module)"""
+    module_name, add_arguments, _, help_text = COMMANDS[name]
+    module = importlib.import_module(module_name)
+    parser = parser or argparse.ArgumentParser(prog=f"cricket {name}", description=help_text)
+    getattr(module, add_arguments)(parser)
+    return parser, module
+
+def run_command(name, args, options, run_id=None):
+    """Run name's command with its parsed args as one instrumented stage
+
+    options carries the cricket-level run log and profiler settings.
+    """
+    with instrumentation.Stage(name, run_id, options.run_log, options.profile):
+        module = importlib.import_module(COMMANDS[name][0])
+        getattr(module, COMMANDS[name][2])(args)
+
+def run_all(args):
+    """Run the pipeline from download to charts, logging every stage under one run id"""
+    run_id = uuid.uuid4().hex[:12]
+    for name, stage_args in ALL_STAGES.items():
+        if name == "fetch" and args.skip_fetch:
+            continue
+        if name == "fetch" and args.base_url:
+            stage_args = stage_args + ["--base-url", args.base_url]
+        print(f"\n=== cricket {name} ===")
+        parser, _ = command_parser(name)
+        run_command(name, parser.parse_args(stage_args), args, run_id)
+
+def build_parser(command=None):
+    """The cricket parser, with the options of command's module only"""
+    parser = argparse.ArgumentParser(prog="cricket", description="Cricsheet match data pipeline")
+    instrumentation.add_arguments(parser)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (_, _, _, help_text) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text, description=help_text)
+        if name == command:
+            command_parser(name, subparser)
+    all_parser = subparsers.add_parser("all", help="run fetch, ingest, load, query and plot in turn")
+    all_parser.add_argument("--base-url", default=None, help="download directly from this URL")
+    all_parser.add_argument("--skip-fetch", action="store_true", help="start from the files already downloaded")
+    return parser
+
+def find_command(argv):
+    """The first positional argument once the cricket-level options and their values are skipped"""
+    parser = argparse.ArgumentParser(add_help=False)
+    instrumentation.add_arguments(parser)
+    parser.add_argument("command", nargs="?")
+    parser.add_argument("command_args", nargs=argparse.REMAINDER)
+    return parser.parse_known_args(argv)[0].command
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    # An unknown or missing command is reported by the full parser with its usage
+    args = build_parser(find_command(argv)).parse_args(argv)
+    if args.command == "all":
+        run_all(args)
+    else:
+        run_command(args.command, args, args)
+
+if __name__ == "__main__":
+    main()
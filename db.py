@@ -1,74 +1,589 @@
-import pandas as pd
-from sqlalchemy import create_engine, inspect
+import os
+import sys
+import time
+import argparse
+import uuid
+import hashlib
+import sqlite3
+from itertools import islice
+from collections import defaultdict
+import queries
+import head_to_head
+import instrumentation
+from match_batch import MATCH_COLUMNS, MatchBatch
+from process_data import DELIVERIES_DIR, OUTPUT_PARQUET, match_key
 
-def create_match_dataframes():
-    """Load CSV and create separate DataFrames for each match type"""
+# SQLite database file
+DB_FILE = 'cricket_analytics.db'
+
+# Rows per executemany() call while bulk loading
+BATCH_SIZE = 10_000
+
+# Rows read per batch when loading the deliveries dataset
+DELIVERY_BATCH_SIZE = 100_000
+
+# Durability is traded for speed while the database is rebuilt from scratch
+BULK_LOAD_PRAGMAS = [
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA cache_size = -262144",  # 256 MiB
+    "PRAGMA temp_store = MEMORY",
+]
+
+MATCH_FORMATS = ['test', 'odi', 't20']
+
+# Per-format views over the matches table, kept for code written against
+# the original one-table-per-format layout
+MATCH_VIEWS = {'test_matches': 'test', 'odi_matches': 'odi', 't20_matches': 't20'}
+
+MATCHES_SCHEMA = """(
+    match_id INTEGER PRIMARY KEY,
+    match_key TEXT NOT NULL UNIQUE,
+    file_name TEXT,
+    match_type TEXT,
+    team1 TEXT,
+    team2 TEXT,
+    date TEXT,
+    venue TEXT,
+    city TEXT,
+    toss_winner TEXT,
+    toss_decision TEXT,
+    winner TEXT
+)"""
+
+# One row per team per match, maintained from matches at load time
+TEAM_MATCHES_SCHEMA = """(
+    match_id INTEGER NOT NULL,
+    team TEXT,
+    opponent TEXT,
+    match_type TEXT,
+    date TEXT,
+    venue TEXT,
+    city TEXT,
+    side INTEGER NOT NULL,
+    toss_won INTEGER,
+    won INTEGER NOT NULL
+)"""
+
+# side is 1 for the team1 row and 2 for the team2 row; toss_won is NULL
+# when the toss winner is not known, so it counts as neither won nor lost
+TEAM_MATCHES_SELECT = """
+    SELECT match_id, team1, team2, match_type, date, venue, city, 1,
+           CASE WHEN toss_winner IS NOT NULL THEN toss_winner = team1 END, COALESCE(winner = team1, 0)
+    FROM matches {where}
+    UNION ALL
+    SELECT match_id, team2, team1, match_type, date, venue, city, 2,
+           CASE WHEN toss_winner IS NOT NULL THEN toss_winner = team2 END, COALESCE(winner = team2, 0)
+    FROM matches {where}
+"""
+
+# Pre-aggregated counts for the reports. Each rollup table holds several
+# grouping sets, one row per distinct combination of the set's dimensions,
+# keyed by (grouping_set, key) where key is the quoted dimension values.
+# Dimensions outside a row's grouping set are NULL.
+ROLLUPS = {
+    'match_rollup': {
+        'source': 'matches',
+        'dimensions': {
+            'match_type': 'match_type',
+            'year': 'SUBSTR(date, 1, 4)',
+            'month': 'SUBSTR(date, 6, 2)',
+            'venue': 'venue',
+            'city': 'city',
+            'toss_decision': 'toss_decision',
+            'winner': 'winner',
+            # 1 or 2 when team1 or team2 won, 0 for any other winner, NULL for no result
+            'winner_side': 'CASE WHEN winner = team1 THEN 1 WHEN winner = team2 THEN 2 '
+                           'WHEN winner IS NOT NULL THEN 0 END',
+            # NULL unless both the toss winner and the match winner are known
+            'toss_won': 'CASE WHEN toss_winner IS NOT NULL AND winner IS NOT NULL '
+                        'THEN toss_winner = winner END',
+        },
+        'measures': {'matches': 'COUNT(*)'},
+        'sets': {
+            'format_toss': ['match_type', 'toss_decision'],                   # 1, 8
+            'year_month': ['year', 'month'],                                  # 2, 14
+            'winner': ['match_type', 'winner', 'toss_won'],                   # 4, 6, 7, 9, 17, 18
+            'venue': ['venue', 'match_type'],                                 # 11, 20
+            'city': ['city'],                                                 # 13
+            'results': ['match_type', 'year', 'winner_side'],                 # 16
+        },
+    },
+    'team_rollup': {
+        'source': 'team_matches',
+        'dimensions': {
+            'team': 'team',
+            'side': 'side',
+            'year': 'SUBSTR(date, 1, 4)',
+            'venue': 'venue',
+            'city': 'city',
+            # NULL when the toss winner is not known, as in team_matches
+            'toss_won': 'toss_won',
+        },
+        'measures': {'matches': 'COUNT(*)', 'wins': 'SUM(won)', 'toss_wins': 'COALESCE(SUM(toss_won), 0)'},
+        'sets': {
+            'team': ['team'],                                                 # 3, 5
+            'team_toss': ['team', 'toss_won'],                                # 10, 19
+            'team_year': ['team', 'year'],                                    # 15
+            'venue_team': ['venue', 'city', 'team', 'side'],                  # 12
+        },
+    },
+}
+
+# Covering indexes for the queries.py workload (numbers are the
+# SQL_STATEMENTS keys each one serves)
+MATCH_INDEXES = {
+    'type_toss': ['match_type', 'toss_decision'],                            # 1, 8
+    'type_toss_winner': ['match_type', 'toss_winner', 'winner'],             # 9
+    'type_winner': ['match_type', 'winner'],                                 # 6, 17, 18
+    'type_date': ['match_type', 'date', 'team1', 'team2', 'winner'],         # 16
+    'date': ['date'],                                                        # 2, 14
+    'teams': ['team1', 'team2', 'winner'],                                   # 7
+    'winner': ['winner', 'toss_winner', 'match_type'],                       # 4, 6, 7
+    'venue': ['venue', 'match_type'],                                        # 11, 20
+    'city': ['city'],                                                        # 13
+}
+
+TEAM_MATCH_INDEXES = {
+    'team': ['team', 'date', 'won'],                                         # 3, 5, 15
+    'toss': ['toss_won', 'team', 'won'],                                     # 10, 19
+    'venue': ['side', 'venue', 'city', 'team', 'won'],                       # 12
+    'match': ['match_id'],
+}
+
+DELIVERY_TABLE_SCHEMA = """(
+    match_key TEXT,
+    innings INTEGER,
+    over INTEGER,
+    ball INTEGER,
+    batting_team TEXT,
+    batter TEXT,
+    bowler TEXT,
+    batter_runs INTEGER,
+    extras INTEGER,
+    runs INTEGER,
+    wicket_kind TEXT,
+    player_out TEXT
+)"""
+
+DELIVERY_INDEXES = {
+    'match': ['match_key', 'innings', 'over', 'ball'],
+    'batter': ['batter'],
+    'bowler': ['bowler'],
+}
+
+def load_processed_matches():
+    """Load the processed matches as a MatchBatch, memory-mapping the Parquet copy when there is one
+
+    Dates come back as ISO text either way, so the SUBSTR(date, ...)
+    queries keep working.
+    """
+    if not os.path.exists(OUTPUT_PARQUET):
+        instrumentation.count(bytes_read=os.path.getsize("processed_matches.csv"))
+        return MatchBatch.read_csv("processed_matches.csv")
+    instrumentation.count(bytes_read=os.path.getsize(OUTPUT_PARQUET))
+    return MatchBatch.read_parquet(OUTPUT_PARQUET)
+
+def stable_match_id(file_name):
+    """Derive a match_id that stays the same across loads and formats
+
+    Cricsheet file names are numeric match IDs, which are used as they are.
+    Any other name is hashed into a range above them.
+    """
+    key = match_key(file_name)
+    if key.isdigit():
+        return int(key)
+    return (1 << 62) + int(hashlib.sha1(key.encode('utf-8')).hexdigest()[:15], 16)
+
+def load_matches():
+    """Load processed matches for the supported formats"""
     # Load the processed data
-    df = pd.read_csv("processed_matches.csv")
-    
-    # Clean match_type values (handle case variations)
-    df['match_type'] = df['match_type'].str.lower().str.strip()
-    
-    # Create separate DataFrames
-    test_matches = df[df['match_type'] == 'test'].copy()
-    odi_matches = df[df['match_type'] == 'odi'].copy()
-    t20_matches = df[df['match_type'] == 't20'].copy()
+    matches = load_processed_matches()
     
-    # Add match_id as primary key to each DataFrame
-    for df_match in [test_matches, odi_matches, t20_matches]:
-        df_match.insert(0, 'match_id', range(1, len(df_match) + 1))
-    
-    return test_matches, odi_matches, t20_matches
+    # Clean match_type values (handle case variations), once per distinct value
+    matches.recode('match_type', lambda match_type: match_type.lower().strip())
+    return matches.take(matches.isin('match_type', MATCH_FORMATS).nonzero()[0])
 
-def create_database(test_matches, odi_matches, t20_matches):
-    """Create SQL database with separate tables for each match type"""
-    # Create SQLAlchemy engine (SQLite)
-    engine = create_engine('sqlite:///cricket_analytics.db')
-    
-    # Write DataFrames to database
-    test_matches.to_sql('test_matches', engine, if_exists='replace', index=False)
-    odi_matches.to_sql('odi_matches', engine, if_exists='replace', index=False)
-    t20_matches.to_sql('t20_matches', engine, if_exists='replace', index=False)
-    
-    return engine
+def duplicate_match_keys(matches):
+    """Map each match_key more than one of matches shares to the file names sharing it"""
+    file_names = defaultdict(list)
+    for file_name in matches.file_names:
+        file_names[match_key(file_name)].append(file_name)
+    return {key: names for key, names in file_names.items() if len(names) > 1}
+
+def match_rows(matches):
+    """Yield the matches as (match_id, match_key, *MATCH_COLUMNS) rows with missing values as None
+
+    match_id is a stable primary key derived from the file name.
+    """
+    for row in matches.rows():
+        yield (stable_match_id(row[0]), match_key(row[0])) + row
+
+def insert_rows(conn, table, columns, rows, batch_size=BATCH_SIZE):
+    """Insert rows into table with one executemany() per batch"""
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        conn.executemany(sql, batch)
+
+def create_indexes(conn, table, indexes):
+    """Create the named indexes on a table"""
+    for name, columns in indexes.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{name} ON {table} ({', '.join(columns)})")
+
+def record_load(conn, changed=True):
+    """Count another load of the data in db_meta if anything changed
+
+    db_meta also holds a random database_id created with the table, so the
+    (database_id, load_generation) fingerprint queries.py caches results
+    under changes whenever the data may have, even if the file is replaced.
+    """
+    conn.execute("CREATE TABLE IF NOT EXISTS db_meta (key TEXT PRIMARY KEY, value)")
+    conn.execute("INSERT OR IGNORE INTO db_meta VALUES ('database_id', ?)", (uuid.uuid4().hex,))
+    conn.execute("INSERT OR IGNORE INTO db_meta VALUES ('load_generation', 0)")
+    if changed:
+        conn.execute("UPDATE db_meta SET value = value + 1 WHERE key = 'load_generation'")
+
+def has_current_schema(conn):
+    """True if matches, team_matches and the rollups exist in their current form"""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(matches)")]
+    # name -> NOT NULL flag
+    team_columns = {row[1]: row[3] for row in conn.execute("PRAGMA table_info(team_matches)")}
+    rollups = all(
+        {row[1] for row in conn.execute(f"PRAGMA table_info({table})")} >= set(rollup['dimensions'])
+        for table, rollup in ROLLUPS.items())
+    return 'match_key' in columns and 'side' in team_columns and team_columns.get('toss_won') == 0 and rollups
+
+def drop_object(conn, name):
+    """Drop a table or view by name, whichever it currently is"""
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    if row:
+        conn.execute(f"DROP {row[0].upper()} {name}")
+
+def create_views(conn):
+    """Create the per-format views over matches"""
+    for view, match_type in MATCH_VIEWS.items():
+        drop_object(conn, view)
+        conn.execute(f"CREATE VIEW {view} AS SELECT * FROM matches WHERE match_type = '{match_type}'")
 
-def verify_database(engine):
+def create_rollups(conn):
+    """Create the empty rollup tables"""
+    for table, rollup in ROLLUPS.items():
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        # Dimension columns are left untyped and keep the type of their expression
+        columns = list(rollup['dimensions']) + [f"{name} INTEGER NOT NULL" for name in rollup['measures']]
+        conn.execute(f"""
+            CREATE TABLE {table} (
+                grouping_set TEXT NOT NULL,
+                key TEXT NOT NULL,
+                {', '.join(columns)},
+                PRIMARY KEY (grouping_set, key)
+            ) WITHOUT ROWID
+        """)
+
+def update_rollups(conn, where='1', sign=1):
+    """Add (sign=1) or retract (sign=-1) the source rows matching where in every rollup
+
+    Counts are merged into existing rows with an upsert on (grouping_set,
+    key), and rows whose count drops to zero are deleted.
+    """
+    for table, rollup in ROLLUPS.items():
+        dimensions, measures = rollup['dimensions'], rollup['measures']
+        for name, group in rollup['sets'].items():
+            expressions = [dimensions[d] for d in group]
+            key = " || ',' || ".join(f"quote({e})" for e in expressions)
+            columns = ['grouping_set', 'key'] + group + list(measures)
+            values = [f"'{name}'", key] + expressions + [f"{sign} * {m}" for m in measures.values()]
+            merge = ', '.join(f"{m} = {m} + excluded.{m}" for m in measures)
+            conn.execute(f"""
+                INSERT INTO {table} ({', '.join(columns)})
+                SELECT {', '.join(values)} FROM {rollup['source']}
+                WHERE {where}
+                GROUP BY {', '.join(expressions)}
+                ON CONFLICT (grouping_set, key) DO UPDATE SET {merge}
+            """)
+        if sign < 0:
+            conn.execute(f"DELETE FROM {table} WHERE matches = 0")
+
+def rebuild_tables(conn, matches):
+    """Drop and bulk-load every table in one transaction with BULK_LOAD_PRAGMAS"""
+    for pragma in BULK_LOAD_PRAGMAS:
+        conn.execute(pragma)
+
+    conn.execute("BEGIN")
+    for name in list(MATCH_VIEWS) + list(ROLLUPS) + ['team_matches', 'matches']:
+        drop_object(conn, name)
+    conn.execute(f"CREATE TABLE matches {MATCHES_SCHEMA}")
+    columns = ['match_id', 'match_key'] + MATCH_COLUMNS
+    insert_rows(conn, 'matches', columns, match_rows(matches))
+    create_views(conn)
+    conn.execute(f"CREATE TABLE team_matches {TEAM_MATCHES_SCHEMA}")
+    conn.execute(f"INSERT INTO team_matches {TEAM_MATCHES_SELECT.format(where='')}")
+    create_rollups(conn)
+    update_rollups(conn)
+    record_load(conn)
+    if os.path.isdir(DELIVERIES_DIR):
+        create_deliveries_table(conn)
+    conn.execute("COMMIT")
+
+    conn.execute("BEGIN")
+    create_indexes(conn, 'matches', MATCH_INDEXES)
+    create_indexes(conn, 'team_matches', TEAM_MATCH_INDEXES)
+    if os.path.isdir(DELIVERIES_DIR):
+        create_indexes(conn, 'deliveries', DELIVERY_INDEXES)
+    conn.execute("COMMIT")
+    conn.execute("ANALYZE")
+
+    # WAL lets queries.py read over several read-only connections at once
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = FULL")
+    head_to_head.build_head_to_head(conn, MATCH_FORMATS)
+
+def stage_matches(conn, matches):
+    """Stage matches in a temporary table and work out which of them change
+
+    New matches, matches whose columns differ and matches no longer in matches
+    are recorded in temp.changed_matches with their match_id, match_key
+    and change ('insert', 'update' or 'delete'). Nothing else is touched,
+    so the derived tables can still retract the old rows. Returns
+    (inserted, updated, deleted).
+    """
+    columns = ['match_id', 'match_key'] + MATCH_COLUMNS
+    staged = ', '.join('s.' + c for c in MATCH_COLUMNS)
+    conn.execute("DROP TABLE IF EXISTS temp.staged_matches")
+    conn.execute(f"CREATE TEMP TABLE staged_matches {MATCHES_SCHEMA}")
+    insert_rows(conn, 'temp.staged_matches', columns, match_rows(matches))
+
+    conn.execute("DROP TABLE IF EXISTS temp.changed_matches")
+    conn.execute("CREATE TEMP TABLE changed_matches (match_id INTEGER PRIMARY KEY, match_key TEXT, change TEXT)")
+    conn.execute(f"""
+        INSERT INTO temp.changed_matches
+        SELECT s.match_id, s.match_key, CASE WHEN m.match_id IS NULL THEN 'insert' ELSE 'update' END
+        FROM temp.staged_matches s LEFT JOIN matches m ON m.match_id = s.match_id
+        WHERE m.match_id IS NULL OR ({staged}) IS NOT ({', '.join('m.' + c for c in MATCH_COLUMNS)})
+    """)
+    conn.execute("""
+        INSERT INTO temp.changed_matches
+        SELECT match_id, match_key, 'delete' FROM matches
+        WHERE match_id NOT IN (SELECT match_id FROM temp.staged_matches)
+    """)
+
+    counts = dict(conn.execute("SELECT change, COUNT(*) FROM temp.changed_matches GROUP BY change").fetchall())
+    return counts.get('insert', 0), counts.get('update', 0), counts.get('delete', 0)
+
+def apply_matches(conn):
+    """Write the changes in temp.changed_matches from the staged rows to matches"""
+    columns = ['match_id', 'match_key'] + MATCH_COLUMNS
+    conn.execute("DELETE FROM matches WHERE match_id IN "
+                 "(SELECT match_id FROM temp.changed_matches WHERE change = 'delete')")
+    conn.execute(f"""
+        INSERT OR REPLACE INTO matches ({', '.join(columns)})
+        SELECT {', '.join(columns)} FROM temp.staged_matches
+        WHERE match_id IN (SELECT match_id FROM temp.changed_matches WHERE change != 'delete')
+    """)
+    conn.execute("DROP TABLE temp.staged_matches")
+
+def refresh_team_matches(conn):
+    """Rebuild the team_matches rows of the matches in temp.changed_matches"""
+    changed = "match_id IN (SELECT match_id FROM temp.changed_matches)"
+    conn.execute(f"DELETE FROM team_matches WHERE {changed}")
+    conn.execute(f"INSERT INTO team_matches {TEAM_MATCHES_SELECT.format(where='WHERE ' + changed)}")
+
+def upsert_tables(conn, matches):
+    """Apply only the new, changed and removed matches in one transaction
+
+    The head-to-head matrix is updated from the same changes once the
+    transaction has committed.
+    """
+    changed = "match_id IN (SELECT match_id FROM temp.changed_matches)"
+    previous_fingerprint = queries.database_fingerprint(conn)
+    conn.execute("BEGIN")
+    inserted, updated, deleted = stage_matches(conn, matches)
+    print(f"matches: {inserted} inserted, {updated} updated, {deleted} deleted")
+    # Retract the old rows of changed matches from the rollups, then add the new ones
+    update_rollups(conn, changed, sign=-1)
+    old_results = head_to_head.match_results(conn, changed)
+    apply_matches(conn)
+    refresh_team_matches(conn)
+    update_rollups(conn, changed)
+    new_results = head_to_head.match_results(conn, changed)
+    record_load(conn, changed=bool(inserted or updated or deleted))
+    # Indexes added since the database was built
+    create_indexes(conn, 'matches', MATCH_INDEXES)
+    create_indexes(conn, 'team_matches', TEAM_MATCH_INDEXES)
+    if os.path.isdir(DELIVERIES_DIR):
+        changed_keys = {row[0] for row in conn.execute("SELECT match_key FROM temp.changed_matches")}
+        refresh_deliveries(conn, changed_keys)
+    conn.execute("COMMIT")
+    head_to_head.update_head_to_head(conn, old_results, new_results, previous_fingerprint, MATCH_FORMATS)
+    conn.execute("PRAGMA optimize")
+
+def create_database(matches, rebuild=False):
+    """Create the SQL database: matches, per-format views, team_matches and rollups
+
+    A new database, or one in an older layout, is rebuilt with the bulk
+    loader: all tables in one transaction with BULK_LOAD_PRAGMAS and
+    batched executemany(), then the index set and ANALYZE. Otherwise
+    matches is upserted on its stable match_id so that only new, changed
+    and removed matches are written, their team_matches rows are rebuilt
+    and their old and new rows are netted into the rollups and the
+    head-to-head matrix. rebuild=True
+    forces a rebuild. Either way the database is left in WAL mode.
+
+    Raises ValueError before anything is written if two matches share a
+    match_key, as they would collide on the matches primary key.
+    """
+    duplicates = duplicate_match_keys(matches)
+    if duplicates:
+        examples = "; ".join(f"{key}: {', '.join(names)}" for key, names in list(duplicates.items())[:5])
+        raise ValueError(f"{len(duplicates)} matches appear more than once in the processed matches "
+                         f"({examples}); re-run process_data.py --full to ingest each match once")
+    conn = sqlite3.connect(DB_FILE, isolation_level=None)
+    if rebuild or not has_current_schema(conn):
+        rebuild_tables(conn, matches)
+    else:
+        conn.execute("PRAGMA journal_mode = WAL")
+        upsert_tables(conn, matches)
+    return conn
+
+def create_deliveries_table(conn):
+    """Load the Parquet deliveries dataset into the deliveries table"""
+    import pyarrow.dataset as ds  # only needed when deliveries were ingested
+
+    conn.execute("DROP TABLE IF EXISTS deliveries")
+    conn.execute(f"CREATE TABLE deliveries {DELIVERY_TABLE_SCHEMA}")
+
+    # Stream the dataset in record batches so memory stays flat
+    dataset = ds.dataset(DELIVERIES_DIR, format="parquet")
+    columns = dataset.schema.names
+    for batch in dataset.to_batches(batch_size=DELIVERY_BATCH_SIZE):
+        rows = zip(*(column.to_pylist() for column in batch.columns))
+        insert_rows(conn, 'deliveries', columns, rows)
+
+def refresh_deliveries(conn, changed_keys):
+    """Reload the deliveries of changed matches and of matches missing on either side
+
+    Besides changed_keys, matches whose deliveries are in the dataset but
+    not the table (e.g. ingested with --deliveries for the first time) are
+    loaded, and table rows for matches no longer in the dataset are deleted.
+    """
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'deliveries'").fetchone():
+        create_deliveries_table(conn)
+        create_indexes(conn, 'deliveries', DELIVERY_INDEXES)
+        return
+
+    dataset = ds.dataset(DELIVERIES_DIR, format="parquet")
+    dataset_keys = set(pc.unique(dataset.to_table(columns=['match_key']).column('match_key')
+                                 .cast('string')).to_pylist())
+    table_keys = {row[0] for row in conn.execute("SELECT DISTINCT match_key FROM deliveries")}
+    stale = (set(changed_keys) & table_keys) | (table_keys - dataset_keys)
+    reload = (set(changed_keys) | (dataset_keys - table_keys)) & dataset_keys
+
+    conn.executemany("DELETE FROM deliveries WHERE match_key = ?", [(key,) for key in stale])
+    if reload:
+        columns = dataset.schema.names
+        scanner = dataset.to_batches(filter=pc.field('match_key').cast('string').isin(sorted(reload)),
+                                     batch_size=DELIVERY_BATCH_SIZE)
+        for batch in scanner:
+            rows = zip(*(column.to_pylist() for column in batch.columns))
+            insert_rows(conn, 'deliveries', columns, rows)
+    print(f"deliveries: reloaded {len(reload)} matches, removed {len(stale - reload)}")
+
+def index_sizes(conn):
+    """Return {index name: bytes} for every index, or None if dbstat is unavailable"""
+    try:
+        return dict(conn.execute("""
+            SELECT name, SUM(pgsize) FROM dbstat
+            WHERE name IN (SELECT name FROM sqlite_master WHERE type = 'index')
+            GROUP BY name ORDER BY name
+        """).fetchall())
+    except sqlite3.OperationalError:
+        return None
+
+def verify_database(conn, load_seconds=None):
     """Verify the database structure and contents"""
-    inspector = inspect(engine)
+    objects = conn.execute(
+        "SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view') "
+        "AND name NOT LIKE 'sqlite_%' ORDER BY name").fetchall()
     
     # Print table information
-    print("Tables in database:", inspector.get_table_names())
+    print("Tables in database:", [name for name, kind in objects if kind == 'table'])
+    print("Views in database:", [name for name, kind in objects if kind == 'view'])
     
     # Print record counts
-    for table in ['test_matches', 'odi_matches', 't20_matches']:
-        count = pd.read_sql_query(f"SELECT COUNT(*) FROM {table}", engine).iloc[0,0]
+    names = {name for name, _ in objects}
+    for table in [t for t in ['matches'] + list(MATCH_VIEWS) + ['team_matches'] + list(ROLLUPS) + ['deliveries']
+                  if t in names]:
+        count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
         print(f"{table}: {count} records")
     
     # Print schema of one table
-    print("\nSchema of test_matches:")
-    for column in inspector.get_columns('test_matches'):
-        print(f"{column['name']:15} {column['type']}")
+    print("\nSchema of matches:")
+    for _, name, column_type, *_ in conn.execute("PRAGMA table_info(matches)"):
+        print(f"{name:15} {column_type}")
+
+    # Print index sizes
+    sizes = index_sizes(conn)
+    if sizes is not None:
+        print("\nIndex sizes:")
+        for name, size in sizes.items():
+            print(f"{name:35} {size / 1024:10.1f} KiB")
+        print(f"{'total':35} {sum(sizes.values()) / 1024:10.1f} KiB")
+
+    generation = conn.execute("SELECT value FROM db_meta WHERE key = 'load_generation'").fetchone()
+    if generation:
+        print(f"\nLoad generation: {generation[0]}")
+
+    if os.path.exists(head_to_head.H2H_INDEX):
+        h2h = head_to_head.HeadToHead()
+        print(f"Head-to-head matrix: {len(h2h.teams)} teams x {len(h2h.formats)} formats, "
+              f"{'current' if h2h.is_current(conn) else 'out of date'}")
+
+    if load_seconds is not None:
+        print(f"\nLoad time: {load_seconds:.2f}s")
+
+def add_arguments(parser):
+    parser.add_argument("--rebuild", action="store_true",
+                        help="drop and bulk-load every table instead of upserting the changes")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load the processed matches into the SQLite database")
+    add_arguments(parser)
+    return parser.parse_args()
 
+def main(args=None):
+    args = args or parse_args()
 
-def main():
-    # Step 1: Create DataFrames
-    test_matches, odi_matches, t20_matches = create_match_dataframes()
+    # Step 1: Load the matches
+    matches = load_matches()
+    instrumentation.count(rows=len(matches))
     
-    print("DataFrame sizes:")
-    print(f"Test matches: {len(test_matches)} records")
-    print(f"ODI matches: {len(odi_matches)} records")
-    print(f"T20 matches: {len(t20_matches)} records")
+    print("Match counts:")
+    counts = matches.counts(['match_type'])
+    for match_type in MATCH_FORMATS:
+        print(f"{match_type.upper()} matches: {counts[(match_type,)]} records")
     
-    # Step 2: Create database
-    engine = create_database(test_matches, odi_matches, t20_matches)
+    # Step 2: Create or update the database (--rebuild forces a full reload)
+    start = time.perf_counter()
+    try:
+        conn = create_database(matches, rebuild=args.rebuild)
+    except ValueError as e:
+        print(f"\nError: {e}")
+        sys.exit(1)
+    load_seconds = time.perf_counter() - start
     
     # Step 3: Verify database
-    verify_database(engine)
+    verify_database(conn, load_seconds)
     
     # Close connection
-    engine.dispose()
-    print("\nDatabase created successfully at cricket_analytics.db")
+    conn.close()
+    print(f"\nDatabase created successfully at {DB_FILE}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,109 +1,267 @@
+import os
+import json
+import time
 import sqlite3
+import hashlib
+import calendar
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# Connect to database
-conn = sqlite3.connect('cricket_analytics.db')
-
-# Load data from each table
-test = pd.read_sql("SELECT * FROM test_matches", conn)
-odi = pd.read_sql("SELECT * FROM odi_matches", conn)
-t20 = pd.read_sql("SELECT * FROM t20_matches", conn)
-conn.close()
-
-# Combine all matches
-all_matches = pd.concat([test, odi, t20])
-
-# 1. Matches by Format (Pie Chart)
-format_counts = all_matches['match_type'].value_counts()
-plt.figure(figsize=(8, 8))
-plt.pie(format_counts, labels=format_counts.index, autopct='%1.1f%%')
-plt.title('Matches by Format')
-plt.savefig('1_matches_by_format.png')
-plt.close()
-
-# 2. Top Teams by Wins (Bar Plot)
-top_teams = all_matches['winner'].value_counts().head(10)
-plt.figure(figsize=(10, 6))
-sns.barplot(x=top_teams.values, y=top_teams.index)
-plt.title('Top 10 Teams by Wins')
-plt.xlabel('Number of Wins')
-plt.savefig('2_top_teams.png')
-plt.close()
-
-# 3. Toss Decisions (Bar Plot)
-toss_decisions = all_matches['toss_decision'].value_counts()
-plt.figure(figsize=(6, 6))
-sns.barplot(x=toss_decisions.index, y=toss_decisions.values)
-plt.title('Toss Decisions')
-plt.ylabel('Count')
-plt.savefig('3_toss_decisions.png')
-plt.close()
-
-# 4. Toss Win vs Match Win (Bar Plot)
-toss_win = all_matches[all_matches['toss_winner'] == all_matches['winner']]
-percentage = len(toss_win) / len(all_matches) * 100
-plt.figure(figsize=(6, 6))
-plt.bar(['Toss Winner Won'], [percentage])
-plt.title('Percentage of Matches Where Toss Winner Won')
-plt.ylabel('Percentage')
-plt.savefig('4_toss_win_match.png')
-plt.close()
-
-# 5. Matches by Year (Line Plot)
-all_matches['year'] = pd.to_datetime(all_matches['date']).dt.year
-matches_by_year = all_matches['year'].value_counts().sort_index()
-plt.figure(figsize=(12, 6))
-matches_by_year.plot()
-plt.title('Matches Played Each Year')
-plt.ylabel('Number of Matches')
-plt.savefig('5_matches_by_year.png')
-plt.close()
-
-# 6. Top Venues (Bar Plot)
-top_venues = all_matches['venue'].value_counts().head(10)
-plt.figure(figsize=(10, 6))
-sns.barplot(x=top_venues.values, y=top_venues.index)
-plt.title('Top 10 Venues')
-plt.xlabel('Number of Matches')
-plt.savefig('6_top_venues.png')
-plt.close()
-
-# 7. Matches by Month (Bar Plot)
-all_matches['month'] = pd.to_datetime(all_matches['date']).dt.month_name()
-month_counts = all_matches['month'].value_counts()
-plt.figure(figsize=(10, 6))
-sns.barplot(x=month_counts.index, y=month_counts.values)
-plt.title('Matches by Month')
-plt.ylabel('Count')
-plt.savefig('7_matches_by_month.png')
-plt.close()
-
-# 8. Team Performance by Format (Grouped Bar)
-team_wins = all_matches.groupby(['winner', 'match_type']).size().unstack().fillna(0)
-top_teams = team_wins.sum(axis=1).sort_values(ascending=False).head(5).index
-team_wins.loc[top_teams].plot(kind='bar', figsize=(10, 6))
-plt.title('Wins by Format for Top Teams')
-plt.ylabel('Number of Wins')
-plt.savefig('8_team_format.png')
-plt.close()
-
-# 9. City Analysis (Bar Plot)
-top_cities = all_matches['city'].value_counts().head(10)
-plt.figure(figsize=(10, 6))
-sns.barplot(x=top_cities.values, y=top_cities.index)
-plt.title('Top 10 Cities Hosting Matches')
-plt.xlabel('Number of Matches')
-plt.savefig('9_top_cities.png')
-plt.close()
-
-# 10. Toss Decision by Format (Stacked Bar)
-toss_by_format = all_matches.groupby(['match_type', 'toss_decision']).size().unstack()
-toss_by_format.plot(kind='bar', stacked=True, figsize=(10, 6))
-plt.title('Toss Decisions by Format')
-plt.ylabel('Count')
-plt.savefig('10_toss_by_format.png')
-plt.close()
-
-print("All 10 visualizations created successfully!")
\ No newline at end of file
+import instrumentation
+from queries import DB_FILE, rollup_sets
+
+# The only columns the charts use
+CHART_COLUMNS = ['match_type', 'date', 'venue', 'city', 'toss_winner', 'toss_decision', 'winner']
+
+# Month names by the month part of an ISO date
+MONTH_NAMES = {f"{month:02d}": calendar.month_name[month] for month in range(1, 13)}
+
+# The aggregates the charts are drawn from, each sized by its categories
+# rather than by the number of matches
+AGGREGATE_STATEMENTS = {
+    'format_toss': """
+        SELECT match_type, toss_decision, COUNT(*) as matches
+        FROM matches
+        GROUP BY match_type, toss_decision
+    """,
+    'year_month': """
+        SELECT SUBSTR(date, 1, 4) as year, SUBSTR(date, 6, 2) as month, COUNT(*) as matches
+        FROM matches
+        WHERE date IS NOT NULL
+        GROUP BY year, month
+    """,
+    'winner': """
+        SELECT match_type, winner,
+               CASE WHEN toss_winner IS NOT NULL AND winner IS NOT NULL THEN toss_winner = winner END as toss_won,
+               COUNT(*) as matches
+        FROM matches
+        GROUP BY match_type, winner, toss_won
+    """,
+    'venue': """
+        SELECT venue, COUNT(*) as matches
+        FROM matches
+        GROUP BY venue
+    """,
+    'city': """
+        SELECT city, COUNT(*) as matches
+        FROM matches
+        GROUP BY city
+    """,
+}
+
+# The same aggregates read from the match_rollup grouping sets db.py maintains
+ROLLUP_AGGREGATES = {
+    'format_toss': """
+        SELECT match_type, toss_decision, matches
+        FROM match_rollup
+        WHERE grouping_set = 'format_toss'
+    """,
+    'year_month': """
+        SELECT year, month, matches
+        FROM match_rollup
+        WHERE grouping_set = 'year_month' AND year IS NOT NULL
+    """,
+    'winner': """
+        SELECT match_type, winner, toss_won, matches
+        FROM match_rollup
+        WHERE grouping_set = 'winner'
+    """,
+    'venue': """
+        SELECT venue, SUM(matches) as matches
+        FROM match_rollup
+        WHERE grouping_set = 'venue'
+        GROUP BY venue
+    """,
+    'city': """
+        SELECT city, matches
+        FROM match_rollup
+        WHERE grouping_set = 'city'
+    """,
+}
+
+def database_aggregates(conn):
+    """Ask the database for each chart aggregate, from the rollups when they hold it"""
+    available = rollup_sets(conn)
+    return {name: pd.read_sql(ROLLUP_AGGREGATES[name] if ('match_rollup', name) in available else sql, conn)
+            for name, sql in AGGREGATE_STATEMENTS.items()}
+
+def batch_aggregates(matches):
+    """The AGGREGATE_STATEMENTS aggregates counted from the codes of a MatchBatch
+
+    Each aggregate is counted on the codes first, so the derived columns
+    (year, month, toss_won) are worked out once per distinct combination
+    rather than once per match.
+    """
+    def counts(columns):
+        rows = [key + (count,) for key, count in matches.counts(columns).items()]
+        return pd.DataFrame(rows, columns=columns + ['matches'])
+
+    def regroup(frame, columns):
+        return frame.groupby(columns, dropna=False)['matches'].sum().reset_index()
+
+    # Parse each distinct date once, into the year and month strings the SQL takes apart
+    dates = counts(['date']).dropna(subset=['date'])
+    parsed = pd.to_datetime(dates['date'])
+    dates = dates.assign(year=parsed.dt.strftime('%Y'), month=parsed.dt.strftime('%m'))
+    winners = counts(['match_type', 'winner', 'toss_winner'])
+    both = winners['toss_winner'].notna() & winners['winner'].notna()
+    winners['toss_won'] = (winners['toss_winner'] == winners['winner']).astype('Int64').where(both)
+    return {
+        'format_toss': regroup(counts(['match_type', 'toss_decision']), ['match_type', 'toss_decision']),
+        'year_month': regroup(dates, ['year', 'month']),
+        'winner': regroup(winners, ['match_type', 'winner', 'toss_won']),
+        'venue': regroup(counts(['venue']), ['venue']),
+        'city': regroup(counts(['city']), ['city']),
+    }
+
+def load_aggregates():
+    """Chart aggregates from the database, or from the Parquet intermediate if there is none yet"""
+    if os.path.exists(DB_FILE):
+        conn = sqlite3.connect(DB_FILE)
+        aggregates = database_aggregates(conn)
+        conn.close()
+        return aggregates
+
+    from match_batch import MatchBatch
+    from process_data import OUTPUT_PARQUET
+
+    # Memory-map just the chart columns of the columnar intermediate
+    matches = MatchBatch.read_parquet(OUTPUT_PARQUET, columns=CHART_COLUMNS)
+    # Same normalisation and format split as db.load_matches
+    matches.recode('match_type', lambda match_type: match_type.lower().strip())
+    return batch_aggregates(matches.take(matches.isin('match_type', ['test', 'odi', 't20']).nonzero()[0]))
+
+def total(frame, column):
+    """Sum of matches per value of column, largest first, without NULL"""
+    return frame.dropna(subset=[column]).groupby(column)['matches'].sum().sort_values(ascending=False, kind='stable')
+
+def chart_data(aggregates):
+    """The data each chart plots, keyed by its file name"""
+    format_toss, year_month, winners = aggregates['format_toss'], aggregates['year_month'], aggregates['winner']
+    team_wins = winners.dropna(subset=['winner']).pivot_table(
+        index='winner', columns='match_type', values='matches', aggfunc='sum', fill_value=0)
+    top_teams = team_wins.sum(axis=1).sort_values(ascending=False).head(5).index
+    percentage = winners.loc[winners['toss_won'] == 1, 'matches'].sum() / format_toss['matches'].sum() * 100
+    return {
+        '1_matches_by_format.png': total(format_toss, 'match_type'),
+        '2_top_teams.png': total(winners, 'winner').head(10),
+        '3_toss_decisions.png': total(format_toss, 'toss_decision'),
+        '4_toss_win_match.png': pd.Series({'Toss Winner Won': percentage}),
+        '5_matches_by_year.png': year_month.groupby(year_month['year'].astype(int))['matches'].sum().sort_index(),
+        '6_top_venues.png': total(aggregates['venue'], 'venue').head(10),
+        '7_matches_by_month.png': total(year_month.assign(month=year_month['month'].map(MONTH_NAMES)), 'month'),
+        '8_team_format.png': team_wins.loc[top_teams],
+        '9_top_cities.png': total(aggregates['city'], 'city').head(10),
+        '10_toss_by_format.png': format_toss.dropna(subset=['toss_decision']).pivot_table(
+            index='match_type', columns='toss_decision', values='matches', aggfunc='sum'),
+    }
+
+# How each chart is drawn: (renderer, plotting parameters)
+CHARTS = {
+    '1_matches_by_format.png': ('pie', {'figsize': (8, 8), 'title': 'Matches by Format'}),
+    '2_top_teams.png': ('hbar', {'figsize': (10, 6), 'title': 'Top 10 Teams by Wins', 'xlabel': 'Number of Wins'}),
+    '3_toss_decisions.png': ('bar', {'figsize': (6, 6), 'title': 'Toss Decisions', 'ylabel': 'Count'}),
+    '4_toss_win_match.png': ('single_bar', {'figsize': (6, 6), 'title': 'Percentage of Matches Where Toss Winner Won',
+                                            'ylabel': 'Percentage'}),
+    '5_matches_by_year.png': ('line', {'figsize': (12, 6), 'title': 'Matches Played Each Year',
+                                       'ylabel': 'Number of Matches'}),
+    '6_top_venues.png': ('hbar', {'figsize': (10, 6), 'title': 'Top 10 Venues', 'xlabel': 'Number of Matches'}),
+    '7_matches_by_month.png': ('bar', {'figsize': (10, 6), 'title': 'Matches by Month', 'ylabel': 'Count'}),
+    '8_team_format.png': ('grouped_bar', {'figsize': (10, 6), 'title': 'Wins by Format for Top Teams',
+                                          'ylabel': 'Number of Wins'}),
+    '9_top_cities.png': ('hbar', {'figsize': (10, 6), 'title': 'Top 10 Cities Hosting Matches',
+                                  'xlabel': 'Number of Matches'}),
+    '10_toss_by_format.png': ('grouped_bar', {'figsize': (10, 6), 'title': 'Toss Decisions by Format',
+                                              'ylabel': 'Count', 'stacked': True}),
+}
+
+# Input hash of every chart last drawn, so unchanged charts are not redrawn
+CHART_MANIFEST = 'chart_manifest.json'
+
+def chart_key(name, data, renderer, params):
+    """Hash of a chart's input data and everything about how it is drawn"""
+    payload = json.dumps([name, renderer, params, data.to_json(orient='split')], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def render_chart(path, data, renderer, params):
+    """Draw one chart to path; run in a worker process, so plotting is imported here"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    if renderer in ('pie', 'hbar', 'bar', 'single_bar', 'line'):
+        plt.figure(figsize=params['figsize'])
+    if renderer == 'pie':
+        plt.pie(data, labels=data.index, autopct='%1.1f%%')
+    elif renderer == 'hbar':
+        sns.barplot(x=data.values, y=data.index)
+    elif renderer == 'bar':
+        sns.barplot(x=data.index, y=data.values)
+    elif renderer == 'single_bar':
+        plt.bar(list(data.index), list(data.values))
+    elif renderer == 'line':
+        data.plot()
+    elif renderer == 'grouped_bar':
+        data.plot(kind='bar', stacked=params.get('stacked', False), figsize=params['figsize'])
+    plt.title(params['title'])
+    if 'xlabel' in params:
+        plt.xlabel(params['xlabel'])
+    if 'ylabel' in params:
+        plt.ylabel(params['ylabel'])
+    plt.savefig(path)
+    plt.close()
+    return path
+
+def load_manifest(manifest_file=CHART_MANIFEST):
+    if not os.path.exists(manifest_file):
+        return {}
+    with open(manifest_file, encoding='utf-8') as f:
+        return json.load(f)
+
+def create_charts(output_dir='.', workers=None, force=False, manifest_file=CHART_MANIFEST):
+    """Draw the charts whose inputs changed since the last run, in parallel
+
+    Each chart is keyed on chart_key; one whose key matches the manifest
+    and whose PNG still exists is skipped. The rest are drawn as separate
+    jobs in a process pool. Returns (drawn, skipped) chart names.
+    """
+    data = chart_data(load_aggregates())
+    manifest = {} if force else load_manifest(manifest_file)
+    keys = {name: chart_key(name, data[name], *CHARTS[name]) for name in CHARTS}
+    stale = [name for name in CHARTS
+             if manifest.get(name) != keys[name] or not os.path.exists(os.path.join(output_dir, name))]
+
+    workers = min(workers or os.cpu_count() or 1, len(stale))
+    jobs = [(os.path.join(output_dir, name), data[name], *CHARTS[name]) for name in stale]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(render_chart, *zip(*jobs)))
+    else:
+        for job in jobs:
+            render_chart(*job)
+
+    manifest.update({name: keys[name] for name in stale})
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return stale, [name for name in CHARTS if name not in stale]
+
+def add_arguments(parser):
+    parser.add_argument("--workers", type=int, default=None, help="chart processes (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="redraw every chart even if its inputs are unchanged")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Draw the exploratory analysis charts")
+    add_arguments(parser)
+    return parser.parse_args()
+
+def main(args=None):
+    args = args or parse_args()
+    start = time.perf_counter()
+    drawn, skipped = create_charts(workers=args.workers, force=args.force)
+    instrumentation.count(files=len(drawn), unchanged=len(skipped))
+    print(f"{len(drawn)} charts drawn, {len(skipped)} unchanged ({time.perf_counter() - start:.2f}s)")
+    print(f"All {len(CHARTS)} visualizations created successfully!")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
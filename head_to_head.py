@@ -0,0 +1,178 @@
+import os
+import sys
+import json
+import sqlite3
+
+import numpy as np
+from tabulate import tabulate
+
+import queries
+
+# Dense team x team x format matrix of results, memory-mapped, and its index
+H2H_FILE = 'head_to_head.npy'
+H2H_INDEX = 'head_to_head.json'
+
+# Counts kept per (team, opponent, format), from the team's point of view
+PLAYED, WON, NO_RESULT = range(3)
+STATS = ['played', 'won', 'no_result']
+
+def match_results(conn, where='1'):
+    """Return (team1, team2, match_type, winner) of the matches satisfying where"""
+    return conn.execute(f"SELECT team1, team2, match_type, winner FROM matches WHERE {where}").fetchall()
+
+def add_results(counts, team_index, format_index, results, sign=1):
+    """Add (sign=1) or retract (sign=-1) match results in counts, from both teams' side"""
+    results = [row for row in results if row[0] is not None and row[1] is not None and row[2] in format_index]
+    if not results:
+        return
+    team1 = np.array([team_index[row[0]] for row in results])
+    team2 = np.array([team_index[row[1]] for row in results])
+    formats = np.array([format_index[row[2]] for row in results])
+    won1 = np.array([row[3] is not None and row[3] == row[0] for row in results], dtype=np.int32)
+    won2 = np.array([row[3] is not None and row[3] == row[1] for row in results], dtype=np.int32)
+    no_result = np.array([row[3] is None for row in results], dtype=np.int32)
+    for team, opponent, won in ((team1, team2, won1), (team2, team1, won2)):
+        np.add.at(counts, (team, opponent, formats, PLAYED), sign)
+        np.add.at(counts, (team, opponent, formats, WON), sign * won)
+        np.add.at(counts, (team, opponent, formats, NO_RESULT), sign * no_result)
+
+def result_teams(results):
+    return {team for row in results for team in row[:2] if team is not None}
+
+def write_index(index_file, teams, formats, fingerprint):
+    with open(index_file, 'w', encoding='utf-8') as f:
+        json.dump({"teams": teams, "formats": formats, "fingerprint": fingerprint}, f)
+
+def write_matrix(counts, teams, formats, fingerprint, matrix_file=H2H_FILE, index_file=H2H_INDEX):
+    """Write counts to a new matrix file, replacing the old one atomically, then its index"""
+    temporary = matrix_file + '.tmp'
+    matrix = np.lib.format.open_memmap(temporary, mode='w+', dtype=np.int32, shape=counts.shape)
+    matrix[:] = counts
+    matrix.flush()
+    del matrix
+    os.replace(temporary, matrix_file)
+    write_index(index_file, teams, formats, fingerprint)
+
+def build_head_to_head(conn, formats, matrix_file=H2H_FILE, index_file=H2H_INDEX):
+    """Build the matrix from every match in the database"""
+    results = match_results(conn)
+    teams = sorted(result_teams(results))
+    counts = np.zeros((len(teams), len(teams), len(formats), len(STATS)), dtype=np.int32)
+    add_results(counts, {team: i for i, team in enumerate(teams)}, {f: i for i, f in enumerate(formats)}, results)
+    write_matrix(counts, teams, formats, queries.database_fingerprint(conn), matrix_file, index_file)
+    return len(teams)
+
+def update_head_to_head(conn, old_results, new_results, previous_fingerprint, formats,
+                        matrix_file=H2H_FILE, index_file=H2H_INDEX):
+    """Net the old and new results of changed matches into the matrix in place
+
+    If the matrix is missing or was not built from previous_fingerprint
+    (the database before this load) it is rebuilt instead. New teams grow
+    the matrix, which rewrites the file once.
+    """
+    index = read_index(index_file)
+    if index is None or not os.path.exists(matrix_file) or index["fingerprint"] != previous_fingerprint \
+            or index["formats"] != formats:
+        return build_head_to_head(conn, formats, matrix_file, index_file)
+
+    teams = index["teams"]
+    added = sorted(result_teams(new_results) - set(teams))
+    if added:
+        # Appended rather than re-sorted so existing positions stay valid
+        old = np.load(matrix_file, mmap_mode='r')
+        counts = np.zeros((len(teams) + len(added),) * 2 + old.shape[2:], dtype=np.int32)
+        counts[:len(teams), :len(teams)] = old
+        del old
+        teams = teams + added
+    else:
+        counts = np.load(matrix_file, mmap_mode='r+')
+
+    team_index = {team: i for i, team in enumerate(teams)}
+    format_index = {f: i for i, f in enumerate(formats)}
+    add_results(counts, team_index, format_index, old_results, sign=-1)
+    add_results(counts, team_index, format_index, new_results)
+    if added:
+        write_matrix(counts, teams, formats, queries.database_fingerprint(conn), matrix_file, index_file)
+    else:
+        counts.flush()
+        write_index(index_file, teams, formats, queries.database_fingerprint(conn))
+    return len(teams)
+
+def read_index(index_file=H2H_INDEX):
+    if not os.path.exists(index_file):
+        return None
+    with open(index_file, encoding='utf-8') as f:
+        return json.load(f)
+
+class HeadToHead:
+    """Read-only view of the head-to-head matrix
+
+    counts[team, opponent, format] holds played, won and no-result counts
+    from team's point of view; lookups go through the team index, so a
+    pair costs a dictionary lookup and one array read whatever the number
+    of matches.
+    """
+
+    def __init__(self, matrix_file=H2H_FILE, index_file=H2H_INDEX):
+        index = read_index(index_file)
+        if index is None:
+            raise FileNotFoundError(f"{index_file} not found; run db.py to build the head-to-head matrix")
+        self.counts = np.load(matrix_file, mmap_mode='r')
+        self.teams = index["teams"]
+        self.formats = index["formats"]
+        self.fingerprint = index["fingerprint"]
+        self.team_index = {team: i for i, team in enumerate(self.teams)}
+        self.format_index = {f: i for i, f in enumerate(self.formats)}
+
+    def is_current(self, conn):
+        """True if the matrix was built from the database conn is connected to, as it is now"""
+        return self.fingerprint == queries.database_fingerprint(conn)
+
+    def stats(self, cells):
+        played, won, no_result = (int(value) for value in cells)
+        return {"played": played, "won": won, "lost": played - won - no_result, "no_result": no_result}
+
+    def cells(self, team, opponent=None, match_type=None):
+        i = self.team_index[team]
+        cells = self.counts[i] if opponent is None else self.counts[i, self.team_index[opponent]]
+        if match_type is None:
+            return cells.sum(axis=-2)
+        return cells[..., self.format_index[match_type], :]
+
+    def record(self, team, opponent, match_type=None):
+        """Results of team against opponent, in one format or all of them"""
+        if team not in self.team_index or opponent not in self.team_index:
+            return self.stats((0, 0, 0))
+        return self.stats(self.cells(team, opponent, match_type))
+
+    def row(self, team, match_type=None):
+        """Results of team against every opponent it has played, in one format or all of them"""
+        if team not in self.team_index:
+            return {}
+        cells = self.cells(team, match_type=match_type)
+        return {self.teams[j]: self.stats(cells[j]) for j in np.flatnonzero(cells[:, PLAYED])}
+
+def print_records(records):
+    rows = [[opponent] + list(stats.values()) for opponent, stats in records.items()]
+    print(tabulate(rows, headers=["opponent", "played", "won", "lost", "no_result"], tablefmt='psql'))
+
+def main():
+    """python head_to_head.py TEAM [OPPONENT] [FORMAT]"""
+    args = sys.argv[1:]
+    match_type = args.pop() if args and args[-1].lower() in ('test', 'odi', 't20') else None
+    if not args or len(args) > 2:
+        print("usage: python head_to_head.py TEAM [OPPONENT] [test|odi|t20]")
+        sys.exit(1)
+    h2h = HeadToHead()
+    conn = sqlite3.connect(queries.DB_FILE)
+    if not h2h.is_current(conn):
+        print(f"Warning: {H2H_FILE} is out of date with {queries.DB_FILE}; run db.py to refresh it")
+    conn.close()
+    match_type = match_type.lower() if match_type else None
+    if len(args) == 2:
+        print_records({args[1]: h2h.record(args[0], args[1], match_type)})
+    else:
+        print_records(h2h.row(args[0], match_type))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import os
+import sys
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import datetime
+import threading
+import collections
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+# Every instrumented stage appends one JSON record to this file
+RUN_LOG = 'run_log.jsonl'
+
+# --profile writes one profile per stage here
+PROFILE_DIR = 'profiles'
+
+# Profilers --profile can attach to a stage
+PROFILERS = ['cprofile', 'sample']
+
+# Counters the run log also gives per second of wall time
+RATES = ['files', 'rows', 'bytes_read', 'deliveries', 'queries']
+
+# Seconds between stack samples of the sampling profiler
+SAMPLE_INTERVAL = 0.005
+
+# Functions listed when a stage's profile is printed
+PROFILE_TOP = 15
+
+# Stages currently running, innermost last; count() and error() go to the innermost
+_active = []
+
+def count(**counters):
+    """Add to the counters (files, rows, bytes_read, ...) of the running stage, if any"""
+    if _active:
+        _active[-1].count(**counters)
+
+def error(cause, n=1):
+    """Count n failures of the given cause (usually an exception type) in the running stage, if any"""
+    if _active:
+        _active[-1].error(cause, n)
+
+def error_cause(message):
+    """The cause of an error message built as "<ExceptionType>: <text>" """
+    return message.partition(":")[0].strip() or "Error"
+
+def read_peak_rss():
+    """Peak resident set size of this process in bytes, or None where it cannot be read"""
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def reset_peak_rss():
+    """Restart the peak RSS from the current RSS so it covers one stage only (Linux)"""
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='ascii') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def children_peak_rss():
+    """Largest peak RSS of any waited-for child process so far, in bytes"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def megabytes(size):
+    return None if size is None else round(size / (1 << 20), 1)
+
+class Sampler:
+    """Sample the stack of the thread that started it from a background thread
+
+    Cheaper than cProfile on call-heavy code and closer to where wall time
+    goes; the stacks are written in the folded format flame graph tools read.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.thread_id = threading.get_ident()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def enable(self):
+        self.thread.start()
+
+    def disable(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def dump_stats(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, samples in self.stacks.most_common():
+                f.write(f"{stack} {samples}\n")
+
+    def print_stats(self, top=PROFILE_TOP):
+        """Print the functions the most samples were taken in"""
+        own = collections.Counter()
+        for stack, samples in self.stacks.items():
+            own[stack.rsplit(";", 1)[-1]] += samples
+        total = sum(own.values()) or 1
+        print(f"{total} samples every {self.interval * 1000:g} ms")
+        for function, samples in own.most_common(top):
+            print(f"{samples / total:7.1%}  {function}")
+
+class Stage:
+    """Measure one pipeline stage and append it to the run log
+
+    Records wall and CPU time (worker processes' CPU included once they
+    have exited), the peak RSS of this process during the stage and of its
+    children, the counters and error causes reported through count() and
+    error() while it runs, and those counters per second. An exception
+    escaping the stage is counted as an error and marks it failed.
+    With profile='cprofile' or 'sample' the stage is profiled, the top
+    functions printed and the profile saved under PROFILE_DIR.
+    """
+
+    def __init__(self, name, run_id=None, run_log=RUN_LOG, profile=None):
+        self.name = name
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.run_log = run_log
+        self.profile = profile
+        self.counters = collections.Counter()
+        self.errors = collections.Counter()
+        self.lock = threading.Lock()  # downloads report from several threads
+
+    def count(self, **counters):
+        with self.lock:
+            self.counters.update(counters)
+
+    def error(self, cause, n=1):
+        with self.lock:
+            self.errors[cause] += n
+
+    def __enter__(self):
+        reset_peak_rss()
+        self.started = datetime.datetime.now(datetime.timezone.utc)
+        self.times = os.times()
+        self.wall = time.perf_counter()
+        self.profiler = {'cprofile': cProfile.Profile, 'sample': Sampler}[self.profile]() if self.profile else None
+        _active.append(self)
+        if self.profiler:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self.profiler:
+            self.profiler.disable()
+        wall = time.perf_counter() - self.wall
+        times = os.times()
+        _active.remove(self)
+        if exc_type is not None:
+            self.error(exc_type.__name__)
+        record = {
+            "run_id": self.run_id,
+            "stage": self.name,
+            "started": self.started.isoformat(timespec='seconds'),
+            "status": "ok" if exc_type is None else "failed",
+            "wall_seconds": round(wall, 3),
+            "cpu_seconds": round(times.user + times.system - self.times.user - self.times.system, 3),
+            "children_cpu_seconds": round(max(times.children_user + times.children_system
+                                              - self.times.children_user - self.times.children_system, 0), 3),
+            "peak_rss_mb": megabytes(read_peak_rss()),
+            "children_peak_rss_mb": megabytes(children_peak_rss()),
+            "counts": dict(self.counters),
+            "per_second": {name: round(self.counters[name] / wall, 1) for name in RATES
+                           if name in self.counters and wall > 0},
+            "errors": dict(self.errors),
+            "profile": self.save_profile(),
+        }
+        if self.run_log:
+            with open(self.run_log, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+        return False
+
+    def save_profile(self):
+        """Print and save the stage's profile; return its path"""
+        if not self.profiler:
+            return None
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        extension = '.prof' if self.profile == 'cprofile' else '.folded'
+        path = os.path.join(PROFILE_DIR, f"{self.run_id}-{self.name}{extension}")
+        self.profiler.dump_stats(path)
+        print(f"\n--- {self.name} profile ({path}) ---")
+        if self.profile == 'cprofile':
+            pstats.Stats(self.profiler).strip_dirs().sort_stats('cumulative').print_stats(PROFILE_TOP)
+        else:
+            self.profiler.print_stats()
+        return path
+
+def add_arguments(parser):
+    parser.add_argument("--run-log", default=RUN_LOG,
+                        help=f"JSON-lines file each stage's measurements are appended to (default: {RUN_LOG})")
+    parser.add_argument("--no-run-log", dest="run_log", action="store_const", const=None,
+                        help="do not write the run log")
+    parser.add_argument("--profile", choices=PROFILERS, default=None,
+                        help=f"profile each stage with cProfile or a stack sampler and save it under {PROFILE_DIR}/")
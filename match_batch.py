@@ -0,0 +1,199 @@
+import os
+import csv
+import collections
+from array import array
+
+import numpy as np
+
+# Columns of a match record, in output order
+MATCH_COLUMNS = ["file_name", "match_type", "team1", "team2", "date", "venue", "city",
+                 "toss_winner", "toss_decision", "winner"]
+
+# Match columns stored dictionary-encoded in OUTPUT_PARQUET
+CATEGORICAL_COLUMNS = ["match_type", "team1", "team2", "venue", "city",
+                       "toss_winner", "toss_decision", "winner"]
+
+# Columns held as codes into the batch dictionary: all but the file name, which is unique per match
+CODED_COLUMNS = MATCH_COLUMNS[1:]
+
+class MatchBatch:
+    """Match records stored column by column
+
+    file_names is a list; every other column is an array of int32 codes
+    into `values`, one dictionary shared by all of them, so a team name is
+    stored once whether it is team1, team2, toss_winner or winner in any
+    number of matches. Code 0 is a missing value: '' in the CSV, NULL in
+    Parquet and the database. A match costs its file name plus 36 bytes of
+    codes, against a dict of ten strings for a record.
+
+    process_data builds one batch per chunk of files and merges them,
+    db inserts its rows straight into SQLite and eda counts its codes, so
+    the records are never expanded into dicts or a DataFrame on the way.
+    """
+
+    __slots__ = ('file_names', 'codes', 'values', 'index')
+
+    def __init__(self):
+        self.file_names = []
+        self.codes = {column: array('i') for column in CODED_COLUMNS}
+        self.values = [None]
+        self.index = {None: 0, '': 0}
+
+    def __len__(self):
+        return len(self.file_names)
+
+    def __getstate__(self):
+        # The index is rebuilt from values rather than pickled next to it
+        return self.file_names, self.codes, self.values
+
+    def __setstate__(self, state):
+        self.file_names, self.codes, self.values = state
+        self.index = {value: code for code, value in enumerate(self.values)}
+        self.index[''] = 0
+
+    def code(self, value):
+        """Code of value in the dictionary, adding it if it is new"""
+        if value is not None and not isinstance(value, str):
+            value = str(value)  # as the CSV would hold it
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def append(self, file_name, *values):
+        """Append one match, its values in CODED_COLUMNS order"""
+        self.file_names.append(file_name)
+        for codes, value in zip(self.codes.values(), values):
+            codes.append(self.code(value))
+
+    def column_codes(self, column):
+        """The codes of column as a NumPy view; do not append to the batch while it is held"""
+        return np.frombuffer(self.codes[column], dtype=np.int32)
+
+    def extend(self, other):
+        """Append the matches of another batch, recoded into this batch's dictionary"""
+        recode = np.array([self.code(value) for value in other.values], dtype=np.int32)
+        self.file_names.extend(other.file_names)
+        for column, codes in self.codes.items():
+            codes.frombytes(recode[other.column_codes(column)].tobytes())
+
+    def take(self, indices):
+        """A new batch of the matches at indices, in that order"""
+        indices = np.asarray(indices, dtype=np.intp)
+        batch = MatchBatch()
+        batch.values = list(self.values)
+        batch.index = dict(self.index)
+        batch.file_names = [self.file_names[i] for i in indices]
+        for column in CODED_COLUMNS:
+            batch.codes[column].frombytes(self.column_codes(column)[indices].tobytes())
+        return batch
+
+    def recode(self, column, function):
+        """Replace every value v of column by function(v), once per distinct value"""
+        lookup = np.array([self.code(function(value)) if value is not None else 0 for value in list(self.values)],
+                          dtype=np.int32)
+        self.codes[column] = array('i', lookup[self.column_codes(column)].tobytes())
+
+    def isin(self, column, values):
+        """Boolean mask of the matches whose column is one of values"""
+        values = set(values)
+        return np.array([value in values for value in self.values])[self.column_codes(column)]
+
+    def column(self, column, missing=None):
+        """The values of column, with missing ones as `missing`"""
+        if column == "file_name":
+            return iter(self.file_names)
+        values = [missing] + self.values[1:]
+        return map(values.__getitem__, self.codes[column])
+
+    def rows(self, missing=None):
+        """Yield each match as a tuple in MATCH_COLUMNS order"""
+        return zip(*(self.column(column, missing) for column in MATCH_COLUMNS))
+
+    def counts(self, columns):
+        """Number of matches per combination of values of columns, keyed by value tuples"""
+        if not len(self):
+            return collections.Counter()
+        codes = np.stack([self.column_codes(column) for column in columns], axis=1)
+        combinations, counts = np.unique(codes, axis=0, return_counts=True)
+        return collections.Counter({tuple(self.values[code] for code in combination): int(count)
+                                    for combination, count in zip(combinations, counts)})
+
+    @classmethod
+    def read_csv(cls, path):
+        """Read a processed matches CSV; empty fields are missing values"""
+        batch = cls()
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader, MATCH_COLUMNS)
+            positions = [header.index(column) for column in MATCH_COLUMNS]
+            for row in reader:
+                batch.append(*(row[i] for i in positions))
+        return batch
+
+    def write_csv(self, path):
+        """Write the matches as CSV, with the line endings pandas' to_csv uses"""
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, lineterminator=os.linesep)
+            writer.writerow(MATCH_COLUMNS)
+            writer.writerows(self.rows(missing=''))
+
+    @classmethod
+    def read_parquet(cls, path, columns=MATCH_COLUMNS):
+        """Read columns of a processed matches Parquet file; the others are left missing
+
+        Dictionary-encoded columns are recoded one dictionary entry at a
+        time, and the date is read back as ISO text.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path, columns=columns, memory_map=True)
+        batch = cls()
+        size = table.num_rows
+        batch.file_names = table.column("file_name").to_pylist() if "file_name" in columns else [''] * size
+        for column in CODED_COLUMNS:
+            if column not in columns:
+                batch.codes[column] = array('i', bytes(4 * size))
+                continue
+            values = table.column(column)
+            if pa.types.is_date(values.type):
+                values = values.cast(pa.string())
+            values = values.combine_chunks()
+            if not pa.types.is_dictionary(values.type):
+                values = values.dictionary_encode()
+            lookup = np.array([0] + [batch.code(value) for value in values.dictionary.to_pylist()], dtype=np.int32)
+            # Shift the indices by one so nulls (filled with -1) land on code 0
+            indices = values.indices.fill_null(-1).to_numpy().astype(np.int64) + 1
+            batch.codes[column] = array('i', lookup[indices].tobytes())
+        return batch
+
+    def to_table(self):
+        """Arrow table of the matches, categorical columns dictionary-encoded and the date a date32
+
+        Each column's dictionary holds only the values it uses, in the order
+        they first appear in it, so the file depends on the rows alone and
+        not on how the batch was assembled.
+        """
+        import pandas as pd
+        import pyarrow as pa
+
+        arrays = {"file_name": pa.array(self.file_names, type=pa.string())}
+        for column in CODED_COLUMNS:
+            codes = self.column_codes(column)
+            missing = codes == 0
+            if column in CATEGORICAL_COLUMNS:
+                used, first = np.unique(codes[~missing], return_index=True)
+                used = used[np.argsort(first)]
+                positions = np.zeros(len(self.values), dtype=np.int32)
+                positions[used] = np.arange(len(used), dtype=np.int32)
+                arrays[column] = pa.DictionaryArray.from_arrays(
+                    pa.array(positions[codes], mask=missing),
+                    pa.array([self.values[code] for code in used], type=pa.string()))
+            else:
+                # The date: each distinct value is parsed once
+                dates = pd.to_datetime(pd.Series(self.values, dtype=object), format="%Y-%m-%d", errors="coerce")
+                lookup = pa.array(dates, type=pa.timestamp("ns")).cast(pa.date32())
+                arrays[column] = lookup.take(pa.array(codes, mask=missing))
+        return pa.table({column: arrays[column] for column in MATCH_COLUMNS})
@@ -1,62 +1,673 @@
 import os
+import re
+import csv
 import json
-import pandas as pd
+import heapq
+import itertools
+import hashlib
+import zipfile
+import time
+import calendar
+import contextlib
+import datetime
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import yaml
+import instrumentation
+from match_batch import MATCH_COLUMNS, MatchBatch
+from scrape_cricsheet import ARCHIVE_DIR, FORMAT_MAP, YamlLoader
 
-# Directory where the JSON files are stored
+# Directory where the JSON (or YAML) match files are stored
 DATA_DIR = "cricsheet_data"
 
+# Match files are JSON, or YAML in archives that have not been converted
+MATCH_EXTENSIONS = (".json", ".yaml", ".yml")
+YAML_EXTENSIONS = (".yaml", ".yml")
+
 # Output CSV file
 OUTPUT_FILE = "processed_matches.csv"
 
+# Columnar copy of OUTPUT_FILE with dictionary-encoded categories and a real date type
+OUTPUT_PARQUET = "processed_matches.parquet"
+
+# Record of the files behind OUTPUT_FILE, used for incremental runs
+MANIFEST_FILE = "ingest_manifest.json"
+
+# Ball-by-ball dataset: a directory of Parquet part files, one per run
+DELIVERIES_DIR = "deliveries"
+
+# Columns of the deliveries dataset, in file order
+DELIVERY_COLUMNS = ["match_key", "innings", "over", "ball", "batting_team", "batter", "bowler",
+                    "batter_runs", "extras", "runs", "wicket_kind", "player_out"]
+
+# Number of files handed to a worker process at a time
+CHUNK_SIZE = 256
+
+# Match rows held in memory and written per CSV/Parquet batch by the streaming writer
+STREAM_BATCH_SIZE = 10_000
+
+# Characters read per step when scanning a file for its info section
+INFO_READ_SIZE = 1 << 16
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+_YAML_INNINGS = re.compile(r'^innings:', re.M)
+
+def match_key(file_name):
+    """Return the stable key of a match: its Cricsheet file name without extension."""
+    return os.path.splitext(os.path.basename(file_name))[0]
+
+def extract_match_values(info, file_path):
+    """Return the values of a match record, in MATCH_COLUMNS order, from the info section of a match document."""
+    # Extract basic match info
+    match_type = info.get("match_type", "")
+    teams = info.get("teams", [])
+    date = info.get("dates", [""])[0]
+    if isinstance(date, datetime.date):  # unquoted dates in YAML files
+        date = date.isoformat()
+    venue = info.get("venue", "")
+    city = info.get("city", "")
+    toss_winner = info.get("toss", {}).get("winner", "")
+    toss_decision = info.get("toss", {}).get("decision", "")
+    winner = info.get("outcome", {}).get("winner", "")
+
+    return (os.path.basename(file_path), match_type,
+            teams[0] if len(teams) > 0 else "", teams[1] if len(teams) > 1 else "",
+            date, venue, city, toss_winner, toss_decision, winner)
+
+def extract_match_record(info, file_path):
+    """Build the match record from the info section of a match document."""
+    return dict(zip(MATCH_COLUMNS, extract_match_values(info, file_path)))
+
+def decode_info(text):
+    """Decode only the top-level "info" object of a match document.
+
+    The top-level keys are walked with raw_decode and decoding stops as soon
+    as "info" has been read, so the "innings" payload that follows it in
+    Cricsheet files is never tokenized. Returns {} when there is no "info"
+    key, like match_data.get("info", {}) on the fully loaded document.
+    """
+    idx = _WHITESPACE.match(text, 0).end()
+    if text[idx:idx + 1] != '{':
+        raise ValueError("match document is not a JSON object")
+    idx = _WHITESPACE.match(text, idx + 1).end()
+    while text[idx:idx + 1] == '"':
+        key, idx = _decoder.raw_decode(text, idx)
+        idx = _WHITESPACE.match(text, idx).end()
+        if text[idx:idx + 1] != ':':
+            raise ValueError(f"expected ':' at position {idx}")
+        idx = _WHITESPACE.match(text, idx + 1).end()
+        if key == "info":
+            return _decoder.raw_decode(text, idx)[0]
+        _, idx = _decoder.raw_decode(text, idx)
+        idx = _WHITESPACE.match(text, idx).end()
+        if text[idx:idx + 1] == ',':
+            idx = _WHITESPACE.match(text, idx + 1).end()
+    if text[idx:idx + 1] != '}':
+        raise ValueError(f"unexpected end of match document at position {idx}")
+    return {}
+
+def decode_yaml_info(text):
+    """Decode only the info section of a YAML match document.
+
+    Cricsheet YAML files end with the top-level "innings" key, so the text
+    is cut there and only meta/info go through the YAML loader.
+    """
+    innings = _YAML_INNINGS.search(text)
+    match_data = yaml.load(text[:innings.start()] if innings else text, Loader=YamlLoader) or {}
+    if "info" not in match_data and innings:
+        match_data = yaml.load(text, Loader=YamlLoader)
+    return match_data.get("info", {})
+
+def decode_match_info(text, file_name):
+    """Decode the info section of a JSON or YAML match document."""
+    if file_name.endswith(YAML_EXTENSIONS):
+        return decode_yaml_info(text)
+    return decode_info(text)
+
+def read_match_info(file_path):
+    """Read a match file only as far as needed to decode its info section."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        if file_path.endswith(YAML_EXTENSIONS):
+            return decode_yaml_info(f.read())
+        text = f.read(INFO_READ_SIZE)
+        while True:
+            try:
+                return decode_info(text)
+            except ValueError:
+                # The info section may continue past what has been read so far
+                more = f.read(max(len(text), INFO_READ_SIZE))
+                if not more:
+                    raise
+                text += more
+
+def parse_match_file(file_path):
+    """Parse a single match JSON or YAML file, raising if it cannot be read."""
+    return extract_match_record(read_match_info(file_path), file_path)
+
 def process_match_file(file_path):
-    """Process a single match JSON file and return a dictionary of match data."""
+    """Process a single match JSON or YAML file and return a dictionary of match data."""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            match_data = json.load(f)
-
-        # Extract basic match info
-        info = match_data.get("info", {})
-        match_type = info.get("match_type", "")
-        teams = info.get("teams", [])
-        date = info.get("dates", [""])[0]
-        venue = info.get("venue", "")
-        city = info.get("city", "")
-        toss_winner = info.get("toss", {}).get("winner", "")
-        toss_decision = info.get("toss", {}).get("decision", "")
-        winner = info.get("outcome", {}).get("winner", "")
-
-        # Create a record
-        return {
-            "file_name": os.path.basename(file_path),
-            "match_type": match_type,
-            "team1": teams[0] if len(teams) > 0 else "",
-            "team2": teams[1] if len(teams) > 1 else "",
-            "date": date,
-            "venue": venue,
-            "city": city,
-            "toss_winner": toss_winner,
-            "toss_decision": toss_decision,
-            "winner": winner
-        }
+        return parse_match_file(file_path)
     except Exception as e:
+        instrumentation.error(type(e).__name__)
         print(f"Error processing {file_path}: {e}")
         return None
 
-def process_all_matches():
-    """Process all JSON files in the DATA_DIR and save to a CSV."""
-    all_matches = []
-    for root, _, files in os.walk(DATA_DIR):
+def load_match_document(text, file_name):
+    """Fully decode a JSON or YAML match document, innings included."""
+    if file_name.endswith(YAML_EXTENSIONS):
+        return yaml.load(text, Loader=YamlLoader) or {}
+    return json.loads(text)
+
+def iter_innings_deliveries(innings):
+    """Yield (over, ball, delivery) for one innings in either Cricsheet layout.
+
+    JSON files group deliveries under "overs"; older YAML files list them as
+    {"<over>.<ball>": delivery} mappings. Balls are numbered from 1 in the
+    order they were bowled within each over, extras included.
+    """
+    if "overs" in innings:
+        for over in innings["overs"]:
+            for ball, delivery in enumerate(over.get("deliveries", []), start=1):
+                yield over["over"], ball, delivery
+        return
+    last_over, ball = None, 0
+    for item in innings.get("deliveries", []):
+        for label, delivery in item.items():
+            over = int(float(label))
+            ball = ball + 1 if over == last_over else 1
+            last_over = over
+            yield over, ball, delivery
+
+def extract_deliveries(match_data, key, columns):
+    """Append the deliveries of a match document to the DELIVERY_COLUMNS lists in `columns`."""
+    for number, innings in enumerate(match_data.get("innings") or [], start=1):
+        if "team" not in innings and len(innings) == 1:
+            innings = next(iter(innings.values()))  # YAML: {"1st innings": {...}}
+        team = innings.get("team", "")
+        for over, ball, delivery in iter_innings_deliveries(innings):
+            runs = delivery.get("runs", {})
+            wickets = delivery.get("wickets") or ([delivery["wicket"]] if "wicket" in delivery else [])
+            wicket = wickets[0] if wickets else {}
+            columns["match_key"].append(key)
+            columns["innings"].append(number)
+            columns["over"].append(over)
+            columns["ball"].append(ball)
+            columns["batting_team"].append(team)
+            columns["batter"].append(delivery.get("batter", delivery.get("batsman", "")))
+            columns["bowler"].append(delivery.get("bowler", ""))
+            columns["batter_runs"].append(runs.get("batter", runs.get("batsman", 0)))
+            columns["extras"].append(runs.get("extras", 0))
+            columns["runs"].append(runs.get("total", 0))
+            columns["wicket_kind"].append(wicket.get("kind"))
+            columns["player_out"].append(wicket.get("player_out"))
+
+def process_chunk(archive, names, known_hashes=None, deliveries=False):
+    """Parse a chunk of match files and return (results, errors, matches, delivery_columns).
+
+    With archive=None, names are file paths; otherwise they are members of
+    the ZIP archive, which is opened once for the whole chunk. Results are
+    keyed by file path or <archive>/<member> (see collect_sources) and each
+    one is a (key, sha1, parsed) tuple; the records of the parsed files are
+    appended to the `matches` MatchBatch in the same order. When the content
+    hash of a file matches its entry in known_hashes the file is not parsed
+    and `parsed` is False. Runs inside a worker process, so failures are collected as
+    (key, "<ExceptionType>: <message>") pairs rather than printed.
+
+    With deliveries=True the whole document is decoded and the ball-by-ball
+    rows of the chunk are returned as DELIVERY_COLUMNS lists; otherwise only
+    the info section is decoded and delivery_columns is None.
+    """
+    known_hashes = known_hashes or {}
+    results, errors, matches = [], [], MatchBatch()
+    columns = {column: [] for column in DELIVERY_COLUMNS} if deliveries else None
+    zip_ref = zipfile.ZipFile(archive) if archive else None
+    try:
+        for name in names:
+            key = os.path.join(archive, name) if archive else name
+            try:
+                if zip_ref:
+                    data = zip_ref.read(name)
+                else:
+                    with open(name, 'rb') as f:
+                        data = f.read()
+                digest = hashlib.sha1(data).hexdigest()
+                if known_hashes.get(key) == digest:
+                    results.append((key, digest, False))
+                    continue
+                if deliveries:
+                    match_data = load_match_document(data.decode('utf-8'), name)
+                    # Build into scratch lists so a bad file leaves no partial rows behind
+                    match_columns = {column: [] for column in DELIVERY_COLUMNS}
+                    extract_deliveries(match_data, match_key(name), match_columns)
+                    info = match_data.get("info", {})
+                else:
+                    info = decode_match_info(data.decode('utf-8'), name)
+                values = extract_match_values(info, name)
+                if deliveries:
+                    for column, column_values in match_columns.items():
+                        columns[column].extend(column_values)
+                matches.append(*values)
+                results.append((key, digest, True))
+            except Exception as e:
+                errors.append((key, f"{type(e).__name__}: {e}"))
+    finally:
+        if zip_ref:
+            zip_ref.close()
+    return results, errors, matches, columns
+
+def find_match_files(data_dir=DATA_DIR):
+    """Return the paths of all match files under data_dir in a stable order."""
+    match_files = []
+    for root, _, files in os.walk(data_dir):
         for file in files:
-            if file.endswith(".json"):  # Only process JSON files
-                file_path = os.path.join(root, file)
-                match_record = process_match_file(file_path)
-                if match_record:
-                    all_matches.append(match_record)
+            if file.endswith(MATCH_EXTENSIONS):  # Only process match documents
+                match_files.append(os.path.join(root, file))
+    return sorted(match_files)
+
+def archive_paths(archive_dir=ARCHIVE_DIR):
+    """Return the cached Cricsheet archives (FORMAT_MAP keys) present in archive_dir."""
+    paths = [os.path.join(archive_dir, zip_name) for zip_name in FORMAT_MAP]
+    return [path for path in paths if os.path.exists(path)]
+
+def collect_sources(sources):
+    """Map every match file in `sources` to (archive, name, stamp).
+
+    Directories are walked for match files, keyed by their path. ZIP archives
+    contribute their match members without extracting them, keyed as
+    <archive path>/<member name>. The stamp holds the size and mtime (and
+    CRC for archive members) used to spot unchanged files cheaply.
+
+    A match is ingested once per match_key: when the same match turns up
+    more than once (e.g. in an extracted folder and in the cached archive
+    it came from) the first source listed wins, then the first path
+    within it, and the other copies are skipped with a notice.
+    """
+    items, seen, skipped = {}, set(), 0
+    for source in sources:
+        for key, item in source_items(source):
+            key_of_match = match_key(item[1])
+            if key_of_match in seen:
+                skipped += 1
+                continue
+            seen.add(key_of_match)
+            items[key] = item
+    if skipped:
+        print(f"Skipped {skipped} match files already found in an earlier source")
+    return items
+
+def source_items(source):
+    """Yield (key, (archive, name, stamp)) for every match file in one source."""
+    if source.endswith(".zip"):
+        with zipfile.ZipFile(source) as zip_ref:
+            for member in zip_ref.infolist():
+                if member.is_dir() or not member.filename.endswith(MATCH_EXTENSIONS):
+                    continue
+                stamp = {"size": member.file_size,
+                         "mtime_ns": calendar.timegm(member.date_time + (0, 0, 0)) * 10**9,
+                         "crc": member.CRC}
+                yield os.path.join(source, member.filename), (source, member.filename, stamp)
+    else:
+        for file_path in find_match_files(source):
+            st = os.stat(file_path)
+            stamp = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            yield file_path, (None, file_path, stamp)
+
+def load_manifest():
+    """Load the file manifest written by the previous run, keyed by path."""
+    if not os.path.exists(MANIFEST_FILE) or not os.path.exists(OUTPUT_FILE):
+        return {}
+    with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f).get("files", {})
+
+def save_manifest(entries):
+    """Atomically replace the manifest with the given path -> entry mapping."""
+    tmp_path = MANIFEST_FILE + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"files": entries}, f)
+    os.replace(tmp_path, MANIFEST_FILE)
+
+def delivery_table(columns):
+    """Build a dictionary-encoded Arrow table from DELIVERY_COLUMNS lists."""
+    import pyarrow as pa  # only needed when the deliveries dataset is written
+
+    def strings(values):
+        return pa.array(values, type=pa.string()).dictionary_encode()
+
+    return pa.table({
+        "match_key": strings(columns["match_key"]),
+        "innings": pa.array(columns["innings"], type=pa.int8()),
+        "over": pa.array(columns["over"], type=pa.int16()),
+        "ball": pa.array(columns["ball"], type=pa.int8()),
+        "batting_team": strings(columns["batting_team"]),
+        "batter": strings(columns["batter"]),
+        "bowler": strings(columns["bowler"]),
+        "batter_runs": pa.array(columns["batter_runs"], type=pa.int16()),
+        "extras": pa.array(columns["extras"], type=pa.int16()),
+        "runs": pa.array(columns["runs"], type=pa.int16()),
+        "wicket_kind": strings(columns["wicket_kind"]),
+        "player_out": strings(columns["player_out"]),
+    })
+
+def open_deliveries_writer():
+    """Open a new Parquet part file in DELIVERIES_DIR for this run's deliveries."""
+    import pyarrow.parquet as pq
+
+    os.makedirs(DELIVERIES_DIR, exist_ok=True)
+    path = os.path.join(DELIVERIES_DIR, f"part-{time.time_ns()}.parquet")
+    empty = delivery_table({column: [] for column in DELIVERY_COLUMNS})
+    return pq.ParquetWriter(path, empty.schema, compression="zstd")
+
+def drop_deliveries(match_keys, keep=None):
+    """Remove the deliveries of match_keys from every part file except `keep`.
+
+    Only parts that contain one of the keys are rewritten, one row group at
+    a time, and parts left empty are deleted.
+    """
+    if not match_keys or not os.path.isdir(DELIVERIES_DIR):
+        return
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    value_set = pa.array(sorted(match_keys), type=pa.string())
+    for file in sorted(os.listdir(DELIVERIES_DIR)):
+        path = os.path.join(DELIVERIES_DIR, file)
+        if not file.endswith(".parquet") or path == keep:
+            continue
+        with pq.ParquetFile(path) as part:
+            part_keys = part.read(columns=["match_key"]).column("match_key").cast(pa.string())
+            if not pc.any(pc.is_in(part_keys, value_set=value_set)).as_py():
+                continue
+            tmp_path = path + ".tmp"
+            kept = 0
+            with pq.ParquetWriter(tmp_path, part.schema_arrow, compression="zstd") as writer:
+                for group in range(part.num_row_groups):
+                    table = part.read_row_group(group)
+                    stale = pc.is_in(table.column("match_key").cast(pa.string()), value_set=value_set)
+                    table = table.filter(pc.invert(stale))
+                    kept += table.num_rows
+                    writer.write_table(table)
+        if kept:
+            os.replace(tmp_path, path)
+        else:
+            os.remove(tmp_path)
+            os.remove(path)
+
+def has_deliveries():
+    """Return True if DELIVERIES_DIR holds part files from an earlier run."""
+    return os.path.isdir(DELIVERIES_DIR) and any(file.endswith(".parquet") for file in os.listdir(DELIVERIES_DIR))
+
+def clear_deliveries():
+    """Delete every part file in DELIVERIES_DIR before a full rebuild."""
+    if os.path.isdir(DELIVERIES_DIR):
+        for file in os.listdir(DELIVERIES_DIR):
+            if file.endswith(".parquet"):
+                os.remove(os.path.join(DELIVERIES_DIR, file))
+
+def write_matches_parquet(matches, path=OUTPUT_PARQUET):
+    """Write a MatchBatch to Parquet (see MatchBatch.to_table)."""
+    import pyarrow.parquet as pq
+
+    tmp_path = path + ".tmp"
+    pq.write_table(matches.to_table(), tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+def write_matches_stream(new_path, stale, order, previous_file=None, parquet=False,
+                         batch_size=STREAM_BATCH_SIZE):
+    """Merge the kept rows of previous_file with the new rows in new_path into OUTPUT_FILE.
+
+    Both files are read row by row and are already in path order, so the
+    rows are merged on their position in `order` (match_key -> index) and
+    written a MatchBatch of STREAM_BATCH_SIZE at a time; rows of matches in
+    `stale` (match keys) are dropped from previous_file. With parquet=True each batch is also
+    written as a row group of OUTPUT_PARQUET. Memory holds one batch
+    whatever the number of matches. Returns the number of rows written.
+    """
+    with contextlib.ExitStack() as stack:
+        def rows(path):
+            f = stack.enter_context(open(path, 'r', newline='', encoding='utf-8'))
+            reader = csv.reader(f)
+            next(reader, None)  # header
+            return reader
+
+        kept = (row for row in rows(previous_file) if match_key(row[0]) not in stale) if previous_file else iter(())
+        merged = heapq.merge(kept, rows(new_path), key=lambda row: order.get(match_key(row[0]), len(order)))
+
+        tmp_path = OUTPUT_FILE + ".tmp"
+        out = stack.enter_context(open(tmp_path, 'w', newline='', encoding='utf-8'))
+        # pandas' to_csv line endings, so either writer produces the same file
+        writer = csv.writer(out, lineterminator=os.linesep)
+        writer.writerow(MATCH_COLUMNS)
+        parquet_writer = None
+        if parquet:
+            import pyarrow.parquet as pq
+            parquet_writer = stack.enter_context(
+                pq.ParquetWriter(OUTPUT_PARQUET + ".tmp", MatchBatch().to_table().schema, compression="zstd"))
+
+        written = 0
+        while True:
+            batch = MatchBatch()
+            for row in itertools.islice(merged, batch_size):
+                batch.append(*row)
+            if not len(batch):
+                break
+            writer.writerows(batch.rows(missing=''))
+            if parquet_writer:
+                parquet_writer.write_table(batch.to_table())
+            written += len(batch)
+    os.replace(tmp_path, OUTPUT_FILE)
+    if parquet:
+        os.replace(OUTPUT_PARQUET + ".tmp", OUTPUT_PARQUET)
+    return written
+
+def bounded_map(executor, fn, argument_tuples, window):
+    """Like executor.map, but with at most `window` calls submitted ahead of the consumer."""
+    pending = deque()
+    for arguments in argument_tuples:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, *arguments))
+    while pending:
+        yield pending.popleft().result()
+
+def iter_chunk_results(items, keys, known_hashes, workers, chunk_size, deliveries_writer=None):
+    """Run process_chunk over the given item keys and yield (results, errors, matches) per chunk.
+
+    Chunks run on a process pool if workers > 1 and are yielded in key
+    order; only a couple of chunks per worker are in flight, so results
+    never pile up ahead of a slow consumer. With a deliveries_writer, each
+    chunk's deliveries are written as a row group as soon as the chunk is
+    done.
+    """
+    # Chunks never span archives so each worker opens at most one ZIP per chunk
+    chunks = []
+    for key in keys:
+        archive, name, _ = items[key]
+        if not chunks or chunks[-1][0] != archive or len(chunks[-1][1]) >= chunk_size:
+            chunks.append((archive, [], {}, deliveries_writer is not None))
+        chunks[-1][1].append(name)
+        if key in known_hashes:
+            chunks[-1][2][key] = known_hashes[key]
+
+    if workers == 1 or len(chunks) <= 1:
+        executor = None
+        outputs = (process_chunk(*chunk) for chunk in chunks)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        # Results come back in submission order
+        outputs = bounded_map(executor, process_chunk, chunks, 2 * workers)
+
+    try:
+        for results, errors, matches, columns in outputs:
+            if deliveries_writer is not None and columns["match_key"]:
+                deliveries_writer.write_table(delivery_table(columns))
+                instrumentation.count(deliveries=len(columns["match_key"]))
+            yield results, errors, matches
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+def process_all_matches(sources=None, workers=None, chunk_size=CHUNK_SIZE, incremental=True,
+                        deliveries=False, parquet=False, stream=False):
+    """Process all JSON and YAML match files in `sources` and save to a CSV.
+
+    Sources are directories of match files or Cricsheet ZIP archives, whose
+    members are streamed straight out of the archive; the default is
+    DATA_DIR. Files are parsed in chunks of chunk_size on a pool of
+    `workers` processes (all cores by default, 1 parses in-process). Rows
+    are written in path order whatever the worker count. Returns the list
+    of (path, message) pairs for files that could not be processed.
+
+    With incremental=True, files whose stamp (size, mtime and for archive
+    members CRC) matches MANIFEST_FILE are not read, files whose content
+    hash is unchanged are not parsed, and only the rows of new, changed and
+    deleted files are replaced in the existing OUTPUT_FILE.
+
+    With deliveries=True, or when DELIVERIES_DIR holds parts from an
+    earlier run, the ball-by-ball rows of every parsed match are also
+    written to a new Parquet part in DELIVERIES_DIR, and the rows of
+    changed and deleted matches are dropped from the older parts.
+
+    With parquet=True, or when OUTPUT_PARQUET exists from an earlier run,
+    the records are also written there (see write_matches_parquet).
+
+    Records are held as MatchBatch columns rather than dicts. With
+    stream=True none is kept in memory: each chunk's records go straight
+    to a spill file and are merged with the kept rows of the
+    previous OUTPUT_FILE in batches (see write_matches_stream), so peak
+    memory does not grow with the number of matches; only the manifest
+    entries (a few values per file) do. The output is the same.
+    """
+    workers = workers or os.cpu_count() or 1
+    items = collect_sources(sources or [DATA_DIR])
+    manifest = load_manifest() if incremental else {}
+    if not deliveries and has_deliveries():
+        # Re-parsed matches would otherwise lose their rows from the existing dataset
+        print(f"{DELIVERIES_DIR}/ holds a deliveries dataset; keeping it up to date")
+        deliveries = True
+
+    # Matches whose earlier copy is gone (e.g. now read from another source) lose
+    # their row with it, so they are parsed again even if this copy is unchanged
+    removed = {match_key(entry["file_name"]) for key, entry in manifest.items() if key not in items}
+
+    entries, to_parse, known_hashes = {}, [], {}
+    for key in sorted(items):
+        stamp = items[key][2]
+        entry = manifest.get(key)
+        # Matches ingested without deliveries are re-parsed once deliveries are wanted
+        missing_deliveries = deliveries and entry and not entry.get("deliveries")
+        reread = entry and match_key(entry["file_name"]) in removed
+        if entry and not missing_deliveries and not reread \
+                and all(entry.get(field) == value for field, value in stamp.items()):
+            entries[key] = entry
+        else:
+            to_parse.append(key)
+            if entry and not missing_deliveries and not reread:
+                known_hashes[key] = entry["sha1"]
+
+    if deliveries and not manifest:
+        clear_deliveries()
+    writer = open_deliveries_writer() if deliveries and to_parse else None
+    spill_path = OUTPUT_FILE + ".new"
+    spill = open(spill_path, 'w', newline='', encoding='utf-8') if stream else None
+    matches, reparsed, errors = MatchBatch(), set(), []
+    try:
+        if spill:
+            spill_writer = csv.writer(spill)
+            spill_writer.writerow(MATCH_COLUMNS)
+        for results, chunk_errors, chunk_matches in iter_chunk_results(items, to_parse, known_hashes, workers,
+                                                                       chunk_size, writer):
+            errors.extend(chunk_errors)
+            for key, digest, parsed in results:
+                previous_entry = manifest.get(key, {})
+                entries[key] = {"file_name": os.path.basename(key), **items[key][2], "sha1": digest,
+                                "deliveries": deliveries if parsed else previous_entry.get("deliveries", False)}
+                if parsed:
+                    reparsed.add(key)
+            if spill:
+                spill_writer.writerows(chunk_matches.rows(missing=''))
+            else:
+                matches.extend(chunk_matches)
+    finally:
+        if writer:
+            writer.close()
+        if spill:
+            spill.close()
+
+    instrumentation.count(files=len(to_parse), bytes_read=sum(items[key][2]["size"] for key in to_parse),
+                          unchanged=len(items) - len(to_parse))
+    for _, message in errors:
+        instrumentation.error(instrumentation.error_cause(message))
+
+    # Rows to drop, by match_key: files that were re-parsed, failed or disappeared since the last run
+    stale = {match_key(entry["file_name"]) for key, entry in manifest.items()
+             if key not in entries or key in reparsed}
+    if stale:
+        drop_deliveries(stale, keep=writer.where if writer else None)
+
+    # Keep the same row order a full run would produce
+    order = {match_key(entries[k]["file_name"]): i for i, k in enumerate(sorted(entries))}
+    parquet = parquet or os.path.exists(OUTPUT_PARQUET)
+    if stream:
+        total = write_matches_stream(spill_path, stale, order, OUTPUT_FILE if manifest else None, parquet)
+        os.remove(spill_path)
+    else:
+        if manifest:
+            previous = MatchBatch.read_csv(OUTPUT_FILE)
+            previous = previous.take([i for i, name in enumerate(previous.file_names)
+                                      if match_key(name) not in stale])
+            previous.extend(matches)
+            positions = [order.get(match_key(name), len(order)) for name in previous.file_names]
+            matches = previous.take(sorted(range(len(previous)), key=positions.__getitem__))
+        matches.write_csv(OUTPUT_FILE)
+        if parquet:
+            write_matches_parquet(matches)
+        total = len(matches)
+    save_manifest(entries)
+
+    removed = len(set(manifest) - set(entries))
+    instrumentation.count(rows=len(reparsed))
+    print(f"Processed {len(reparsed)} new or changed matches "
+          f"({total} in total, {removed} removed) and saved to {OUTPUT_FILE}")
+    if writer:
+        print(f"Wrote deliveries of {len(reparsed)} matches to {writer.where}")
+    if errors:
+        print(f"{len(errors)} files could not be processed")
+    return errors
+
+def add_arguments(parser):
+    parser.add_argument("sources", nargs="*",
+                        help=f"directories or ZIP archives to read (default: {DATA_DIR})")
+    parser.add_argument("--archives", action="store_true",
+                        help=f"read the cached Cricsheet archives in {ARCHIVE_DIR}")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes to parse with (default: all cores, 1 = serial)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="files handed to a worker at a time")
+    parser.add_argument("--full", action="store_true",
+                        help=f"ignore {MANIFEST_FILE} and re-parse every file")
+    parser.add_argument("--deliveries", action="store_true",
+                        help=f"also write ball-by-ball rows to {DELIVERIES_DIR}/ (needs pyarrow; "
+                             "always on once that dataset exists)")
+    parser.add_argument("--parquet", action="store_true",
+                        help=f"also write {OUTPUT_PARQUET} (needs pyarrow)")
+    parser.add_argument("--stream", action="store_true",
+                        help=f"write records in batches of {STREAM_BATCH_SIZE} as they are parsed, in constant memory")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract match records from Cricsheet JSON/YAML files")
+    add_arguments(parser)
+    return parser.parse_args()
 
-    # Convert to DataFrame and save
-    df = pd.DataFrame(all_matches)
-    df.to_csv(OUTPUT_FILE, index=False, encoding='utf-8')
-    print(f"Processed {len(all_matches)} matches and saved to {OUTPUT_FILE}")
+def main(args=None):
+    args = args or parse_args()
+    sources = args.sources + (archive_paths() if args.archives else [])
+    process_all_matches(sources, workers=args.workers, chunk_size=args.chunk_size,
+                        incremental=not args.full, deliveries=args.deliveries,
+                        parquet=args.parquet, stream=args.stream)
 
 if __name__ == "__main__":
-    process_all_matches()
+    main()
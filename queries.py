@@ -1,439 +1,841 @@
+import json
+import time
+import queue
+import argparse
+import hashlib
 import sqlite3
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from tabulate import tabulate
+import instrumentation
 from datetime import datetime
 
+# SQLite database file
+DB_FILE = 'cricket_analytics.db'
+
+# Persistent cache of report results, valid for one database fingerprint
+CACHE_FILE = 'query_cache.db'
+
+# Least recently used results are evicted beyond this many bytes
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# run_queries backends: SQL against the database, or array_engine in process
+BACKENDS = ['sqlite', 'numpy']
+
 def create_connection():
     """Create a database connection to the SQLite database"""
     conn = None
     try:
-        conn = sqlite3.connect('cricket_analytics.db')
+        conn = sqlite3.connect(DB_FILE)
         print("Successfully connected to the database")
         return conn
     except sqlite3.Error as e:
         print(f"Error connecting to database: {e}")
         return None
 
-def run_queries(conn):
-    """Execute and display 20 analytical queries using only available columns"""
-    queries = {
-        # Basic Counts
-        1: "Total matches by format",
-        2: "Matches per year across all formats",
-        
-        # Team Performance
-        3: "Teams with most matches played",
-        4: "Top 5 winning teams overall",
-        5: "Win percentage by team (min 20 matches)",
-        6: "Team performance by match format",
-        7: "Head-to-head records between top teams",
-        
-        # Match Characteristics
-        8: "Toss decision frequency by format",
-        9: "Toss win vs match win correlation",
-        10: "Most successful teams when winning toss",
-        
-        # Venue Analysis
-        11: "Top 10 most used venues",
-        12: "Venues with highest home advantage",
-        13: "Cities hosting most matches",
-        
-        # Temporal Analysis
-        14: "Matches per month (seasonality)",
-        15: "Team performance by decade",
-        
-        # Match Type Specific
-        16: "Test match results over time",
-        17: "T20 match winners analysis",
-        18: "ODI match winners analysis",
-        
-        # Advanced Analytics
-        19: "Teams with best win rate when losing toss",
-        20: "Most consistent venues (hosting multiple formats)"
-    }
-
-    sql_statements = {
-        1: """
-        SELECT match_type, COUNT(*) as matches
-        FROM (
-            SELECT match_type FROM test_matches
-            UNION ALL SELECT match_type FROM odi_matches
-            UNION ALL SELECT match_type FROM t20_matches
-        )
-        GROUP BY match_type
-        ORDER BY matches DESC
-        """,
-        
-        2: """
-        SELECT SUBSTR(date, 1, 4) as year, COUNT(*) as matches
-        FROM (
-            SELECT date FROM test_matches
-            UNION ALL SELECT date FROM odi_matches
-            UNION ALL SELECT date FROM t20_matches
-        )
-        WHERE date IS NOT NULL
-        GROUP BY year
-        ORDER BY year
-        """,
-        
-        3: """
-        SELECT team, COUNT(*) as matches_played
-        FROM (
-            SELECT team1 as team FROM test_matches UNION ALL
-            SELECT team2 as team FROM test_matches UNION ALL
-            SELECT team1 as team FROM odi_matches UNION ALL
-            SELECT team2 as team FROM odi_matches UNION ALL
-            SELECT team1 as team FROM t20_matches UNION ALL
-            SELECT team2 as team FROM t20_matches
-        )
+QUERIES = {
+    # Basic Counts
+    1: "Total matches by format",
+    2: "Matches per year across all formats",
+    
+    # Team Performance
+    3: "Teams with most matches played",
+    4: "Top 5 winning teams overall",
+    5: "Win percentage by team (min 20 matches)",
+    6: "Team performance by match format",
+    7: "Head-to-head records between top teams",
+    
+    # Match Characteristics
+    8: "Toss decision frequency by format",
+    9: "Toss win vs match win correlation",
+    10: "Most successful teams when winning toss",
+    
+    # Venue Analysis
+    11: "Top 10 most used venues",
+    12: "Venues with highest home advantage",
+    13: "Cities hosting most matches",
+    
+    # Temporal Analysis
+    14: "Matches per month (seasonality)",
+    15: "Team performance by decade",
+    
+    # Match Type Specific
+    16: "Test match results over time",
+    17: "T20 match winners analysis",
+    18: "ODI match winners analysis",
+    
+    # Advanced Analytics
+    19: "Teams with best win rate when losing toss",
+    20: "Most consistent venues (hosting multiple formats)"
+}
+
+# Written against the matches table and its per-team unpivot team_matches
+# (one row per team per match with a won flag), both built by db.py
+SQL_STATEMENTS = {
+    1: """
+    SELECT match_type, COUNT(*) as matches
+    FROM matches
+    GROUP BY match_type
+    ORDER BY matches DESC
+    """,
+    
+    2: """
+    SELECT SUBSTR(date, 1, 4) as year, COUNT(*) as matches
+    FROM matches
+    WHERE date IS NOT NULL
+    GROUP BY year
+    ORDER BY year
+    """,
+    
+    3: """
+    SELECT team, COUNT(*) as matches_played
+    FROM team_matches
+    GROUP BY team
+    ORDER BY matches_played DESC
+    LIMIT 10
+    """,
+    
+    4: """
+    SELECT winner, COUNT(*) as wins
+    FROM matches
+    WHERE winner IS NOT NULL
+    GROUP BY winner
+    ORDER BY wins DESC
+    LIMIT 5
+    """,
+    
+    5: """
+    WITH team_totals AS (
+        SELECT team, COUNT(*) as total_matches, SUM(won) as wins
+        FROM team_matches
         GROUP BY team
-        ORDER BY matches_played DESC
-        LIMIT 10
-        """,
-        
-        4: """
-        SELECT winner, COUNT(*) as wins
-        FROM (
-            SELECT winner FROM test_matches WHERE winner IS NOT NULL
-            UNION ALL SELECT winner FROM odi_matches WHERE winner IS NOT NULL
-            UNION ALL SELECT winner FROM t20_matches WHERE winner IS NOT NULL
-        )
+        HAVING total_matches >= 20
+    )
+    SELECT team, 
+           total_matches,
+           wins,
+           ROUND((wins * 100.0 / total_matches), 2) as win_percentage
+    FROM team_totals
+    ORDER BY win_percentage DESC
+    LIMIT 10
+    """,
+    
+    6: """
+    SELECT 
+        winner as team,
+        SUM(CASE WHEN match_type = 'test' THEN 1 ELSE 0 END) as test_wins,
+        SUM(CASE WHEN match_type = 'odi' THEN 1 ELSE 0 END) as odi_wins,
+        SUM(CASE WHEN match_type = 't20' THEN 1 ELSE 0 END) as t20_wins
+    FROM matches
+    WHERE winner IS NOT NULL
+    GROUP BY winner
+    ORDER BY (test_wins + odi_wins + t20_wins) DESC
+    LIMIT 10
+    """,
+    
+    7: """
+    WITH top_teams AS MATERIALIZED (
+        SELECT winner
+        FROM matches
+        WHERE winner IS NOT NULL
         GROUP BY winner
-        ORDER BY wins DESC
+        ORDER BY COUNT(*) DESC
         LIMIT 5
-        """,
-        
-        5: """
-        WITH team_matches AS (
-            SELECT team, COUNT(*) as total_matches,
-                   SUM(CASE WHEN winner = team THEN 1 ELSE 0 END) as wins
-            FROM (
-                SELECT team1 as team, winner FROM test_matches UNION ALL
-                SELECT team2 as team, winner FROM test_matches UNION ALL
-                SELECT team1 as team, winner FROM odi_matches UNION ALL
-                SELECT team2 as team, winner FROM odi_matches UNION ALL
-                SELECT team1 as team, winner FROM t20_matches UNION ALL
-                SELECT team2 as team, winner FROM t20_matches
-            )
-            GROUP BY team
-            HAVING total_matches >= 20
-        )
-        SELECT team, 
-               total_matches,
-               wins,
-               ROUND((wins * 100.0 / total_matches), 2) as win_percentage
+    )
+    SELECT 
+        team1,
+        team2,
+        COUNT(*) as total_matches,
+        SUM(CASE WHEN winner = team1 THEN 1 ELSE 0 END) as team1_wins,
+        SUM(CASE WHEN winner = team2 THEN 1 ELSE 0 END) as team2_wins,
+        SUM(CASE WHEN winner IS NULL THEN 1 ELSE 0 END) as draws_or_ties
+    FROM matches
+    WHERE team1 IN (SELECT winner FROM top_teams) AND team2 IN (SELECT winner FROM top_teams)
+    GROUP BY team1, team2
+    HAVING total_matches >= 5
+    ORDER BY total_matches DESC
+    """,
+    
+    8: """
+    SELECT match_type, toss_decision, COUNT(*) as count
+    FROM matches
+    WHERE toss_decision IS NOT NULL
+    GROUP BY match_type, toss_decision
+    ORDER BY match_type, count DESC
+    """,
+    
+    9: """
+    SELECT 
+        match_type,
+        COUNT(*) as total_matches,
+        SUM(CASE WHEN toss_winner = winner THEN 1 ELSE 0 END) as toss_and_win,
+        ROUND(SUM(CASE WHEN toss_winner = winner THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) as percentage
+    FROM matches
+    WHERE toss_winner IS NOT NULL AND winner IS NOT NULL
+    GROUP BY match_type
+    ORDER BY percentage DESC
+    """,
+    
+    10: """
+    SELECT 
+        team as winner,
+        SUM(won) as wins_after_toss_win,
+        ROUND(SUM(won) * 100.0 / COUNT(*), 2) as win_percentage_when_toss_winner
+    FROM team_matches
+    WHERE toss_won = 1
+    GROUP BY team
+    HAVING wins_after_toss_win >= 10
+    ORDER BY win_percentage_when_toss_winner DESC
+    LIMIT 10
+    """,
+    
+    11: """
+    SELECT venue, COUNT(*) as matches_hosted
+    FROM matches
+    WHERE venue IS NOT NULL
+    GROUP BY venue
+    ORDER BY matches_hosted DESC
+    LIMIT 10
+    """,
+    
+    12: """
+    WITH venue_teams AS (
+        SELECT venue, city, team, COUNT(*) as total_matches, SUM(won) as wins
         FROM team_matches
-        ORDER BY win_percentage DESC
-        LIMIT 10
-        """,
-        
-        6: """
-        SELECT 
-            team,
-            SUM(CASE WHEN format = 'test' THEN wins ELSE 0 END) as test_wins,
-            SUM(CASE WHEN format = 'odi' THEN wins ELSE 0 END) as odi_wins,
-            SUM(CASE WHEN format = 't20' THEN wins ELSE 0 END) as t20_wins
-        FROM (
-            SELECT 'test' as format, winner as team, COUNT(*) as wins 
-            FROM test_matches WHERE winner IS NOT NULL GROUP BY winner
-            UNION ALL
-            SELECT 'odi', winner, COUNT(*) FROM odi_matches WHERE winner IS NOT NULL GROUP BY winner
-            UNION ALL
-            SELECT 't20', winner, COUNT(*) FROM t20_matches WHERE winner IS NOT NULL GROUP BY winner
-        )
-        GROUP BY team
-        ORDER BY (test_wins + odi_wins + t20_wins) DESC
-        LIMIT 10
-        """,
-        
-        7: """
-        WITH top_teams AS (
-            SELECT winner FROM (
-                SELECT winner, COUNT(*) as wins FROM (
-                    SELECT winner FROM test_matches WHERE winner IS NOT NULL
-                    UNION ALL SELECT winner FROM odi_matches WHERE winner IS NOT NULL
-                    UNION ALL SELECT winner FROM t20_matches WHERE winner IS NOT NULL
-                )
-                GROUP BY winner
-                ORDER BY wins DESC
-                LIMIT 5
-            )
-        )
-        SELECT 
-            t1.team1,
-            t1.team2,
-            COUNT(*) as total_matches,
-            SUM(CASE WHEN t1.winner = t1.team1 THEN 1 ELSE 0 END) as team1_wins,
-            SUM(CASE WHEN t1.winner = t1.team2 THEN 1 ELSE 0 END) as team2_wins,
-            SUM(CASE WHEN t1.winner IS NULL THEN 1 ELSE 0 END) as draws_or_ties
-        FROM (
-            SELECT team1, team2, winner FROM test_matches
-            UNION ALL SELECT team1, team2, winner FROM odi_matches
-            UNION ALL SELECT team1, team2, winner FROM t20_matches
-        ) t1
-        WHERE (t1.team1 IN (SELECT winner FROM top_teams) AND t1.team2 IN (SELECT winner FROM top_teams))
-        GROUP BY t1.team1, t1.team2
-        HAVING total_matches >= 5
-        ORDER BY total_matches DESC
-        """,
-        
-        8: """
-        SELECT match_type, toss_decision, COUNT(*) as count
-        FROM (
-            SELECT match_type, toss_decision FROM test_matches
-            UNION ALL SELECT match_type, toss_decision FROM odi_matches
-            UNION ALL SELECT match_type, toss_decision FROM t20_matches
-        )
-        WHERE toss_decision IS NOT NULL
-        GROUP BY match_type, toss_decision
-        ORDER BY match_type, count DESC
-        """,
-        
-        9: """
-        SELECT 
-            match_type,
-            COUNT(*) as total_matches,
-            SUM(CASE WHEN toss_winner = winner THEN 1 ELSE 0 END) as toss_and_win,
-            ROUND(SUM(CASE WHEN toss_winner = winner THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) as percentage
-        FROM (
-            SELECT match_type, toss_winner, winner FROM test_matches
-            UNION ALL SELECT match_type, toss_winner, winner FROM odi_matches
-            UNION ALL SELECT match_type, toss_winner, winner FROM t20_matches
-        )
-        WHERE toss_winner IS NOT NULL AND winner IS NOT NULL
-        GROUP BY match_type
-        ORDER BY percentage DESC
-        """,
-        
-        10: """
-        SELECT 
-            winner,
-            COUNT(*) as wins_after_toss_win,
-            ROUND(COUNT(*) * 100.0 / (
-                SELECT COUNT(*) 
-                FROM (
-                    SELECT winner FROM test_matches WHERE toss_winner = winner
-                    UNION ALL SELECT winner FROM odi_matches WHERE toss_winner = winner
-                    UNION ALL SELECT winner FROM t20_matches WHERE toss_winner = winner
-                ) t WHERE t.winner = m.winner
-            ), 2) as win_percentage_when_toss_winner
-        FROM (
-            SELECT winner FROM test_matches WHERE toss_winner = winner
-            UNION ALL SELECT winner FROM odi_matches WHERE toss_winner = winner
-            UNION ALL SELECT winner FROM t20_matches WHERE toss_winner = winner
-        ) m
-        GROUP BY winner
-        HAVING wins_after_toss_win >= 10
-        ORDER BY win_percentage_when_toss_winner DESC
-        LIMIT 10
-        """,
-        
-        11: """
-        SELECT venue, COUNT(*) as matches_hosted
-        FROM (
-            SELECT venue FROM test_matches
-            UNION ALL SELECT venue FROM odi_matches
-            UNION ALL SELECT venue FROM t20_matches
-        )
+        GROUP BY side, venue, city, team
+    )
+    SELECT 
+        venue,
+        city,
+        team,
+        total_matches,
+        wins,
+        ROUND((wins * 100.0 / total_matches), 2) as win_percentage
+    FROM venue_teams
+    WHERE total_matches >= 10
+    ORDER BY win_percentage DESC
+    LIMIT 10
+    """,
+    
+    13: """
+    SELECT city, COUNT(*) as matches_hosted
+    FROM matches
+    WHERE city IS NOT NULL
+    GROUP BY city
+    ORDER BY matches_hosted DESC
+    LIMIT 10
+    """,
+    
+    14: """
+    SELECT 
+        CASE 
+            WHEN SUBSTR(date, 6, 2) IN ('12', '01', '02') THEN 'Winter'
+            WHEN SUBSTR(date, 6, 2) IN ('03', '04', '05') THEN 'Spring'
+            WHEN SUBSTR(date, 6, 2) IN ('06', '07', '08') THEN 'Summer'
+            WHEN SUBSTR(date, 6, 2) IN ('09', '10', '11') THEN 'Fall'
+            ELSE 'Unknown'
+        END as season,
+        COUNT(*) as matches
+    FROM matches
+    WHERE date IS NOT NULL
+    GROUP BY season
+    ORDER BY matches DESC
+    """,
+    
+    15: """
+    SELECT 
+        team,
+        SUBSTR(date, 1, 3) || '0s' as decade,
+        COUNT(*) as matches,
+        SUM(won) as wins,
+        ROUND(SUM(won) * 100.0 / COUNT(*), 2) as win_percentage
+    FROM team_matches
+    WHERE date IS NOT NULL AND date >= '1970'
+    GROUP BY team, decade
+    HAVING matches >= 20
+    ORDER BY decade, win_percentage DESC
+    """,
+    
+    16: """
+    SELECT 
+        SUBSTR(date, 1, 4) as year,
+        COUNT(*) as test_matches,
+        SUM(CASE WHEN winner = team1 THEN 1 ELSE 0 END) as team1_wins,
+        SUM(CASE WHEN winner = team2 THEN 1 ELSE 0 END) as team2_wins,
+        SUM(CASE WHEN winner IS NULL THEN 1 ELSE 0 END) as draws
+    FROM matches
+    WHERE match_type = 'test' AND date IS NOT NULL
+    GROUP BY year
+    HAVING test_matches >= 5
+    ORDER BY year
+    """,
+    
+    17: """
+    SELECT 
+        winner,
+        COUNT(*) as t20_wins,
+        ROUND(COUNT(*) * 100.0 / (
+            SELECT COUNT(*) FROM matches WHERE match_type = 't20' AND winner IS NOT NULL
+        ), 2) as percentage_of_total_wins
+    FROM matches
+    WHERE match_type = 't20' AND winner IS NOT NULL
+    GROUP BY winner
+    HAVING COUNT(*) >= 10
+    ORDER BY t20_wins DESC
+    LIMIT 10
+    """,
+    
+    18: """
+    SELECT 
+        winner,
+        COUNT(*) as odi_wins,
+        ROUND(COUNT(*) * 100.0 / (
+            SELECT COUNT(*) FROM matches WHERE match_type = 'odi' AND winner IS NOT NULL
+        ), 2) as percentage_of_total_wins
+    FROM matches
+    WHERE match_type = 'odi' AND winner IS NOT NULL
+    GROUP BY winner
+    HAVING COUNT(*) >= 20
+    ORDER BY odi_wins DESC
+    LIMIT 10
+    """,
+    
+    19: """
+    SELECT 
+        team as winner,
+        SUM(won) as wins_without_toss,
+        ROUND(SUM(won) * 100.0 / COUNT(*), 2) as win_percentage_when_losing_toss
+    FROM team_matches
+    WHERE toss_won = 0
+    GROUP BY team
+    HAVING wins_without_toss >= 10
+    ORDER BY win_percentage_when_losing_toss DESC
+    LIMIT 10
+    """,
+    
+    20: """
+    SELECT venue, 
+           COUNT(*) as formats_hosted,
+           GROUP_CONCAT(match_type) as format_list
+    FROM (
+        SELECT DISTINCT venue, match_type
+        FROM matches
         WHERE venue IS NOT NULL
-        GROUP BY venue
-        ORDER BY matches_hosted DESC
-        LIMIT 10
-        """,
-        
-        12: """
-        WITH venue_teams AS (
-            SELECT 
-                venue,
-                city,
-                team1 as team,
-                COUNT(*) as total_matches,
-                SUM(CASE WHEN winner = team1 THEN 1 ELSE 0 END) as wins
-            FROM (
-                SELECT venue, city, team1, winner FROM test_matches
-                UNION ALL SELECT venue, city, team1, winner FROM odi_matches
-                UNION ALL SELECT venue, city, team1, winner FROM t20_matches
-            )
-            GROUP BY venue, city, team1
-            
-            UNION ALL
-            
-            SELECT 
-                venue,
-                city,
-                team2 as team,
-                COUNT(*) as total_matches,
-                SUM(CASE WHEN winner = team2 THEN 1 ELSE 0 END) as wins
-            FROM (
-                SELECT venue, city, team2, winner FROM test_matches
-                UNION ALL SELECT venue, city, team2, winner FROM odi_matches
-                UNION ALL SELECT venue, city, team2, winner FROM t20_matches
-            )
-            GROUP BY venue, city, team2
-        )
-        SELECT 
-            venue,
-            city,
-            team,
-            total_matches,
-            wins,
-            ROUND((wins * 100.0 / total_matches), 2) as win_percentage
-        FROM venue_teams
-        WHERE total_matches >= 10
-        ORDER BY win_percentage DESC
-        LIMIT 10
-        """,
-        
-        13: """
-        SELECT city, COUNT(*) as matches_hosted
-        FROM (
-            SELECT city FROM test_matches
-            UNION ALL SELECT city FROM odi_matches
-            UNION ALL SELECT city FROM t20_matches
-        )
-        WHERE city IS NOT NULL
-        GROUP BY city
-        ORDER BY matches_hosted DESC
-        LIMIT 10
-        """,
-        
-        14: """
-        SELECT 
-            CASE 
-                WHEN SUBSTR(date, 6, 2) IN ('12', '01', '02') THEN 'Winter'
-                WHEN SUBSTR(date, 6, 2) IN ('03', '04', '05') THEN 'Spring'
-                WHEN SUBSTR(date, 6, 2) IN ('06', '07', '08') THEN 'Summer'
-                WHEN SUBSTR(date, 6, 2) IN ('09', '10', '11') THEN 'Fall'
-                ELSE 'Unknown'
-            END as season,
-            COUNT(*) as matches
-        FROM (
-            SELECT date FROM test_matches
-            UNION ALL SELECT date FROM odi_matches
-            UNION ALL SELECT date FROM t20_matches
-        )
-        WHERE date IS NOT NULL
-        GROUP BY season
-        ORDER BY matches DESC
-        """,
-        
-        15: """
-        SELECT 
-            team,
-            SUBSTR(year, 1, 3) || '0s' as decade,
-            COUNT(*) as matches,
-            SUM(CASE WHEN winner = team THEN 1 ELSE 0 END) as wins,
-            ROUND(SUM(CASE WHEN winner = team THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) as win_percentage
-        FROM (
-            SELECT team1 as team, winner, SUBSTR(date, 1, 4) as year FROM test_matches
-            UNION ALL SELECT team2 as team, winner, SUBSTR(date, 1, 4) as year FROM test_matches
-            UNION ALL SELECT team1 as team, winner, SUBSTR(date, 1, 4) as year FROM odi_matches
-            UNION ALL SELECT team2 as team, winner, SUBSTR(date, 1, 4) as year FROM odi_matches
-            UNION ALL SELECT team1 as team, winner, SUBSTR(date, 1, 4) as year FROM t20_matches
-            UNION ALL SELECT team2 as team, winner, SUBSTR(date, 1, 4) as year FROM t20_matches
-        )
-        WHERE year IS NOT NULL AND year >= '1970'
-        GROUP BY team, decade
-        HAVING matches >= 20
-        ORDER BY decade, win_percentage DESC
-        """,
-        
-        16: """
-        SELECT 
-            SUBSTR(date, 1, 4) as year,
-            COUNT(*) as test_matches,
-            SUM(CASE WHEN winner = team1 THEN 1 ELSE 0 END) as team1_wins,
-            SUM(CASE WHEN winner = team2 THEN 1 ELSE 0 END) as team2_wins,
-            SUM(CASE WHEN winner IS NULL THEN 1 ELSE 0 END) as draws
-        FROM test_matches
-        WHERE date IS NOT NULL
-        GROUP BY year
-        HAVING test_matches >= 5
-        ORDER BY year
-        """,
-        
-        17: """
-        SELECT 
-            winner,
-            COUNT(*) as t20_wins,
-            ROUND(COUNT(*) * 100.0 / (
-                SELECT COUNT(*) FROM t20_matches WHERE winner IS NOT NULL
-            ), 2) as percentage_of_total_wins
-        FROM t20_matches
-        WHERE winner IS NOT NULL
-        GROUP BY winner
-        HAVING COUNT(*) >= 10
-        ORDER BY t20_wins DESC
-        LIMIT 10
-        """,
-        
-        18: """
-        SELECT 
-            winner,
-            COUNT(*) as odi_wins,
-            ROUND(COUNT(*) * 100.0 / (
-                SELECT COUNT(*) FROM odi_matches WHERE winner IS NOT NULL
-            ), 2) as percentage_of_total_wins
-        FROM odi_matches
-        WHERE winner IS NOT NULL
-        GROUP BY winner
-        HAVING COUNT(*) >= 20
-        ORDER BY odi_wins DESC
-        LIMIT 10
-        """,
-        
-        19: """
-        SELECT 
-            winner,
-            COUNT(*) as wins_without_toss,
-            ROUND(COUNT(*) * 100.0 / (
-                SELECT COUNT(*) 
-                FROM (
-                    SELECT winner FROM test_matches WHERE toss_winner != winner
-                    UNION ALL SELECT winner FROM odi_matches WHERE toss_winner != winner
-                    UNION ALL SELECT winner FROM t20_matches WHERE toss_winner != winner
-                ) t WHERE t.winner = m.winner
-            ), 2) as win_percentage_when_losing_toss
-        FROM (
-            SELECT winner FROM test_matches WHERE toss_winner != winner
-            UNION ALL SELECT winner FROM odi_matches WHERE toss_winner != winner
-            UNION ALL SELECT winner FROM t20_matches WHERE toss_winner != winner
-        ) m
+        ORDER BY venue, match_type
+    )
+    GROUP BY venue
+    HAVING COUNT(*) > 1
+    ORDER BY formats_hosted DESC, venue
+    """
+}
+
+# The same reports answered from the rollups db.py maintains, keyed by the
+# (rollup table, grouping set) each one reads. Ties are ordered by the group
+# key, the order the base statements emit their groups in.
+ROLLUP_STATEMENTS = {
+    1: (('match_rollup', 'format_toss'), """
+    SELECT match_type, SUM(matches) as matches
+    FROM match_rollup
+    WHERE grouping_set = 'format_toss'
+    GROUP BY match_type
+    ORDER BY matches DESC, match_type
+    """),
+    
+    2: (('match_rollup', 'year_month'), """
+    SELECT year, SUM(matches) as matches
+    FROM match_rollup
+    WHERE grouping_set = 'year_month' AND year IS NOT NULL
+    GROUP BY year
+    ORDER BY year
+    """),
+    
+    3: (('team_rollup', 'team'), """
+    SELECT team, matches as matches_played
+    FROM team_rollup
+    WHERE grouping_set = 'team'
+    ORDER BY matches_played DESC, team
+    LIMIT 10
+    """),
+    
+    4: (('match_rollup', 'winner'), """
+    SELECT winner, SUM(matches) as wins
+    FROM match_rollup
+    WHERE grouping_set = 'winner' AND winner IS NOT NULL
+    GROUP BY winner
+    ORDER BY wins DESC, winner
+    LIMIT 5
+    """),
+    
+    5: (('team_rollup', 'team'), """
+    SELECT team, 
+           matches as total_matches,
+           wins,
+           ROUND((wins * 100.0 / matches), 2) as win_percentage
+    FROM team_rollup
+    WHERE grouping_set = 'team' AND matches >= 20
+    ORDER BY win_percentage DESC, team
+    LIMIT 10
+    """),
+    
+    6: (('match_rollup', 'winner'), """
+    SELECT 
+        winner as team,
+        SUM(CASE WHEN match_type = 'test' THEN matches ELSE 0 END) as test_wins,
+        SUM(CASE WHEN match_type = 'odi' THEN matches ELSE 0 END) as odi_wins,
+        SUM(CASE WHEN match_type = 't20' THEN matches ELSE 0 END) as t20_wins
+    FROM match_rollup
+    WHERE grouping_set = 'winner' AND winner IS NOT NULL
+    GROUP BY winner
+    ORDER BY (test_wins + odi_wins + t20_wins) DESC, winner
+    LIMIT 10
+    """),
+    
+    7: (('match_rollup', 'winner'), """
+    WITH top_teams AS MATERIALIZED (
+        SELECT winner
+        FROM match_rollup
+        WHERE grouping_set = 'winner' AND winner IS NOT NULL
         GROUP BY winner
-        HAVING wins_without_toss >= 10
-        ORDER BY win_percentage_when_losing_toss DESC
-        LIMIT 10
-        """,
-        
-        20: """
-        SELECT venue, 
-               COUNT(DISTINCT match_type) as formats_hosted,
-               GROUP_CONCAT(DISTINCT match_type) as format_list
-        FROM (
-            SELECT venue, 'test' as match_type FROM test_matches
-            UNION SELECT venue, 'odi' FROM odi_matches
-            UNION SELECT venue, 't20' FROM t20_matches
+        ORDER BY SUM(matches) DESC, winner
+        LIMIT 5
+    )
+    SELECT 
+        team1,
+        team2,
+        COUNT(*) as total_matches,
+        SUM(CASE WHEN winner = team1 THEN 1 ELSE 0 END) as team1_wins,
+        SUM(CASE WHEN winner = team2 THEN 1 ELSE 0 END) as team2_wins,
+        SUM(CASE WHEN winner IS NULL THEN 1 ELSE 0 END) as draws_or_ties
+    FROM matches
+    WHERE team1 IN (SELECT winner FROM top_teams) AND team2 IN (SELECT winner FROM top_teams)
+    GROUP BY team1, team2
+    HAVING total_matches >= 5
+    ORDER BY total_matches DESC
+    """),
+    
+    8: (('match_rollup', 'format_toss'), """
+    SELECT match_type, toss_decision, matches as count
+    FROM match_rollup
+    WHERE grouping_set = 'format_toss' AND toss_decision IS NOT NULL
+    ORDER BY match_type, count DESC, toss_decision
+    """),
+    
+    9: (('match_rollup', 'winner'), """
+    SELECT 
+        match_type,
+        SUM(matches) as total_matches,
+        SUM(CASE WHEN toss_won = 1 THEN matches ELSE 0 END) as toss_and_win,
+        ROUND(SUM(CASE WHEN toss_won = 1 THEN matches ELSE 0 END) * 100.0 / SUM(matches), 2) as percentage
+    FROM match_rollup
+    WHERE grouping_set = 'winner' AND toss_won IS NOT NULL
+    GROUP BY match_type
+    ORDER BY percentage DESC, match_type
+    """),
+    
+    10: (('team_rollup', 'team_toss'), """
+    SELECT 
+        team as winner,
+        wins as wins_after_toss_win,
+        ROUND(wins * 100.0 / matches, 2) as win_percentage_when_toss_winner
+    FROM team_rollup
+    WHERE grouping_set = 'team_toss' AND toss_won = 1 AND wins >= 10
+    ORDER BY win_percentage_when_toss_winner DESC, team
+    LIMIT 10
+    """),
+    
+    11: (('match_rollup', 'venue'), """
+    SELECT venue, SUM(matches) as matches_hosted
+    FROM match_rollup
+    WHERE grouping_set = 'venue' AND venue IS NOT NULL
+    GROUP BY venue
+    ORDER BY matches_hosted DESC, venue
+    LIMIT 10
+    """),
+    
+    12: (('team_rollup', 'venue_team'), """
+    SELECT 
+        venue,
+        city,
+        team,
+        matches as total_matches,
+        wins,
+        ROUND((wins * 100.0 / matches), 2) as win_percentage
+    FROM team_rollup
+    WHERE grouping_set = 'venue_team' AND matches >= 10
+    ORDER BY win_percentage DESC, side, venue, city, team
+    LIMIT 10
+    """),
+    
+    13: (('match_rollup', 'city'), """
+    SELECT city, matches as matches_hosted
+    FROM match_rollup
+    WHERE grouping_set = 'city' AND city IS NOT NULL
+    ORDER BY matches_hosted DESC, city
+    LIMIT 10
+    """),
+    
+    14: (('match_rollup', 'year_month'), """
+    SELECT 
+        CASE 
+            WHEN month IN ('12', '01', '02') THEN 'Winter'
+            WHEN month IN ('03', '04', '05') THEN 'Spring'
+            WHEN month IN ('06', '07', '08') THEN 'Summer'
+            WHEN month IN ('09', '10', '11') THEN 'Fall'
+            ELSE 'Unknown'
+        END as season,
+        SUM(matches) as matches
+    FROM match_rollup
+    WHERE grouping_set = 'year_month' AND year IS NOT NULL
+    GROUP BY season
+    ORDER BY matches DESC, season
+    """),
+    
+    15: (('team_rollup', 'team_year'), """
+    SELECT 
+        team,
+        SUBSTR(year, 1, 3) || '0s' as decade,
+        SUM(matches) as matches,
+        SUM(wins) as wins,
+        ROUND(SUM(wins) * 100.0 / SUM(matches), 2) as win_percentage
+    FROM team_rollup
+    WHERE grouping_set = 'team_year' AND year IS NOT NULL AND year >= '1970'
+    GROUP BY team, decade
+    HAVING SUM(matches) >= 20
+    ORDER BY decade, win_percentage DESC, team
+    """),
+    
+    16: (('match_rollup', 'results'), """
+    SELECT 
+        year,
+        SUM(matches) as test_matches,
+        SUM(CASE WHEN winner_side = 1 THEN matches ELSE 0 END) as team1_wins,
+        SUM(CASE WHEN winner_side = 2 THEN matches ELSE 0 END) as team2_wins,
+        SUM(CASE WHEN winner_side IS NULL THEN matches ELSE 0 END) as draws
+    FROM match_rollup
+    WHERE grouping_set = 'results' AND match_type = 'test' AND year IS NOT NULL
+    GROUP BY year
+    HAVING test_matches >= 5
+    ORDER BY year
+    """),
+    
+    17: (('match_rollup', 'winner'), """
+    SELECT 
+        winner,
+        SUM(matches) as t20_wins,
+        ROUND(SUM(matches) * 100.0 / (
+            SELECT SUM(matches) FROM match_rollup
+            WHERE grouping_set = 'winner' AND match_type = 't20' AND winner IS NOT NULL
+        ), 2) as percentage_of_total_wins
+    FROM match_rollup
+    WHERE grouping_set = 'winner' AND match_type = 't20' AND winner IS NOT NULL
+    GROUP BY winner
+    HAVING SUM(matches) >= 10
+    ORDER BY t20_wins DESC, winner
+    LIMIT 10
+    """),
+    
+    18: (('match_rollup', 'winner'), """
+    SELECT 
+        winner,
+        SUM(matches) as odi_wins,
+        ROUND(SUM(matches) * 100.0 / (
+            SELECT SUM(matches) FROM match_rollup
+            WHERE grouping_set = 'winner' AND match_type = 'odi' AND winner IS NOT NULL
+        ), 2) as percentage_of_total_wins
+    FROM match_rollup
+    WHERE grouping_set = 'winner' AND match_type = 'odi' AND winner IS NOT NULL
+    GROUP BY winner
+    HAVING SUM(matches) >= 20
+    ORDER BY odi_wins DESC, winner
+    LIMIT 10
+    """),
+    
+    19: (('team_rollup', 'team_toss'), """
+    SELECT 
+        team as winner,
+        wins as wins_without_toss,
+        ROUND(wins * 100.0 / matches, 2) as win_percentage_when_losing_toss
+    FROM team_rollup
+    WHERE grouping_set = 'team_toss' AND toss_won = 0 AND wins >= 10
+    ORDER BY win_percentage_when_losing_toss DESC, team
+    LIMIT 10
+    """),
+    
+    20: (('match_rollup', 'venue'), """
+    SELECT venue, 
+           COUNT(*) as formats_hosted,
+           GROUP_CONCAT(match_type) as format_list
+    FROM (
+        SELECT venue, match_type
+        FROM match_rollup
+        WHERE grouping_set = 'venue' AND venue IS NOT NULL
+        ORDER BY venue, match_type
+    )
+    GROUP BY venue
+    HAVING COUNT(*) > 1
+    ORDER BY formats_hosted DESC, venue
+    """),
+}
+
+def rollup_sets(conn):
+    """Return the (rollup table, grouping set) pairs present in the database"""
+    available = set()
+    for table in {rollup for rollup, _ in (source for source, _ in ROLLUP_STATEMENTS.values())}:
+        try:
+            rows = conn.execute(f"SELECT DISTINCT grouping_set FROM {table}").fetchall()
+        except sqlite3.Error:
+            continue  # database built before the rollups existed
+        available.update((table, grouping_set) for grouping_set, in rows)
+    return available
+
+def plan_query(num, available):
+    """Pick the SQL for a report: its rollup form if the grouping set it reads is present"""
+    if num in ROLLUP_STATEMENTS:
+        source, sql = ROLLUP_STATEMENTS[num]
+        if source in available:
+            return sql
+    return SQL_STATEMENTS[num]
+
+def database_fingerprint(conn):
+    """Identify the loaded data by the database id and load generation db.py records
+
+    Returns None for databases built before db.py kept them, which are
+    then never cached.
+    """
+    try:
+        meta = dict(conn.execute("SELECT key, value FROM db_meta").fetchall())
+    except sqlite3.Error:
+        return None
+    if 'database_id' not in meta or 'load_generation' not in meta:
+        return None
+    return f"{meta['database_id']}:{meta['load_generation']}"
+
+def open_cache(fingerprint, cache_file=CACHE_FILE):
+    """Open the result cache, dropping every entry cached for another fingerprint
+
+    Changes are committed when the caller commits, once per run.
+    """
+    cache = sqlite3.connect(cache_file)
+    cache.execute("PRAGMA journal_mode = WAL")
+    cache.execute("PRAGMA synchronous = NORMAL")
+    cache.execute("""
+        CREATE TABLE IF NOT EXISTS results (
+            key TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            result TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            last_used REAL NOT NULL
         )
-        WHERE venue IS NOT NULL
-        GROUP BY venue
-        HAVING COUNT(DISTINCT match_type) > 1
-        ORDER BY formats_hosted DESC, venue
-        """
-    }
-
-    # Execute and display queries
-    for num, title in queries.items():
+    """)
+    cache.execute("DELETE FROM results WHERE fingerprint != ?", (fingerprint,))
+    return cache
+
+def cache_key(sql):
+    return hashlib.sha256(sql.encode('utf-8')).hexdigest()
+
+def cache_get(cache, fingerprint, sql):
+    """Return the cached (columns, rows) of sql for this fingerprint, or None"""
+    key = cache_key(sql)
+    row = cache.execute("SELECT result FROM results WHERE key = ? AND fingerprint = ?",
+                        (key, fingerprint)).fetchone()
+    if row is None:
+        return None
+    cache.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+    result = json.loads(row[0])
+    return result['columns'], result['rows']
+
+def cache_put(cache, fingerprint, sql, columns, rows, max_bytes=CACHE_MAX_BYTES):
+    """Store a result, then evict least recently used entries until the cache fits max_bytes"""
+    result = json.dumps({'columns': columns, 'rows': rows})
+    cache.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                  (cache_key(sql), fingerprint, result, len(result), time.time()))
+    total = cache.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+    if total > max_bytes:
+        for key, size in cache.execute("SELECT key, size FROM results ORDER BY last_used").fetchall():
+            cache.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+            if total <= max_bytes:
+                break
+
+def fetch_result(conn, sql):
+    """Run sql and return (columns, rows)"""
+    cursor = conn.execute(sql)
+    return [description[0] for description in cursor.description], cursor.fetchall()
+
+def result_frame(columns, rows):
+    import pandas as pd  # only for callers that want a DataFrame; reports print straight from the rows
+
+    return pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+
+def execute_query(conn, sql, cache=None, fingerprint=None):
+    """Run sql as a DataFrame, serving and storing the result through the cache if given
+
+    Returns (DataFrame, True if it came from the cache).
+    """
+    cached = cache_get(cache, fingerprint, sql) if cache is not None else None
+    if cached is not None:
+        return result_frame(*cached), True
+    columns, rows = fetch_result(conn, sql)
+    if cache is not None:
+        cache_put(cache, fingerprint, sql, columns, rows)
+    return result_frame(columns, rows), False
+
+def open_read_pool(size, db_file=DB_FILE, cached_statements=128):
+    """Open size read-only connections (mode=ro URIs) to db_file in a queue
+
+    Each connection keeps up to cached_statements prepared statements.
+    """
+    pool = queue.Queue()
+    for _ in range(size):
+        pool.put(sqlite3.connect(f"file:{db_file}?mode=ro", uri=True, check_same_thread=False,
+                                 cached_statements=cached_statements))
+    return pool
+
+def close_read_pool(pool):
+    while not pool.empty():
+        pool.get().close()
+
+def timed_fetch(pool, sql):
+    """Fetch sql on a connection borrowed from pool; return (result or exception, seconds)"""
+    conn = pool.get()
+    start = time.perf_counter()
+    try:
+        result = fetch_result(conn, sql)
+    except Exception as e:
+        result = e
+    finally:
+        pool.put(conn)
+    return result, time.perf_counter() - start
+
+def fetch_concurrently(statements, workers, db_file=DB_FILE):
+    """Fetch {num: sql} in parallel over a read-only pool of workers connections
+
+    SQLite releases the GIL while a statement runs, so the threads execute
+    queries at the same time. Returns {num: (result or exception, seconds)}.
+    """
+    pool = open_read_pool(workers, db_file)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {num: executor.submit(timed_fetch, pool, sql) for num, sql in statements.items()}
+            return {num: future.result() for num, future in futures.items()}
+    finally:
+        close_read_pool(pool)
+
+def compute_with_arrays(conn):
+    """Compute every report with array_engine from the matches loaded once
+
+    Returns {num: ((columns, rows) or exception, seconds)} like fetch_concurrently.
+    """
+    import array_engine
+
+    matches = array_engine.MatchArrays.load(conn)
+    computed = {}
+    for num, report in array_engine.ARRAY_REPORTS.items():
+        start = time.perf_counter()
+        try:
+            result = report(matches)
+        except Exception as e:
+            result = e
+        computed[num] = (result, time.perf_counter() - start)
+    return computed
+
+def print_timings(timings, wall_seconds):
+    """Print how long each report took and where its result came from"""
+    rows = [[num, QUERIES[num], source, round(seconds * 1000, 2)]
+            for num, (source, seconds) in sorted(timings.items())]
+    print("\n=== Query timings ===")
+    print(tabulate(rows, headers=["query", "title", "source", "ms"], tablefmt='psql'))
+    print(f"Sum of query times: {sum(seconds for _, seconds in timings.values()) * 1000:.2f} ms, "
+          f"wall time: {wall_seconds * 1000:.2f} ms")
+
+def run_queries(conn, use_cache=True, cache_file=CACHE_FILE, workers=None, db_file=DB_FILE, show_timings=False,
+                backend='sqlite'):
+    """Execute and display 20 analytical queries using only available columns
+
+    Results are cached in cache_file under the database fingerprint, so a
+    repeat run against an unchanged database is served from the cache and
+    any reload by db.py invalidates it. With workers, the queries not
+    served from the cache run concurrently over that many read-only
+    connections to db_file; output stays in report order either way.
+    Per-query timings are printed in concurrent mode or with show_timings.
+    backend='numpy' computes the same results in process with
+    array_engine instead, without the cache.
+    """
+    start = time.perf_counter()
+    available = rollup_sets(conn)
+    fingerprint = database_fingerprint(conn) if use_cache and backend == 'sqlite' else None
+    cache = open_cache(fingerprint, cache_file) if fingerprint else None
+    statements = {num: plan_query(num, available) for num in QUERIES}
+
+    # Serve what the cache has, then fetch the rest
+    results, timings = {}, {}
+    for num, sql in statements.items():
+        if cache is not None:
+            lookup_start = time.perf_counter()
+            cached = cache_get(cache, fingerprint, sql)
+            if cached is not None:
+                results[num] = cached
+                timings[num] = ("cache", time.perf_counter() - lookup_start)
+    pending = {num: sql for num, sql in statements.items() if num not in results}
+    if backend == 'numpy':
+        fetched = compute_with_arrays(conn)
+    elif workers:
+        fetched = fetch_concurrently(pending, workers, db_file)
+    else:
+        fetched = {}
+        for num, sql in pending.items():
+            fetch_start = time.perf_counter()
+            try:
+                result = fetch_result(conn, sql)
+            except Exception as e:
+                result = e
+            fetched[num] = (result, time.perf_counter() - fetch_start)
+    for num, (result, seconds) in fetched.items():
+        results[num] = result
+        timings[num] = ("sql" if backend == 'sqlite' else backend, seconds)
+        if cache is not None and not isinstance(result, Exception):
+            cache_put(cache, fingerprint, statements[num], *result)
+
+    # Display in report order
+    for num, title in QUERIES.items():
         print(f"\n=== Query {num}: {title} ===")
         try:
-            df = pd.read_sql_query(sql_statements[num], conn)
-            print(tabulate(df, headers='keys', tablefmt='psql', showindex=False))
+            if isinstance(results[num], Exception):
+                raise results[num]
+            columns, rows = results[num]
+            print(tabulate(rows, headers=columns, tablefmt='psql'))
+            instrumentation.count(queries=1, rows=len(rows))
         except Exception as e:
+            instrumentation.error(type(e).__name__)
             print(f"Error executing query {num}: {e}")
 
-def main():
+    if cache is not None:
+        cache.commit()
+        cache.close()
+        hits = sum(source == "cache" for source, _ in timings.values())
+        instrumentation.count(cache_hits=hits)
+        print(f"\n{hits} of {len(QUERIES)} reports served from the cache")
+    if workers or show_timings:
+        print_timings(timings, time.perf_counter() - start)
+
+def add_arguments(parser):
+    parser.add_argument("--no-cache", action="store_true", help="run every query instead of using the result cache")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="run the queries concurrently over this many read-only connections")
+    parser.add_argument("--timings", action="store_true", help="print per-query timings")
+    parser.add_argument("--backend", choices=BACKENDS, default='sqlite',
+                        help="run the reports as SQL or compute them in process with NumPy")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the analytical queries against the cricket database")
+    add_arguments(parser)
+    return parser.parse_args()
+
+def main(args=None):
+    args = args or parse_args()
     conn = create_connection()
     if conn:
-        run_queries(conn)
+        run_queries(conn, use_cache=not args.no_cache, workers=args.workers, show_timings=args.timings,
+                    backend=args.backend)
         conn.close()
         print("\nAll 20 queries executed successfully")
 
@@ -1,17 +1,25 @@
 import os
-import requests
+import re
+import datetime
+import argparse
 import zipfile
-import io
 import json
 import yaml
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import instrumentation
+
+try:
+    # libyaml's C loader is many times faster than the pure-Python one
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
 
 # Base download folder
 DOWNLOAD_DIR = "cricsheet_data"
-os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+
+# Downloaded archives are kept here so process_data can read them directly
+ARCHIVE_DIR = os.path.join(DOWNLOAD_DIR, "archives")
 
 FORMAT_MAP = {
     "tests.zip": "tests",
@@ -19,10 +27,22 @@ FORMAT_MAP = {
     "t20s.zip": "t20s"
 }
 
-def selenium_download():
+# Where direct downloads are fetched from (point at a local server for testing)
+BASE_URL = "https://cricsheet.org/downloads/"
+
+# Bytes written to disk per chunk while streaming an archive
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
+def selenium_download(extract=True, convert=False):
     """Download all formats (Tests, ODIs, T20s) using Selenium"""
     print("Attempting Selenium download...")
     try:
+        # Imported here so the archive helpers can be used without Selenium installed
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.chrome.options import Options
+
         chrome_options = Options()
         chrome_options.add_argument("--start-maximized")
         service = Service(r'C:\Users\rahen\Downloads\chromedriver-win64\chromedriver-win64\chromedriver.exe')  # UPDATE PATH
@@ -31,67 +51,254 @@ def selenium_download():
         driver.get("https://cricsheet.org/downloads/")
         print("Opened Cricsheet downloads page")
 
-        for zip_name, folder_name in FORMAT_MAP.items():
+        urls = {}
+        for zip_name in FORMAT_MAP:
             try:
                 link = driver.find_element(By.XPATH, f"//a[contains(@href, '{zip_name}')]")
-                zip_url = link.get_attribute("href")
-                print(f"Found ZIP URL for {zip_name}: {zip_url}")
-                download_zip(zip_url, folder_name)
+                urls[zip_name] = link.get_attribute("href")
+                print(f"Found ZIP URL for {zip_name}: {urls[zip_name]}")
             except Exception as e:
                 print(f"Could not find {zip_name} link: {e}")
+        download_all(urls, extract, convert)
 
     except Exception as e:
+        instrumentation.error(type(e).__name__)
         print(f"Selenium failed: {str(e)}")
         print("Falling back to direct download...")
-        direct_download()
+        direct_download(extract, convert)
     finally:
         if 'driver' in locals():
             driver.quit()
 
-def direct_download():
+def direct_download(extract=True, convert=False, base_url=BASE_URL):
     """Fallback: Direct download"""
     print("Starting direct download...")
-    for zip_name, folder_name in FORMAT_MAP.items():
-        url = f"https://cricsheet.org/downloads/{zip_name}"
-        download_zip(url, folder_name)
+    urls = {zip_name: base_url.rstrip("/") + "/" + zip_name for zip_name in FORMAT_MAP}
+    download_all(urls, extract, convert)
+
+def create_session(pool_size=len(FORMAT_MAP)):
+    """Create a requests session whose connection pool can serve every format at once"""
+    # Imported here so conversion and process_data do not load the HTTP stack
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=3)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def download_all(urls, extract=True, convert=False):
+    """Download the given {zip_name: url} archives concurrently over one pooled session"""
+    with create_session() as session, ThreadPoolExecutor(max_workers=max(len(urls), 1)) as executor:
+        futures = [executor.submit(download_zip, url, FORMAT_MAP[zip_name], extract, convert, session)
+                   for zip_name, url in urls.items()]
+        for future in futures:
+            future.result()
+
+def read_validators(path):
+    """Return the ETag/Last-Modified headers saved next to a downloaded file"""
+    try:
+        with open(path + ".meta", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_validators(path, response):
+    """Save the ETag/Last-Modified headers of a response next to the file it produced"""
+    validators = {header: response.headers[header] for header in ("ETag", "Last-Modified")
+                  if header in response.headers}
+    with open(path + ".meta", "w", encoding="utf-8") as f:
+        json.dump(validators, f)
+
+def discard_partial(part_path):
+    """Delete a partial download and the validators saved with it, if present"""
+    for path in (part_path, part_path + ".meta"):
+        if os.path.exists(path):
+            os.remove(path)
+
+def content_range_start(response):
+    """Return the first byte position of a response's Content-Range, or None"""
+    match = re.match(r"bytes (\d+)-", response.headers.get("Content-Range", ""))
+    return int(match.group(1)) if match else None
+
+def fetch_archive(session, url, archive_path):
+    """Stream url to archive_path and return True if a new archive was written
+
+    The body is written to <archive_path>.part in chunks. An interrupted
+    download is resumed with a Range request (guarded by If-Range so a
+    changed archive restarts from scratch), and when a complete archive is
+    already present the request carries If-None-Match/If-Modified-Since so
+    an unchanged archive is answered with 304 and not downloaded again.
+    A partial file the server will not resume exactly where it ends is
+    discarded and the archive downloaded from the start.
+    """
+    part_path = archive_path + ".part"
+    headers = {}
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if offset:
+        validators = read_validators(part_path)
+        if_range = validators.get("ETag") or validators.get("Last-Modified")
+        if if_range:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = if_range
+    elif os.path.exists(archive_path):
+        validators = read_validators(archive_path)
+        if "ETag" in validators:
+            headers["If-None-Match"] = validators["ETag"]
+        if "Last-Modified" in validators:
+            headers["If-Modified-Since"] = validators["Last-Modified"]
+
+    with session.get(url, headers=headers, stream=True, timeout=60) as response:
+        if response.status_code == 304:
+            return False
+        resumed = bool(offset) and response.status_code == 206 and content_range_start(response) == offset
+        if response.status_code in (206, 416) and not resumed:
+            if not offset:
+                raise IOError(f"unexpected {response.status_code} response to a full download of {url}")
+            # The partial file no longer lines up with the remote archive
+            discard_partial(part_path)
+            return fetch_archive(session, url, archive_path)
+        response.raise_for_status()
+        if resumed:
+            mode = "ab"
+            print(f"Resuming {url} from byte {offset}")
+        else:
+            mode = "wb"
+            write_validators(part_path, response)
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                instrumentation.count(bytes_read=len(chunk))
 
-def download_zip(url, folder_name):
-    """Download and extract a ZIP file to the format's folder"""
+    os.replace(part_path + ".meta", archive_path + ".meta")
+    os.replace(part_path, archive_path)
+    return True
+
+def download_zip(url, folder_name, extract=True, convert=False, session=None):
+    """Download a ZIP file into ARCHIVE_DIR and optionally extract it to the format's folder
+
+    Unchanged archives are not downloaded or extracted again (see
+    fetch_archive). process_data reads YAML matches natively, so extracted
+    YAML is only converted to JSON when convert=True. Without a session
+    one is created for this download and closed after it.
+    """
     folder_path = os.path.join(DOWNLOAD_DIR, folder_name)
-    os.makedirs(folder_path, exist_ok=True)
+    archive_path = os.path.join(ARCHIVE_DIR, os.path.basename(url))
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
 
+    own_session = None
     try:
+        if session is None:
+            session = own_session = create_session(1)
         print(f"Downloading {url}...")
-        response = requests.get(url)
-        response.raise_for_status()
-        with zipfile.ZipFile(io.BytesIO(response.content)) as zip_ref:
-            zip_ref.extractall(folder_path)
-        print(f"✓ Extracted {url} to {folder_path}")
-        convert_yaml_to_json(folder_path)
+        if not fetch_archive(session, url, archive_path):
+            instrumentation.count(unchanged=1)
+            print(f"✓ {archive_path} is up to date")
+            if os.path.isdir(folder_path) or not extract:
+                return
+        else:
+            instrumentation.count(files=1)
+            print(f"✓ Saved {url} to {archive_path}")
+        if extract:
+            os.makedirs(folder_path, exist_ok=True)
+            with zipfile.ZipFile(archive_path) as zip_ref:
+                zip_ref.extractall(folder_path)
+            print(f"✓ Extracted {url} to {folder_path}")
+            if convert:
+                convert_yaml_to_json(folder_path)
     except Exception as e:
+        instrumentation.error(type(e).__name__)
         print(f"✗ Failed {url}: {str(e)}")
+    finally:
+        if own_session is not None:
+            own_session.close()
+
+def json_default(value):
+    """Serialize the date objects PyYAML creates for unquoted YAML dates"""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def convert_yaml_file(yaml_path):
+    """Convert one .yaml file to compact .json, delete the YAML and return "<ExceptionType>: <message>" or None"""
+    json_path = os.path.splitext(yaml_path)[0] + ".json"
+    try:
+        with open(yaml_path, "r", encoding="utf-8") as f:
+            yaml_data = yaml.load(f, Loader=YamlLoader)
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(yaml_data, f, separators=(",", ":"), default=json_default)
+        os.remove(yaml_path)  # Delete YAML after conversion
+        return None
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+def convert_yaml_to_json(directory, workers=None):
+    """Convert all .yaml files in directory to .json and delete original YAML
 
-def convert_yaml_to_json(directory):
-    """Convert all .yaml files in directory to .json and delete original YAML"""
+    Files are converted on a pool of `workers` processes (all cores by default).
+    """
+    yaml_paths = []
     for root, _, files in os.walk(directory):
         for file in files:
             if file.endswith(".yaml") or file.endswith(".yml"):
-                yaml_path = os.path.join(root, file)
-                json_path = os.path.splitext(yaml_path)[0] + ".json"
-                try:
-                    with open(yaml_path, "r", encoding="utf-8") as f:
-                        yaml_data = yaml.safe_load(f)
-                    with open(json_path, "w", encoding="utf-8") as f:
-                        json.dump(yaml_data, f, indent=4)
-                    os.remove(yaml_path)  # Delete YAML after conversion
-                    print(f"Converted and removed {file}")
-                except Exception as e:
-                    print(f"Failed to convert {file}: {e}")
+                yaml_paths.append(os.path.join(root, file))
+    if not yaml_paths:
+        return
+    instrumentation.count(bytes_read=sum(os.path.getsize(path) for path in yaml_paths))
 
-if __name__ == "__main__":
-    selenium_download()
-    print("\nFinal JSON files by format:")
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for yaml_path, error in zip(yaml_paths, executor.map(convert_yaml_file, yaml_paths, chunksize=64)):
+            if error:
+                failed += 1
+                instrumentation.error(instrumentation.error_cause(error))
+                print(f"Failed to convert {os.path.basename(yaml_path)}: {error}")
+    instrumentation.count(files=len(yaml_paths) - failed)
+    print(f"Converted and removed {len(yaml_paths) - failed} YAML files in {directory}")
+
+def add_arguments(parser):
+    parser.add_argument("--archive-only", action="store_true",
+                        help="keep the ZIPs for `process_data.py --archives` without extracting them")
+    parser.add_argument("--convert-json", action="store_true",
+                        help="rewrite extracted YAML matches as JSON")
+    parser.add_argument("--base-url", default=None,
+                        help=f"download directly from this URL instead of {BASE_URL} via Selenium")
+
+def add_convert_arguments(parser):
+    parser.add_argument("directories", nargs="*",
+                        default=[os.path.join(DOWNLOAD_DIR, fmt) for fmt in FORMAT_MAP.values()],
+                        help="folders of extracted YAML matches (default: every format folder)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes to convert with (default: all cores)")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Download Cricsheet match archives")
+    add_arguments(parser)
+    return parser.parse_args()
+
+def print_match_counts():
+    print("\nFinal match files by format:")
     for fmt in FORMAT_MAP.values():
         fmt_path = os.path.join(DOWNLOAD_DIR, fmt)
-        json_files = [f for f in os.listdir(fmt_path) if f.endswith(".json")]
-        print(f"{fmt}: {len(json_files)} JSON files")
+        match_files = [f for f in os.listdir(fmt_path) if f.endswith((".json", ".yaml", ".yml"))]
+        print(f"{fmt}: {len(match_files)} match files")
+
+def main(args=None):
+    args = args or parse_args()
+    extract = not args.archive_only
+    if args.base_url:
+        direct_download(extract, args.convert_json, args.base_url)
+    else:
+        selenium_download(extract, args.convert_json)
+    if extract:
+        print_match_counts()
+
+def convert_main(args):
+    """Convert already extracted YAML matches without downloading anything"""
+    for directory in args.directories:
+        if os.path.isdir(directory):
+            convert_yaml_to_json(directory, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import re
+import json
+import time
+import argparse
+import threading
+import functools
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import queries
+from db import MATCH_FORMATS
+
+# Results kept in the in-process cache, least recently used evicted first
+SERVICE_CACHE_ENTRIES = 1024
+
+# Conditions a report is restricted by for each filter that is supplied,
+# on matches and on the per-team rows of team_matches. Years are compared
+# as date prefixes so year_to 2015 ends before '2016'.
+MATCH_FILTERS = {
+    "format": "match_type = :format",
+    "date_from": "date >= :date_from",
+    "date_to": "date < :date_to",
+    "team": "(team1 = :team OR team2 = :team)",
+}
+TEAM_FILTERS = dict(MATCH_FILTERS, team="team = :team")
+
+# Thresholds the queries.py reports hard-code in HAVING, overridable with min_matches
+DEFAULT_MIN_MATCHES = {5: 20, 7: 5, 10: 10, 12: 10, 15: 20, 16: 5, 17: 10, 18: 20, 19: 10}
+
+# Statements each pooled connection keeps prepared: every report under
+# any combination of filters, plus its static queries.py forms
+STATEMENT_CACHE_SIZE = len(queries.QUERIES) * (2 ** len(MATCH_FILTERS) + 2)
+
+@functools.lru_cache(maxsize=None)
+def report_statement(num, filters):
+    """The queries.py statement of report num restricted by the named filters
+
+    Each table the report reads is shadowed by a CTE of the same name that
+    holds only the rows the filters keep. The CTEs are NOT MATERIALIZED, so
+    SQLite folds their conditions into the report's own WHERE and searches
+    the indexes with them; only the filters actually supplied appear, since
+    an `:p IS NULL OR` form would rule the indexes out. The hard-coded
+    threshold becomes :min_matches.
+    """
+    sql = queries.SQL_STATEMENTS[num]
+    if num in DEFAULT_MIN_MATCHES:
+        threshold = f">= {DEFAULT_MIN_MATCHES[num]}"
+        assert sql.count(threshold) == 1, f"report {num} does not compare with {threshold} once"
+        sql = sql.replace(threshold, ">= :min_matches")
+    tables = [f"{table} AS NOT MATERIALIZED (SELECT * FROM main.{table} WHERE "
+              f"{' AND '.join(conditions[name] for name in filters)})"
+              for table, conditions in (("matches", MATCH_FILTERS), ("team_matches", TEAM_FILTERS))
+              if filters and re.search(rf"\bFROM {table}\b", sql)]
+    if not tables:
+        return sql
+    sql = sql.strip()
+    if sql.startswith("WITH "):
+        return f"WITH {', '.join(tables)},\n    {sql[len('WITH '):]}"
+    return f"WITH {', '.join(tables)}\n    {sql}"
+
+class BadRequest(ValueError):
+    """A report parameter that cannot be used"""
+
+def parse_int(values, name):
+    if not values:
+        return None
+    try:
+        return int(values[0])
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer, got {values[0]!r}")
+
+def report_params(num, query):
+    """Turn the query string of a report request into its statement parameters
+
+    Accepts format, year_from, year_to, team and min_matches. Returns the
+    named parameters, with None for the filters not supplied, plus whether
+    they are all defaults, in which case the report can be served by the
+    static queries.py statement.
+    """
+    unknown = set(query) - {"format", "year_from", "year_to", "team", "min_matches"}
+    if unknown:
+        raise BadRequest(f"unknown parameters: {', '.join(sorted(unknown))}")
+    match_format = query.get("format", [None])[0]
+    if match_format is not None:
+        match_format = match_format.lower()
+        if match_format not in MATCH_FORMATS:
+            raise BadRequest(f"format must be one of {', '.join(MATCH_FORMATS)}")
+    year_from = parse_int(query.get("year_from"), "year_from")
+    year_to = parse_int(query.get("year_to"), "year_to")
+    min_matches = parse_int(query.get("min_matches"), "min_matches")
+    if min_matches is not None and num not in DEFAULT_MIN_MATCHES:
+        raise BadRequest(f"report {num} has no min_matches threshold")
+    params = {
+        "format": match_format,
+        "date_from": f"{year_from:04d}" if year_from is not None else None,
+        "date_to": f"{year_to + 1:04d}" if year_to is not None else None,
+        "team": query.get("team", [None])[0],
+        "min_matches": min_matches if min_matches is not None else DEFAULT_MIN_MATCHES.get(num),
+    }
+    defaults = (match_format is None and year_from is None and year_to is None and params["team"] is None
+                and params["min_matches"] == DEFAULT_MIN_MATCHES.get(num))
+    return params, defaults
+
+class ReportService:
+    """Serves the queries.py reports as JSON from a pool of read-only connections
+
+    Results are cached in process, keyed on the report and its parameters,
+    and the whole cache is dropped when queries.database_fingerprint
+    changes, i.e. after db.py loads new data.
+    """
+
+    def __init__(self, db_file=queries.DB_FILE, pool_size=4, cache_entries=SERVICE_CACHE_ENTRIES):
+        self.pool = queries.open_read_pool(pool_size, db_file, cached_statements=STATEMENT_CACHE_SIZE)
+        self.cache_entries = cache_entries
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.fingerprint = None
+        self.available = set()
+
+    def close(self):
+        queries.close_read_pool(self.pool)
+
+    def check_fingerprint(self, conn):
+        """Drop the cache and re-plan the rollup statements if the database changed"""
+        fingerprint = queries.database_fingerprint(conn)
+        with self.lock:
+            if fingerprint != self.fingerprint or fingerprint is None:
+                self.cache.clear()
+                self.available = queries.rollup_sets(conn)
+                self.fingerprint = fingerprint
+
+    def report(self, num, query):
+        """Return (JSON body, served from the cache) for report num"""
+        params, defaults = report_params(num, query)
+        key = (num, tuple(sorted(params.items())))
+        conn = self.pool.get()
+        try:
+            self.check_fingerprint(conn)
+            with self.lock:
+                body = self.cache.get(key)
+                if body is not None:
+                    self.cache.move_to_end(key)
+                    return body, True
+            if defaults:
+                cursor = conn.execute(queries.plan_query(num, self.available))
+            else:
+                filters = tuple(name for name in MATCH_FILTERS if params[name] is not None)
+                cursor = conn.execute(report_statement(num, filters), params)
+            columns = [description[0] for description in cursor.description]
+            rows = cursor.fetchall()
+        finally:
+            self.pool.put(conn)
+
+        body = json.dumps({
+            "report": num,
+            "title": queries.QUERIES[num],
+            "params": {name: values[0] for name, values in query.items()},
+            "columns": columns,
+            "rows": rows,
+        }).encode('utf-8')
+        with self.lock:
+            self.cache[key] = body
+            while len(self.cache) > self.cache_entries:
+                self.cache.popitem(last=False)
+        return body, False
+
+    def index(self):
+        return json.dumps({
+            "reports": [{"report": num, "title": title, "path": f"/reports/{num}"}
+                        for num, title in queries.QUERIES.items()],
+            "params": ["format", "year_from", "year_to", "team", "min_matches"],
+        }).encode('utf-8')
+
+class ReportHandler(BaseHTTPRequestHandler):
+    """GET /reports lists the reports, GET /reports/<n>?format=&year_from=&... runs one"""
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = url.path.strip('/').split('/')
+        service = self.server.service
+        try:
+            if parts == ['reports']:
+                self.send_body(200, service.index())
+            elif len(parts) == 2 and parts[0] == 'reports' and parts[1].isdigit() \
+                    and int(parts[1]) in queries.QUERIES:
+                start = time.perf_counter()
+                body, cached = service.report(int(parts[1]), parse_qs(url.query))
+                self.send_body(200, body, {
+                    "X-Cache": "hit" if cached else "miss",
+                    "X-Elapsed-Ms": f"{(time.perf_counter() - start) * 1000:.2f}",
+                })
+            else:
+                self.send_error_body(404, f"no such report: {url.path}")
+        except BadRequest as e:
+            self.send_error_body(400, str(e))
+        except Exception as e:
+            self.send_error_body(500, f"{type(e).__name__}: {e}")
+
+    def send_body(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_body(self, status, message):
+        self.send_body(status, json.dumps({"error": message}).encode('utf-8'))
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+def serve(host="127.0.0.1", port=8000, db_file=queries.DB_FILE, pool_size=4, verbose=False):
+    """Run the report service until interrupted"""
+    server = ThreadingHTTPServer((host, port), ReportHandler)
+    server.daemon_threads = True
+    server.service = ReportService(db_file, pool_size)
+    server.verbose = verbose
+    print(f"Serving {len(queries.QUERIES)} reports from {db_file} on http://{host}:{port}/reports")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve the analytical reports as JSON over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--db", default=queries.DB_FILE)
+    parser.add_argument("--pool", type=int, default=4, help="read-only database connections")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    serve(args.host, args.port, args.db, args.pool, args.verbose)
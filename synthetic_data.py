@@ -0,0 +1,378 @@
+import os
+import json
+import math
+import bisect
+import random
+import datetime
+import argparse
+from itertools import accumulate
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+from process_data import DATA_DIR
+
+try:
+    from yaml import CSafeDumper as YamlDumper
+except ImportError:
+    from yaml import SafeDumper as YamlDumper
+
+# Month ranges of the home seasons
+SUBCONTINENT_SEASON = [10, 11, 12, 1, 2, 3]
+SOUTHERN_SEASON = [10, 11, 12, 1, 2, 3]
+NORTHERN_SEASON = [5, 6, 7, 8, 9]
+CARIBBEAN_SEASON = [2, 3, 4, 5, 6, 7]
+
+# team: (strength, home venues as (venue, city), home season months, plays Tests)
+TEAMS = {
+    "India": (1.0, [("Wankhede Stadium", "Mumbai"), ("Eden Gardens", "Kolkata"),
+                    ("M Chinnaswamy Stadium", "Bengaluru"), ("MA Chidambaram Stadium, Chepauk", "Chennai"),
+                    ("Arun Jaitley Stadium", "Delhi")], SUBCONTINENT_SEASON, True),
+    "Australia": (1.0, [("Melbourne Cricket Ground", "Melbourne"), ("Sydney Cricket Ground", "Sydney"),
+                        ("Adelaide Oval", "Adelaide"), ("Brisbane Cricket Ground, Woolloongabba", "Brisbane"),
+                        ("Perth Stadium", "Perth")], SOUTHERN_SEASON, True),
+    "England": (0.9, [("Lord's", "London"), ("Kennington Oval", "London"), ("Old Trafford", "Manchester"),
+                      ("Edgbaston", "Birmingham"), ("Headingley", "Leeds")], NORTHERN_SEASON, True),
+    "South Africa": (0.85, [("Newlands", "Cape Town"), ("New Wanderers Stadium", "Johannesburg"),
+                            ("SuperSport Park", "Centurion"), ("Kingsmead", "Durban")], SOUTHERN_SEASON, True),
+    "New Zealand": (0.8, [("Eden Park", "Auckland"), ("Basin Reserve", "Wellington"),
+                          ("Hagley Oval", "Christchurch"), ("Seddon Park", "Hamilton")], SOUTHERN_SEASON, True),
+    "Pakistan": (0.8, [("Gaddafi Stadium", "Lahore"), ("National Stadium", "Karachi"),
+                       ("Rawalpindi Cricket Stadium", "Rawalpindi")], SUBCONTINENT_SEASON, True),
+    "Sri Lanka": (0.75, [("R Premadasa Stadium", "Colombo"), ("Galle International Stadium", "Galle"),
+                         ("Pallekele International Cricket Stadium", "Pallekele")], SUBCONTINENT_SEASON, True),
+    "West Indies": (0.7, [("Kensington Oval", "Bridgetown"), ("Queen's Park Oval", "Port of Spain"),
+                          ("Sabina Park", "Kingston")], CARIBBEAN_SEASON, True),
+    "Bangladesh": (0.6, [("Shere Bangla National Stadium", "Mirpur"),
+                         ("Zahur Ahmed Chowdhury Stadium", "Chattogram")], SUBCONTINENT_SEASON, True),
+    "Afghanistan": (0.55, [("Sharjah Cricket Stadium", "Sharjah")], SUBCONTINENT_SEASON, True),
+    "Zimbabwe": (0.5, [("Harare Sports Club", "Harare"), ("Queens Sports Club", "Bulawayo")],
+                 SOUTHERN_SEASON, True),
+    "Ireland": (0.45, [("The Village, Malahide", "Dublin"), ("Civil Service Cricket Club, Stormont", "Belfast")],
+                NORTHERN_SEASON, True),
+    "Netherlands": (0.35, [("VRA Ground", "Amstelveen")], NORTHERN_SEASON, False),
+    "Scotland": (0.35, [("The Grange Club", "Edinburgh")], NORTHERN_SEASON, False),
+    "United Arab Emirates": (0.3, [("Dubai International Cricket Stadium", "Dubai")], SUBCONTINENT_SEASON, False),
+    "Nepal": (0.3, [("Tribhuvan University International Cricket Ground", "Kirtipur")], SUBCONTINENT_SEASON, False),
+}
+
+# folder: (match_type, share of matches, first year, overs per innings, chance of electing to bat)
+FORMATS = {
+    "tests": ("Test", 0.12, 1970, None, 0.65),
+    "odis": ("ODI", 0.38, 1971, 50, 0.45),
+    "t20s": ("T20", 0.50, 2005, 20, 0.35),
+}
+
+LAST_YEAR = 2024
+
+# Share of matches played at a neutral venue and without a city recorded
+NEUTRAL_SHARE = 0.08
+MISSING_CITY_SHARE = 0.04
+
+# Per-format chance of a wicket and runs distribution per legal ball
+WICKET_CHANCE = {"Test": 0.018, "ODI": 0.022, "T20": 0.05}
+RUNS_WEIGHTS = {
+    "Test": [52, 28, 7, 1, 10, 0, 2],
+    "ODI": [42, 34, 8, 1, 11, 0, 4],
+    "T20": [34, 34, 8, 1, 14, 0, 9],
+}
+EXTRAS_CHANCE = {"wides": 0.025, "noballs": 0.006, "legbyes": 0.015, "byes": 0.004}
+DISMISSALS = ["caught", "caught", "caught", "bowled", "lbw", "run out", "stumped"]
+
+# Chance that a limited-overs match is abandoned during the chase
+NO_RESULT_SHARE = 0.025
+
+FIRST_MATCH_ID = 1_000_001
+GENERATE_CHUNK_SIZE = 500
+
+def team_players(team):
+    """The eleven players of a team, openers first and specialist bowlers last."""
+    return [f"{team} Player {number}" for number in range(1, 12)]
+
+def pick_year(rng, first_year):
+    """Pick a year, weighted towards recent seasons as the international calendar grew."""
+    years = range(first_year, LAST_YEAR + 1)
+    return rng.choices(years, weights=[math.exp((year - first_year) / 12) for year in years])[0]
+
+def pick_teams(rng, match_type):
+    """Pick two teams, with the stronger sides scheduled more often."""
+    names = [team for team, (_, _, _, tests) in TEAMS.items() if tests or match_type != "Test"]
+    weights = [TEAMS[team][0] ** 2 for team in names]
+    team1 = rng.choices(names, weights)[0]
+    while True:
+        team2 = rng.choices(names, weights)[0]
+        if team2 != team1:
+            return team1, team2
+
+def simulate_innings(rng, match_type, batting, bowling, max_overs, target=None, strength=1.0):
+    """Simulate one innings ball by ball in the Cricsheet JSON "overs" layout.
+
+    Stops when ten wickets fall, max_overs are bowled or the target is
+    reached. strength scales the batting side's scoring. Returns
+    (innings, runs, wickets, overs bowled).
+    """
+    batters, bowlers = team_players(batting), team_players(bowling)[6:]
+    runs_weights = list(accumulate(RUNS_WEIGHTS[match_type]))
+    wicket_chance = WICKET_CHANCE[match_type] / strength
+    striker, non_striker, next_batter = 0, 1, 2
+    runs = wickets = 0
+    overs = []
+    over = 0
+    while over < max_overs and wickets < 10 and (target is None or runs < target):
+        bowler = bowlers[over % len(bowlers)]
+        deliveries = []
+        legal = 0
+        while legal < 6 and wickets < 10 and (target is None or runs < target):
+            delivery = {"batter": batters[striker], "bowler": bowler, "non_striker": batters[non_striker]}
+            extra_kind = None
+            roll = rng.random()
+            for kind, chance in EXTRAS_CHANCE.items():
+                if roll < chance:
+                    extra_kind = kind
+                    break
+                roll -= chance
+            batter_runs = extras = 0
+            if extra_kind in ("wides", "noballs"):
+                extras = 1
+                if extra_kind == "noballs":
+                    batter_runs = bisect.bisect(runs_weights, rng.random() * runs_weights[-1])
+            elif extra_kind:
+                extras = rng.choice([1, 1, 1, 2, 4])
+            else:
+                batter_runs = bisect.bisect(runs_weights, rng.random() * runs_weights[-1])
+                if batter_runs and rng.random() > strength:
+                    batter_runs -= 1
+            delivery["runs"] = {"batter": batter_runs, "extras": extras, "total": batter_runs + extras}
+            if extra_kind:
+                delivery["extras"] = {extra_kind: extras}
+            if extra_kind not in ("wides", "noballs"):
+                legal += 1
+                if rng.random() < wicket_chance:
+                    kind = rng.choice(DISMISSALS)
+                    delivery["wickets"] = [{"player_out": batters[striker], "kind": kind}]
+                    wickets += 1
+                    if next_batter < 11:
+                        striker, next_batter = next_batter, next_batter + 1
+            runs += batter_runs + extras
+            deliveries.append(delivery)
+            if (batter_runs + (extras if extra_kind in ("byes", "legbyes") else 0)) % 2:
+                striker, non_striker = non_striker, striker
+        overs.append({"over": over, "deliveries": deliveries})
+        striker, non_striker = non_striker, striker
+        over += 1
+    return {"team": batting, "overs": overs}, runs, wickets, over
+
+def limited_overs_innings(rng, match_type, max_overs, first, second, strengths):
+    """Play both innings of an ODI or T20 and return (innings, outcome)."""
+    innings1, runs1, _, _ = simulate_innings(rng, match_type, first, second, max_overs, strength=strengths[first])
+    abandoned = rng.random() < NO_RESULT_SHARE
+    chase_overs = rng.randint(0, max_overs - 1) if abandoned else max_overs
+    innings2, runs2, wickets2, _ = simulate_innings(rng, match_type, second, first, chase_overs,
+                                                    target=runs1 + 1, strength=strengths[second])
+    if runs2 > runs1:
+        outcome = {"winner": second, "by": {"wickets": 10 - wickets2}}
+    elif abandoned:
+        outcome = {"result": "no result"}
+    elif runs2 == runs1:
+        outcome = {"result": "tie"}
+    else:
+        outcome = {"winner": first, "by": {"runs": runs1 - runs2}}
+    innings = [innings1] if abandoned and not innings2["overs"] else [innings1, innings2]
+    return innings, outcome
+
+def test_innings(rng, first, second, strengths):
+    """Play a Test within a random overs budget and return (innings, outcome)."""
+    budget = rng.randint(330, 450)  # overs the weather and light allow over five days
+    innings, totals = [], {first: 0, second: 0}
+    batting_order = [first, second, first, second]
+    for number, batting in enumerate(batting_order):
+        if number == 2 and totals[first] - totals[second] >= 200 and rng.random() < 0.7:
+            # Follow-on: the side batting second bats again straight away
+            batting_order[2:] = [second, first]
+            batting = second
+        bowling = second if batting == first else first
+        target = totals[bowling] - totals[batting] + 1 if number == 3 else None
+        if budget <= 0:
+            return innings, {"result": "draw"}
+        inning, runs, wickets, overs = simulate_innings(rng, "Test", batting, bowling, budget, target,
+                                                        strength=strengths[batting])
+        innings.append(inning)
+        totals[batting] += runs
+        budget -= overs
+        if number == 2:
+            lead = totals[batting_order[2]] - totals[batting_order[3]]
+            if lead < 0:
+                winner = batting_order[3]
+                return innings, {"winner": winner, "by": {"innings": 1, "runs": -lead}}
+        if number == 3:
+            chasing, defending = batting, bowling
+            if totals[chasing] > totals[defending]:
+                return innings, {"winner": chasing, "by": {"wickets": 10 - wickets}}
+            if wickets == 10:
+                if totals[chasing] == totals[defending]:
+                    return innings, {"result": "tie"}
+                return innings, {"winner": defending, "by": {"runs": totals[defending] - totals[chasing]}}
+    return innings, {"result": "draw"}
+
+def generate_match(index, seed=0, max_overs=None):
+    """Generate match number index of the corpus as (folder, match document).
+
+    Every match has its own random stream derived from seed and index, so
+    a corpus is identical however it is split across workers. max_overs
+    truncates the stored innings after the match has been played out.
+    """
+    rng = random.Random(seed * 1_000_003 + index)
+    folder = rng.choices(list(FORMATS), [share for _, share, _, _, _ in FORMATS.values()])[0]
+    match_type, _, first_year, overs, bat_chance = FORMATS[folder]
+    team1, team2 = pick_teams(rng, match_type)
+
+    if rng.random() < NEUTRAL_SHARE:
+        host = rng.choice([team for team in TEAMS if team not in (team1, team2)])
+    else:
+        host = team1 if rng.random() < 0.5 else team2
+    _, venues, season, _ = TEAMS[host]
+    venue, city = rng.choice(venues)
+
+    year = pick_year(rng, first_year)
+    month = rng.choice(season)
+    start = datetime.date(year, month, rng.randint(1, 28))
+    days = 5 if match_type == "Test" else 1
+    dates = [(start + datetime.timedelta(days=day)).isoformat() for day in range(days)]
+
+    toss_winner = team1 if rng.random() < 0.5 else team2
+    toss_loser = team2 if toss_winner == team1 else team1
+    toss_decision = "bat" if rng.random() < bat_chance else "field"
+    first, second = (toss_winner, toss_loser) if toss_decision == "bat" else (toss_loser, toss_winner)
+
+    # Home advantage and relative strength shape how freely each side scores
+    strengths = {team: min(1.0, 0.75 + 0.25 * TEAMS[team][0] + (0.05 if team == host else 0))
+                 for team in (team1, team2)}
+    if match_type == "Test":
+        innings, outcome = test_innings(rng, first, second, strengths)
+    else:
+        innings, outcome = limited_overs_innings(rng, match_type, overs, first, second, strengths)
+    if max_overs:
+        innings = [dict(inning, overs=inning["overs"][:max_overs]) for inning in innings]
+
+    info = {"balls_per_over": 6}
+    if rng.random() >= MISSING_CITY_SHARE:
+        info["city"] = city
+    info.update({
+        "dates": dates,
+        "gender": "male",
+        "match_type": match_type,
+        "outcome": outcome,
+    })
+    if overs:
+        info["overs"] = overs
+    winner = outcome.get("winner", first)
+    info.update({
+        "player_of_match": [rng.choice(team_players(winner))],
+        "players": {team1: team_players(team1), team2: team_players(team2)},
+        "season": str(year),
+        "team_type": "international",
+        "teams": [team1, team2],
+        "toss": {"decision": toss_decision, "winner": toss_winner},
+        "venue": venue,
+    })
+    document = {
+        "meta": {"data_version": "1.1.0", "created": f"{LAST_YEAR}-12-31", "revision": 1},
+        "info": info,
+        "innings": innings,
+    }
+    return folder, document
+
+def yaml_text(document):
+    """Render a match document in the older Cricsheet YAML layout.
+
+    Dates become YAML dates, each innings is keyed "1st innings", "2nd
+    innings", ... and deliveries are listed as {<over>.<ball>: delivery}
+    with "batsman" instead of "batter" and a single "wicket". meta and
+    info go through the YAML dumper; the innings, which are nearly all of
+    the file, are written directly with JSON-quoted strings because the
+    dumper is far too slow for them.
+    """
+    info = dict(document["info"], dates=[datetime.date.fromisoformat(d) for d in document["info"]["dates"]])
+    head = {"meta": {"data_version": "0.92", "created": document["meta"]["created"], "revision": 1}, "info": info}
+    lines = [yaml.dump(head, Dumper=YamlDumper, sort_keys=False), "innings:"]
+    for number, inning in enumerate(document["innings"], start=1):
+        suffix = {1: "st", 2: "nd", 3: "rd"}.get(number, "th")
+        lines += [f"- {number}{suffix} innings:", f"    team: {json.dumps(inning['team'])}", "    deliveries:"]
+        for over in inning["overs"]:
+            for ball, delivery in enumerate(over["deliveries"], start=1):
+                runs = delivery["runs"]
+                lines += [
+                    f"    - {over['over']}.{ball}:",
+                    f"        batsman: {json.dumps(delivery['batter'])}",
+                    f"        bowler: {json.dumps(delivery['bowler'])}",
+                    f"        non_striker: {json.dumps(delivery['non_striker'])}",
+                    "        runs:",
+                    f"          batsman: {runs['batter']}",
+                    f"          extras: {runs['extras']}",
+                    f"          total: {runs['total']}",
+                ]
+                for kind, extra in delivery.get("extras", {}).items():
+                    lines += ["        extras:", f"          {kind}: {extra}"]
+                for wicket in delivery.get("wickets", [])[:1]:
+                    lines += ["        wicket:", f"          kind: {json.dumps(wicket['kind'])}",
+                              f"          player_out: {json.dumps(wicket['player_out'])}"]
+    return "\n".join(lines) + "\n"
+
+def generate_chunk(output_dir, start, stop, seed=0, yaml_fraction=0.0, max_overs=None):
+    """Write matches start..stop-1 and return (files, bytes) written."""
+    files = size = 0
+    for index in range(start, stop):
+        folder, document = generate_match(index, seed, max_overs)
+        as_yaml = random.Random(seed * 7_919 + index).random() < yaml_fraction
+        path = os.path.join(output_dir, folder, f"{FIRST_MATCH_ID + index}.{'yaml' if as_yaml else 'json'}")
+        with open(path, 'w', encoding='utf-8') as f:
+            if as_yaml:
+                f.write(yaml_text(document))
+            else:
+                f.write(json.dumps(document))
+            size += f.tell()
+        files += 1
+    return files, size
+
+def generate_corpus(output_dir=DATA_DIR, matches=1000, seed=0, yaml_fraction=0.0, max_overs=None,
+                    workers=None, chunk_size=GENERATE_CHUNK_SIZE):
+    """Generate a synthetic Cricsheet corpus in the tests/odis/t20s folder layout.
+
+    The same seed and number of matches always give the same files. Match
+    files are written by a process pool in chunks of chunk_size matches.
+    yaml_fraction of the files are written in the YAML layout, the rest
+    as JSON. max_overs caps the overs stored per innings to keep very
+    large corpora small on disk; the match info is unaffected. Returns
+    {"matches": ..., "bytes": ...}.
+    """
+    for folder in FORMATS:
+        os.makedirs(os.path.join(output_dir, folder), exist_ok=True)
+    bounds = [(start, min(start + chunk_size, matches)) for start in range(0, matches, chunk_size)]
+    files = size = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(generate_chunk, output_dir, start, stop, seed, yaml_fraction, max_overs)
+                   for start, stop in bounds]
+        for future in futures:
+            chunk_files, chunk_size_bytes = future.result()
+            files += chunk_files
+            size += chunk_size_bytes
+    return {"matches": files, "bytes": size}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Cricsheet match corpus")
+    parser.add_argument("output_dir", nargs="?", default=DATA_DIR,
+                        help=f"where the tests/odis/t20s folders are written (default: {DATA_DIR})")
+    parser.add_argument("--matches", type=int, default=1000, help="number of matches to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--yaml-fraction", type=float, default=0.1,
+                        help="share of matches written as YAML instead of JSON")
+    parser.add_argument("--max-overs", type=int, default=None,
+                        help="store at most this many overs per innings")
+    parser.add_argument("--workers", type=int, default=None, help="generator processes (default: CPU count)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    stats = generate_corpus(args.output_dir, args.matches, args.seed, args.yaml_fraction,
+                            args.max_overs, args.workers)
+    print(f"Generated {stats['matches']} matches ({stats['bytes'] / 1e6:.1f} MB) in {args.output_dir}")
@@ -0,0 +1,22 @@
+import sqlite3
+
+import benchmark
+import db
+from test_db import MATCHES, batch
+
+def test_scaled_database_leaves_the_source_alone(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db.create_database(batch(MATCHES)).close()
+    with open(db.DB_FILE, 'rb') as f:
+        source = f.read()
+
+    conn = benchmark.scaled_database(db.DB_FILE, 3, str(tmp_path / "scaled.db"))
+    assert conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0] == 3 * len(MATCHES)
+    assert conn.execute("SELECT SUM(matches) FROM match_rollup WHERE grouping_set = 'city'").fetchone()[0] == \
+        3 * len(MATCHES)
+    conn.close()
+
+    with open(db.DB_FILE, 'rb') as f:
+        assert f.read() == source
+    conn = sqlite3.connect(db.DB_FILE)
+    assert conn.execute("SELECT COUNT(*) FROM team_rollup").fetchone()[0] > 0
@@ -0,0 +1,25 @@
+import pytest
+
+import cricket
+
+@pytest.mark.parametrize("argv, command", [
+    (["ingest", "--workers", "2"], "ingest"),
+    (["--run-log", "query", "ingest"], "ingest"),
+    (["--profile", "sample", "load", "--rebuild"], "load"),
+    (["--no-run-log", "all", "--skip-fetch"], "all"),
+])
+def test_command_is_the_first_positional(argv, command):
+    assert cricket.find_command(argv) == command
+    assert cricket.build_parser(command).parse_args(argv).command == command
+
+def test_a_global_option_value_is_not_a_command():
+    args = cricket.build_parser(cricket.find_command(["--run-log", "query", "ingest"])).parse_args(
+        ["--run-log", "query", "ingest"])
+    assert args.run_log == "query"
+    assert hasattr(args, "workers")
+
+def test_missing_command_is_a_usage_error(capsys):
+    with pytest.raises(SystemExit) as exit:
+        cricket.main(["--run-log", "run.jsonl"])
+    assert exit.value.code == 2
+    assert "required: command" in capsys.readouterr().err
@@ -0,0 +1,103 @@
+import sqlite3
+
+import pytest
+
+import db
+import queries
+from match_batch import MatchBatch
+
+MATCHES = [
+    ("1001.json", "odi", "India", "Australia", "2020-01-14", "Wankhede Stadium", "Mumbai",
+     "Australia", "field", "Australia"),
+    ("1002.json", "t20", "England", "Pakistan", "2021-11-10", "Sheikh Zayed Stadium", "Abu Dhabi",
+     "England", "bat", "Pakistan"),
+    ("1003.json", "test", "India", "England", "2021-08-04", "Trent Bridge", "Nottingham",
+     "India", "bat", None),
+    ("1004.json", "odi", "Pakistan", "Australia", "2022-03-29", "Gaddafi Stadium", "Lahore",
+     None, None, "Australia"),
+]
+
+def batch(rows):
+    matches = MatchBatch()
+    for row in rows:
+        matches.append(*row)
+    return matches
+
+def table(conn, name):
+    return sorted(conn.execute(f"SELECT * FROM {name}").fetchall(), key=repr)
+
+def generation(conn):
+    return int(conn.execute("SELECT value FROM db_meta WHERE key = 'load_generation'").fetchone()[0])
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # db.py writes the database and head-to-head files to the working directory
+    monkeypatch.chdir(tmp_path)
+
+def test_rebuild_loads_every_match():
+    conn = db.create_database(batch(MATCHES))
+    assert conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0] == 4
+    assert conn.execute("SELECT COUNT(*) FROM team_matches").fetchone()[0] == 8
+    assert conn.execute("SELECT match_key FROM odi_matches ORDER BY match_id").fetchall() == [("1001",), ("1004",)]
+    assert generation(conn) == 1
+
+def test_upsert_inserts_updates_and_deletes():
+    conn = db.create_database(batch(MATCHES))
+    fingerprint = queries.database_fingerprint(conn)
+    conn.close()
+
+    changed = list(MATCHES)
+    changed[0] = changed[0][:5] + ("Eden Gardens", "Kolkata") + changed[0][7:]      # update
+    del changed[1]                                                                  # delete
+    changed.append(("1005.json", "t20", "India", "Pakistan", "2022-10-23", "Melbourne Cricket Ground",
+                    "Melbourne", "India", "field", "India"))                         # insert
+    conn = db.create_database(batch(changed))
+    assert conn.execute("SELECT venue, city FROM matches WHERE match_id = 1001").fetchone() == \
+        ("Eden Gardens", "Kolkata")
+    assert conn.execute("SELECT COUNT(*) FROM matches WHERE match_id = 1002").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM team_matches WHERE match_id = 1002").fetchone()[0] == 0
+    assert conn.execute("SELECT team FROM team_matches WHERE match_id = 1005 ORDER BY side").fetchall() == \
+        [("India",), ("Pakistan",)]
+    assert generation(conn) == 2
+    assert queries.database_fingerprint(conn) != fingerprint
+    upserted = {name: table(conn, name) for name in ['matches', 'team_matches'] + list(db.ROLLUPS)}
+    conn.close()
+
+    # The upserted tables hold exactly what a rebuild from the same matches would
+    conn = db.create_database(batch(changed), rebuild=True)
+    assert {name: table(conn, name) for name in upserted} == upserted
+
+def test_unchanged_upsert_keeps_the_generation():
+    db.create_database(batch(MATCHES)).close()
+    conn = db.create_database(batch(MATCHES))
+    assert generation(conn) == 1
+
+def test_unknown_toss_winner_is_neither_won_nor_lost():
+    conn = db.create_database(batch(MATCHES))
+    assert conn.execute("SELECT toss_won FROM team_matches WHERE match_id = 1004").fetchall() == [(None,), (None,)]
+    assert conn.execute("SELECT toss_won FROM team_matches WHERE match_id = 1001 ORDER BY side").fetchall() == \
+        [(0,), (1,)]
+    # The team_toss rollup groups team_matches the same way reports 10 and 19 do
+    rollup = conn.execute("SELECT team, toss_won, matches, wins FROM team_rollup "
+                          "WHERE grouping_set = 'team_toss'").fetchall()
+    grouped = conn.execute("SELECT team, toss_won, COUNT(*), SUM(won) FROM team_matches "
+                           "GROUP BY team, toss_won").fetchall()
+    assert sorted(rollup, key=repr) == sorted(grouped, key=repr)
+
+def test_older_layout_is_rebuilt():
+    conn = db.create_database(batch(MATCHES))
+    conn.execute("DROP TABLE team_matches")
+    old_schema = db.TEAM_MATCHES_SCHEMA.replace('toss_won INTEGER', 'toss_won INTEGER NOT NULL')
+    conn.execute(f"CREATE TABLE team_matches {old_schema}")
+    conn.close()
+    conn = db.create_database(batch(MATCHES))
+    assert conn.execute("SELECT COUNT(*) FROM team_matches WHERE toss_won IS NULL").fetchone()[0] == 2
+
+def test_duplicate_match_keys_fail_before_writing():
+    db.create_database(batch(MATCHES)).close()
+    duplicated = MATCHES + [("archives/1003.yaml",) + MATCHES[2][1:]]
+    with pytest.raises(ValueError, match="1003"):
+        db.create_database(batch(duplicated), rebuild=True)
+    conn = sqlite3.connect(db.DB_FILE)
+    assert conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0] == 4
+    assert generation(conn) == 1
@@ -0,0 +1,104 @@
+import os
+import json
+
+import pytest
+
+import process_data
+
+TEAMS = ["India", "Australia", "England", "Pakistan"]
+
+# The corpus after the first run: two matches changed, one deleted, and two
+# added whose file names sort before and in the middle of the others
+FIRST = [str(number) for number in range(1000, 1012)]
+CHANGED = {"1003", "1007"}
+SECOND = sorted(set(FIRST) - {"1005"} | {"0999", "1004000"})
+
+def match_document(key, changed=False):
+    number = int(key)
+    team1, team2 = TEAMS[number % 4], TEAMS[(number + 1) % 4]
+    return {
+        "info": {
+            "match_type": ["ODI", "T20", "Test"][number % 3],
+            "teams": [team1, team2],
+            "dates": [f"20{number % 20:02d}-0{number % 9 + 1}-1{number % 10}"],
+            "venue": f"Rebuilt Ground {number}" if changed else f"Ground {number}",
+            "city": f"City {number % 5}",
+            "toss": {"winner": team2, "decision": "bat" if number % 2 else "field"},
+            "outcome": {"winner": team1} if number % 4 else {"result": "draw"},
+        },
+        "innings": [{"team": team1, "overs": [{"over": 0, "deliveries": [
+            {"batter": f"Batter {number}", "bowler": f"Bowler {number}",
+             "runs": {"batter": number % 7, "extras": int(changed), "total": number % 7 + int(changed)}},
+        ]}]}],
+    }
+
+def write_corpus(keys, changed=()):
+    """Make DATA_DIR hold exactly the match files of keys"""
+    folder = os.path.join(process_data.DATA_DIR, "odis")
+    os.makedirs(folder, exist_ok=True)
+    for file in os.listdir(folder):
+        if os.path.splitext(file)[0] not in keys:
+            os.remove(os.path.join(folder, file))
+    for key in keys:
+        with open(os.path.join(folder, f"{key}.json"), 'w', encoding='utf-8') as f:
+            json.dump(match_document(key, key in changed), f)
+
+def run(**options):
+    errors = process_data.process_all_matches([process_data.DATA_DIR], workers=1, chunk_size=4, **options)
+    assert errors == []
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def outputs(parquet=False):
+    """The files a run leaves behind, as bytes, plus the manifest without file times"""
+    manifest = {key: {field: value for field, value in entry.items() if field != "mtime_ns"}
+                for key, entry in process_data.load_manifest().items()}
+    files = [process_data.OUTPUT_FILE] + ([process_data.OUTPUT_PARQUET] if parquet else [])
+    return {path: read_bytes(path) for path in files}, manifest
+
+def deliveries():
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(process_data.DELIVERIES_DIR)
+    return sorted(zip(*(table.column(column).to_pylist() for column in process_data.DELIVERY_COLUMNS)), key=repr)
+
+@pytest.mark.parametrize("stream", [False, True], ids=["batch", "stream"])
+@pytest.mark.parametrize("parquet", [False, True], ids=["csv", "parquet"])
+def test_incremental_run_matches_full_run(tmp_path, monkeypatch, stream, parquet):
+    if parquet:
+        pytest.importorskip("pyarrow")
+    (tmp_path / "full").mkdir()
+    monkeypatch.chdir(tmp_path / "full")
+    write_corpus(SECOND, CHANGED)
+    run(incremental=False, parquet=parquet, stream=stream)
+    full = outputs(parquet)
+
+    (tmp_path / "incremental").mkdir()
+    monkeypatch.chdir(tmp_path / "incremental")
+    write_corpus(FIRST)
+    run(parquet=parquet, stream=stream)
+    write_corpus(SECOND, CHANGED)
+    run(stream=stream)  # OUTPUT_PARQUET is kept up to date once it exists
+    assert outputs(parquet) == full
+
+    # A run with nothing new leaves the outputs as they were
+    run(stream=stream)
+    assert outputs(parquet) == full
+
+def test_incremental_run_keeps_deliveries(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    (tmp_path / "full").mkdir()
+    monkeypatch.chdir(tmp_path / "full")
+    write_corpus(SECOND, CHANGED)
+    run(incremental=False, deliveries=True)
+    full = deliveries()
+
+    (tmp_path / "incremental").mkdir()
+    monkeypatch.chdir(tmp_path / "incremental")
+    write_corpus(FIRST)
+    run(deliveries=True)
+    write_corpus(SECOND, CHANGED)
+    run()  # without deliveries=True, as the dataset exists
+    assert deliveries() == full
@@ -0,0 +1,74 @@
+import os
+import contextlib
+
+import pytest
+
+import scrape_cricsheet
+
+ARCHIVE = b"PK" + bytes(range(200))
+
+class Response:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise OSError(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+class Session:
+    """Answers each get() with the next of responses, recording the request headers"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, **options):
+        self.requests.append(dict(headers or {}))
+        return contextlib.nullcontext(self.responses.pop(0))
+
+@pytest.fixture
+def archive_path(tmp_path):
+    path = str(tmp_path / "odis.zip")
+    with open(path + ".part", 'wb') as f:
+        f.write(ARCHIVE[:50])
+    with open(path + ".part.meta", 'w', encoding='utf-8') as f:
+        f.write('{"ETag": "\\"old\\""}')
+    return path
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def test_resumes_from_the_end_of_the_partial_file(archive_path):
+    session = Session(Response(206, ARCHIVE[50:], {"Content-Range": f"bytes 50-{len(ARCHIVE) - 1}/{len(ARCHIVE)}"}))
+    assert scrape_cricsheet.fetch_archive(session, "http://test/odis.zip", archive_path)
+    assert session.requests[0]["Range"] == "bytes=50-"
+    assert read_bytes(archive_path) == ARCHIVE
+
+def test_range_at_another_offset_restarts_the_download(archive_path):
+    session = Session(Response(206, ARCHIVE[10:], {"Content-Range": f"bytes 10-{len(ARCHIVE) - 1}/{len(ARCHIVE)}"}),
+                      Response(200, ARCHIVE, {"ETag": '"new"'}))
+    assert scrape_cricsheet.fetch_archive(session, "http://test/odis.zip", archive_path)
+    assert "Range" not in session.requests[1]
+    assert read_bytes(archive_path) == ARCHIVE
+    assert scrape_cricsheet.read_validators(archive_path) == {"ETag": '"new"'}
+
+def test_unsatisfiable_range_discards_the_partial_file_and_its_validators(archive_path):
+    session = Session(Response(416), Response(200, ARCHIVE))
+    assert scrape_cricsheet.fetch_archive(session, "http://test/odis.zip", archive_path)
+    assert session.requests[1] == {}
+    assert read_bytes(archive_path) == ARCHIVE
+    assert scrape_cricsheet.read_validators(archive_path) == {}
+    assert not os.path.exists(archive_path + ".part.meta")
+
+def test_unsatisfiable_range_without_a_partial_file_fails_cleanly(tmp_path):
+    session = Session(Response(416))
+    with pytest.raises(OSError, match="416"):
+        scrape_cricsheet.fetch_archive(session, "http://test/odis.zip", str(tmp_path / "odis.zip"))
+    assert len(session.requests) == 1
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+import db
+import service
+from test_db import MATCHES, batch
+
+@pytest.fixture
+def report_service(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db.create_database(batch(MATCHES)).close()
+    report_service = service.ReportService(db.DB_FILE, pool_size=1)
+    yield report_service
+    report_service.close()
+
+def rows(report_service, num, **query):
+    body, _ = report_service.report(num, {name: [value] for name, value in query.items()})
+    return json.loads(body)["rows"]
+
+def test_filters_restrict_the_queries_py_statements(report_service):
+    assert rows(report_service, 1, team="India") == [["odi", 1], ["test", 1]]
+    assert rows(report_service, 3, team="India") == [["India", 2]]
+    assert rows(report_service, 2, format="odi", year_from="2021") == [["2022", 1]]
+    assert rows(report_service, 4, year_to="2021") == [["Australia", 1], ["Pakistan", 1]]
+    assert rows(report_service, 18, min_matches="1") == [["Australia", 2, 100.0]]
+
+def test_only_supplied_filters_reach_the_statement():
+    sql = service.report_statement(3, ("team",))
+    assert "team = :team" in sql and ":format" not in sql and "IS NULL" not in sql
+    assert service.report_statement(3, ()) == service.queries.SQL_STATEMENTS[3]
+
+def test_team_filter_searches_the_index(report_service):
+    conn = report_service.pool.get()
+    try:
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + service.report_statement(3, ("team",)),
+                                               {"team": "India"})]
+    finally:
+        report_service.pool.put(conn)
+    assert any(line.startswith("SEARCH") and "team_matches" in line for line in plan)